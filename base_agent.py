@@ -3,17 +3,45 @@ Base Agent Class
 This module contains the base agent class that all specialized agents inherit from.
 """
 
+import re
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, ContextManager, Dict, List, Optional
+from metrics import MetricsSink, NULL_SINK, STAGE_SECONDS
+from query_analysis import QueryAnalysis
+
+
+# Routing tiers, cheapest first: character-class and digit/operator scans,
+# lexicon and pattern hits, then statistical language detection
+TIER_CHAR_CLASS = "char_class"
+TIER_LEXICON = "lexicon"
+TIER_LANGUAGE_DETECTION = "language_detection"
+ROUTING_TIERS = (TIER_CHAR_CLASS, TIER_LEXICON, TIER_LANGUAGE_DETECTION)
 
 
 class BaseAgent(ABC):
     """Abstract base class for all agents in the framework."""
     
+    # Agents whose response depends only on the query text set this to True,
+    # which lets the Primary Agent cache their full responses
+    deterministic = False
+    
+    # Agents whose processing can block for a long time (e.g. symbolic math)
+    # set this to True so the async interface runs them in an executor
+    blocking = False
+    
+    # Where timing hooks report; the Primary Agent attaches its own sink
+    metrics: MetricsSink = NULL_SINK
+    
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
     
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sinks belong to one process (and hold locks); copies start detached
+        state = self.__dict__.copy()
+        state.pop("metrics", None)
+        return state
+    
     @abstractmethod
     def can_handle(self, query: str) -> bool:
         """
@@ -40,6 +68,126 @@ class BaseAgent(ABC):
         """
         pass
     
+    def get_routing_patterns(self) -> Dict[str, List[str]]:
+        """
+        Regex patterns that, if any of them is found, claim a query for this agent.
+        
+        The Primary Agent compiles the patterns of every agent into a single
+        scanner, so agents should list their patterns here instead of running
+        them one by one inside ``can_handle``.
+        
+        Returns:
+            Dict[str, List[str]]: Patterns searched against the raw query ("raw")
+            and against its lowercased form ("lower")
+        """
+        return {"raw": [], "lower": []}
+    
+    def matches_routing_patterns(self, analysis: QueryAnalysis) -> bool:
+        """Check the routing patterns one by one, without the compiled router."""
+        patterns = self.get_routing_patterns()
+        if any(re.search(pattern, analysis.query) for pattern in patterns.get("raw", [])):
+            return True
+        return any(re.search(pattern, analysis.lower) for pattern in patterns.get("lower", []))
+    
+    def can_handle_routed(self, analysis: QueryAnalysis, pattern_matched: bool) -> bool:
+        """
+        Decide whether to handle a query once the routing patterns have been scanned.
+        
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+            pattern_matched (bool): Whether any of this agent's routing patterns matched
+            
+        Returns:
+            bool: True if the agent can handle the query, False otherwise
+        """
+        for tier in ROUTING_TIERS:
+            decision = self.route_tier(analysis, tier, pattern_matched)
+            if decision is not None:
+                return decision
+        return False
+    
+    def route_tier(self, analysis: QueryAnalysis, tier: str, pattern_matched: Optional[bool]) -> Optional[bool]:
+        """
+        Decide whether to handle a query using only the signals of one routing tier.
+        
+        The router asks every tier in ``ROUTING_TIERS`` in turn until the agent
+        decides, so agents should answer as early as they can and leave only
+        ambiguous queries to language detection. By default the whole decision
+        is made at the lexicon tier with ``can_handle``.
+        
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+            tier (str): The routing tier being asked
+            pattern_matched (Optional[bool]): Whether any of this agent's routing
+                patterns matched, or None if the patterns have not been scanned yet
+            
+        Returns:
+            Optional[bool]: True to claim the query, False to decline it, or None
+            to defer to the next tier
+        """
+        if tier == TIER_LEXICON:
+            return self.can_handle(analysis.query)
+        return None
+    
+    def process_analysis(self, analysis: QueryAnalysis) -> Dict[str, Any]:
+        """
+        Process a query that the Primary Agent has already analyzed.
+        
+        Agents override this to reuse the shared features instead of
+        lowercasing, tokenizing or detecting the language again.
+        
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+            
+        Returns:
+            Dict[str, Any]: Response containing the result and metadata
+        """
+        return self.process(analysis.query)
+    
+    def timed(self, stage: str) -> ContextManager[None]:
+        """
+        Time a processing stage of this agent, e.g. ``with self.timed("sympy"):``.
+        
+        Args:
+            stage (str): Name of the stage
+            
+        Returns:
+            ContextManager[None]: Records the duration of the ``with`` block
+        """
+        return self.metrics.timer(STAGE_SECONDS, {"agent": self.name, "stage": stage})
+    
+    async def can_handle_async(self, query: str) -> bool:
+        """Async counterpart of ``can_handle``; routing checks are cheap and run inline."""
+        return self.can_handle(query)
+    
+    async def process_async(self, query: str) -> Dict[str, Any]:
+        """Async counterpart of ``process``; runs in an executor for blocking agents."""
+        return await self._run_sync(self.process, query)
+    
+    async def process_analysis_async(self, analysis: QueryAnalysis) -> Dict[str, Any]:
+        """
+        Async counterpart of ``process_analysis``.
+        
+        The default adapter calls the synchronous method directly, or in the
+        event loop's default executor when the agent is ``blocking``, so slow
+        agents never stall the event loop. Natively async agents override it.
+        
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+            
+        Returns:
+            Dict[str, Any]: Response containing the result and metadata
+        """
+        return await self._run_sync(self.process_analysis, analysis)
+    
+    async def _run_sync(self, method, *args):
+        """Run a synchronous method inline, or in an executor if the agent is blocking."""
+        if self.blocking:
+            import asyncio  # Deferred: only async callers pay for the import
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, method, *args)
+        return method(*args)
+    
     def get_info(self) -> Dict[str, str]:
         """Get agent information."""
         return {
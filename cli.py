@@ -5,7 +5,6 @@ Simple CLI to interact with the agentic framework from terminal.
 
 import sys
 import argparse
-from primary_agent import PrimaryAgent
 
 
 def main():
@@ -72,15 +71,16 @@ Examples:
     
     args = parser.parse_args()
     
-    # Initialize the primary agent
-    agent = PrimaryAgent()
-    
-    # Handle version
+    # Handle version (before any agent is loaded)
     if args.version:
         print("Agentic Framework CLI v1.0")
         print("Multi-agent system with intelligent routing")
         return
     
+    # Initialize the primary agent; imported here so --version stays fast
+    from primary_agent import PrimaryAgent
+    agent = PrimaryAgent()
+    
     # Handle status
     if args.status:
         show_status(agent)
@@ -0,0 +1,232 @@
+"""
+Combinatorics
+Factorials, binomial coefficients and permutations for arguments up to a
+billion. Exact big integers are only built while they are small: larger
+results are described by their base-10 logarithm, from a high-precision
+Stirling series, and their trailing zeros, from Legendre's formula. So
+1000000! costs microseconds instead of seconds and never becomes a
+multi-megabyte decimal string.
+"""
+
+import math
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from typing import Optional
+
+# Largest argument accepted
+MAX_N = 10**9
+
+# Results up to this many digits are computed exactly (math.factorial(5000) takes milliseconds)
+EXACT_DIGITS = 20000
+
+# Results up to this many digits are written out in full; below Python's
+# int-to-str limit (sys.get_int_max_str_digits(), 4300 by default)
+DISPLAY_DIGITS = 1000
+
+# Significant digits of the logarithms, beyond the digits of the integer part
+PRECISION = 40
+
+# Below this, log(n!) is taken from the exact factorial instead of the series
+STIRLING_MIN = 1000
+
+# Bernoulli numbers B2, B4, ..., B16 of the Stirling series
+_BERNOULLI = (Fraction(1, 6), Fraction(-1, 30), Fraction(1, 42), Fraction(-1, 30),
+              Fraction(5, 66), Fraction(-691, 2730), Fraction(7, 6), Fraction(-3617, 510))
+
+_PI = Decimal("3.14159265358979323846264338327950288419716939937510582097494459")
+
+
+class LargeNumber:
+    """
+    A non-negative integer known exactly or by its base-10 logarithm.
+
+    The logarithm is accurate to about ``PRECISION`` significant digits past
+    the decimal point, enough for the digit count and the leading digits.
+    """
+
+    def __init__(self, exact: Optional[int] = None, log10: Optional[Decimal] = None, trailing_zeros: int = 0):
+        """
+        Args:
+            exact (Optional[int]): The value itself, if it was computed
+            log10 (Optional[Decimal]): Base-10 logarithm, required if the value wasn't computed
+            trailing_zeros (int): Number of zeros the decimal value ends in
+        """
+        self.exact = exact
+        self._log10 = log10
+        self.trailing_zeros = trailing_zeros
+
+    @property
+    def log10(self) -> Optional[Decimal]:
+        """Base-10 logarithm, None for zero; worked out from the exact value on first use."""
+        if self._log10 is None and self.exact:
+            with localcontext() as context:
+                context.prec = PRECISION + len(str(self.exact.bit_length()))
+                self._log10 = _log10_of_int(self.exact)
+        return self._log10
+
+    @property
+    def digits(self) -> int:
+        """Number of decimal digits."""
+        if self.exact is not None and self.exact.bit_length() <= _SHORT_BITS:
+            return len(str(self.exact))
+        log10 = self.log10
+        return 1 if log10 is None else int(log10) + 1
+
+    @property
+    def is_short(self) -> bool:
+        """Whether the value is known exactly and short enough to write out."""
+        return self.exact is not None and self.digits <= DISPLAY_DIGITS
+
+    def leading_digits(self, count: int = 20) -> str:
+        """The first digits of the decimal value, without building it."""
+        if self.is_short:
+            return str(self.exact)[:count]
+        count = min(count, self.digits, PRECISION - 5)
+        with localcontext() as context:
+            context.prec = PRECISION + len(str(self.digits))
+            fraction = self.log10 - int(self.log10)
+            mantissa = Decimal(10) ** (fraction + count - 1)
+        return str(int(mantissa))[:count]
+
+    def trailing_digits(self, count: int = 20) -> Optional[str]:
+        """The last digits before the trailing zeros, or None if the value wasn't computed."""
+        if self.exact is None:
+            return None
+        significant = self.exact // 10**self.trailing_zeros if self.trailing_zeros else self.exact
+        return str(significant % 10**count).zfill(min(count, self.digits - self.trailing_zeros))
+
+    def scientific(self, significant: int = 10) -> str:
+        """The value in scientific notation, e.g. ``8.263931688e+5565708``."""
+        leading = self.leading_digits(significant)
+        mantissa = leading[0] + ("." + leading[1:] if len(leading) > 1 else "")
+        return f"{mantissa}e+{self.digits - 1}"
+
+    def describe(self) -> str:
+        """The value in full if it is short, otherwise its size, ends and scientific notation."""
+        if self.is_short:
+            return str(self.exact)
+
+        zeros = f"{self.trailing_zeros} zero{'s' if self.trailing_zeros > 1 else ''}"
+        text = f"about {self.scientific()}: {self.digits} digits, starting {self.leading_digits()}"
+        trailing = self.trailing_digits()
+        if trailing is not None:
+            text += f" and ending {trailing}"
+            if self.trailing_zeros:
+                text += f" followed by {zeros}"
+        elif self.trailing_zeros:
+            text += f" and ending in {zeros}"
+        return text
+
+
+# Integers of at most this many bits have fewer than DISPLAY_DIGITS digits
+_SHORT_BITS = int((DISPLAY_DIGITS - 1) * math.log2(10))
+
+_LN10 = math.log(10)
+
+
+def _check_argument(n: int, name: str = "n") -> None:
+    """Reject negative and oversized arguments."""
+    if n < 0:
+        raise ValueError(f"{name} must not be negative")
+    if n > MAX_N:
+        raise ValueError(f"{name} must be at most {MAX_N}")
+
+
+def _log10_of_int(value: int) -> Decimal:
+    """Base-10 logarithm of a positive integer, from its leading 256 bits."""
+    shift = max(value.bit_length() - 256, 0)
+    result = Decimal(value >> shift).log10()
+    if shift:
+        result += shift * Decimal(2).log10()
+    return result
+
+
+def _log10_factorial(n: int) -> Decimal:
+    """Base-10 logarithm of n!, from the Stirling series for large n."""
+    if n < STIRLING_MIN:
+        return _log10_of_int(math.factorial(n))
+
+    x = Decimal(n)
+    # ln n! = n ln n - n + ln(2 pi n) / 2 + sum of B2k / (2k (2k - 1) n^(2k - 1))
+    result = x * x.ln() - x + (2 * _PI * x).ln() / 2
+    power = x
+    for k, bernoulli in enumerate(_BERNOULLI, 1):
+        result += Decimal(bernoulli.numerator) / (Decimal(bernoulli.denominator) * (2 * k) * (2 * k - 1) * power)
+        power *= x * x
+    return result / Decimal(10).ln()
+
+
+def _legendre(n: int, prime: int) -> int:
+    """Exponent of a prime in n! (Legendre's formula)."""
+    exponent = 0
+    while n:
+        n //= prime
+        exponent += n
+    return exponent
+
+
+def _trailing_zeros(n: int, *divisors: int) -> int:
+    """Trailing zeros of n! divided by the factorials of the divisors."""
+    twos = _legendre(n, 2) - sum(_legendre(d, 2) for d in divisors)
+    fives = _legendre(n, 5) - sum(_legendre(d, 5) for d in divisors)
+    return min(twos, fives)
+
+
+def _large(n: int, *divisors: int) -> Decimal:
+    """Base-10 logarithm of n! divided by the factorials of the divisors."""
+    with localcontext() as context:
+        context.prec = PRECISION + len(str(n))
+        return _log10_factorial(n) - sum((_log10_factorial(d) for d in divisors), Decimal(0))
+
+
+def _estimated_digits(n: int, *divisors: int) -> float:
+    """Digits of n! divided by the factorials of the divisors, from the float log-gamma."""
+    return (math.lgamma(n + 1) - sum(math.lgamma(d + 1) for d in divisors)) / _LN10 + 1
+
+
+def factorial(n: int) -> LargeNumber:
+    """
+    n! for 0 <= n <= MAX_N.
+
+    Raises:
+        ValueError: If n is negative or larger than MAX_N
+    """
+    _check_argument(n)
+    zeros = _trailing_zeros(n)
+    if _estimated_digits(n) <= EXACT_DIGITS:
+        return LargeNumber(math.factorial(n), trailing_zeros=zeros)
+    return LargeNumber(log10=_large(n), trailing_zeros=zeros)
+
+
+def binomial(n: int, k: int) -> LargeNumber:
+    """
+    The binomial coefficient C(n, k), the number of ways to choose k of n items.
+
+    Raises:
+        ValueError: If n or k is negative or larger than MAX_N
+    """
+    _check_argument(n)
+    _check_argument(k, "k")
+    if k > n:
+        return LargeNumber(0)
+    zeros = _trailing_zeros(n, k, n - k)
+    if _estimated_digits(n, k, n - k) <= EXACT_DIGITS:
+        return LargeNumber(math.comb(n, k), trailing_zeros=zeros)
+    return LargeNumber(log10=_large(n, k, n - k), trailing_zeros=zeros)
+
+
+def permutations(n: int, k: int) -> LargeNumber:
+    """
+    The number of ordered arrangements of k of n items, n! / (n - k)!.
+
+    Raises:
+        ValueError: If n or k is negative or larger than MAX_N
+    """
+    _check_argument(n)
+    _check_argument(k, "k")
+    if k > n:
+        return LargeNumber(0)
+    zeros = _trailing_zeros(n, n - k)
+    if _estimated_digits(n, n - k) <= EXACT_DIGITS:
+        return LargeNumber(math.perm(n, k), trailing_zeros=zeros)
+    return LargeNumber(log10=_large(n, n - k), trailing_zeros=zeros)
@@ -0,0 +1,451 @@
+"""
+Durable History
+Append-only conversation history backends that survive restarts: SQLite (in
+WAL mode) and JSON Lines. Writes are buffered and flushed in batches by a
+background thread.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from history_store import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds an SQLite write waits for another connection's lock before failing
+SQLITE_TIMEOUT = 5.0
+
+
+class BatchedHistoryStore(HistoryStore):
+    """
+    Base class for stores that buffer appends and write them in batches.
+
+    A background thread flushes the buffer every ``flush_interval`` seconds,
+    or as soon as ``batch_size`` interactions are waiting. Reads flush first,
+    so they always see every appended interaction. A batch that fails to
+    write goes back to the front of the buffer and is retried by the next
+    flush; the background thread logs the error and keeps running.
+    """
+
+    durable = True
+
+    def __init__(self, flush_interval: float = 1.0, batch_size: int = 100):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._next_id = self._load_next_id()
+
+        # Counters
+        self.flushes = 0
+        self.written = 0
+        self.failed_flushes = 0
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+        # Don't lose buffered interactions when the interpreter exits
+        atexit.register(self.close)
+
+    @abstractmethod
+    def _load_next_id(self) -> int:
+        """Id to give the next interaction, continuing from what is already stored."""
+        pass
+
+    @abstractmethod
+    def _write_batch(self, entries: List[Dict[str, Any]]) -> None:
+        """Durably write a batch of interactions, all or none of them."""
+        pass
+
+    def append(self, session_id: str, query: str, response: Dict[str, Any], timestamp: str) -> int:
+        """Buffer an interaction; it is written by the next flush."""
+        with self._pending_lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._pending.append({
+                "id": entry_id,
+                "session_id": session_id,
+                "query": query,
+                "response": response,
+                "timestamp": timestamp,
+            })
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return entry_id
+
+    def _flush_loop(self) -> None:
+        """Background thread: flush on a timer or when a full batch is waiting."""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The batch is back in the buffer; try again on the next round
+                logger.exception("Failed to write %s history batch, will retry", type(self).__name__)
+
+    def flush(self) -> None:
+        """
+        Write out all buffered interactions.
+
+        Raises:
+            Exception: Whatever the backend raised; the interactions stay buffered
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                entries, self._pending = self._pending, []
+            if not entries:
+                return
+            try:
+                self._write_batch(entries)
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = entries
+                self.failed_flushes += 1
+                raise
+            self.flushes += 1
+            self.written += len(entries)
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is left; safe to call twice."""
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+
+    def _pending_for(self, session_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Buffered interactions not yet written, for one session or all."""
+        with self._pending_lock:
+            return [entry for entry in self._pending if session_id is None or entry["session_id"] == session_id]
+
+    def _batch_stats(self) -> Dict[str, Any]:
+        """Counters shared by every batched store."""
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "written": self.written,
+            "flush_interval": self.flush_interval,
+            "batch_size": self.batch_size,
+        }
+
+
+class SQLiteHistoryStore(BatchedHistoryStore):
+    """
+    History in an SQLite database in WAL mode.
+
+    Interactions are appended to an ``interactions`` table indexed by session,
+    id and timestamp. Per-session counts and last timestamps are kept in a
+    ``sessions`` table updated in the same transaction, so status queries
+    never count rows.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 100):
+        self.path = path
+        # The timeout is SQLite's busy timeout: writers wait for each other instead of failing
+        self._conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_interactions_session
+                ON interactions (session_id, id);
+            CREATE INDEX IF NOT EXISTS idx_interactions_session_time
+                ON interactions (session_id, timestamp);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                interaction_count INTEGER NOT NULL,
+                last_timestamp TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+        super().__init__(flush_interval, batch_size)
+
+    def _load_next_id(self) -> int:
+        with self._conn_lock:
+            row = self._conn.execute("SELECT MAX(id) FROM interactions").fetchone()
+        return (row[0] or 0) + 1
+
+    def _write_batch(self, entries: List[Dict[str, Any]]) -> None:
+        sessions: Dict[str, Tuple[int, str]] = {}
+        for entry in entries:
+            count, _ = sessions.get(entry["session_id"], (0, ""))
+            sessions[entry["session_id"]] = (count + 1, entry["timestamp"])
+
+        with self._conn_lock, self._conn:
+            # Another process sharing the file may have stored the ids handed out
+            # here since the store opened; the batch then goes after its rows
+            stored = self._conn.execute("SELECT MAX(id) FROM interactions").fetchone()[0] or 0
+            if entries[0]["id"] <= stored:
+                self._renumber(entries, stored + 1)
+            self._conn.executemany(
+                "INSERT INTO interactions (id, session_id, timestamp, query, response) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (entry["id"], entry["session_id"], entry["timestamp"], entry["query"],
+                     json.dumps(entry["response"], ensure_ascii=False, default=str))
+                    for entry in entries
+                ],
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO sessions (session_id, interaction_count, last_timestamp) VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    interaction_count = interaction_count + excluded.interaction_count,
+                    last_timestamp = excluded.last_timestamp
+                """,
+                [(session_id, count, timestamp) for session_id, (count, timestamp) in sessions.items()],
+            )
+
+    def _renumber(self, entries: List[Dict[str, Any]], first_id: int) -> None:
+        """Give a batch consecutive ids from ``first_id``, moving later appends past them."""
+        for offset, entry in enumerate(entries):
+            entry["id"] = first_id + offset
+        with self._pending_lock:
+            shift = first_id + len(entries) - (self._pending[0]["id"] if self._pending else self._next_id)
+            if shift > 0:
+                for entry in self._pending:
+                    entry["id"] += shift
+                self._next_id += shift
+
+    def get(self, session_id: str, after: Optional[int] = None, limit: Optional[int] = None,
+            since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        self.flush()
+
+        sql = "SELECT id, query, response, timestamp FROM interactions WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if after is not None:
+            sql += " AND id > ?"
+            params.append(after)
+        if since is not None:
+            sql += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND timestamp <= ?"
+            params.append(until)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._conn_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        page = [
+            {"id": row[0], "query": row[1], "response": json.loads(row[2]), "timestamp": row[3]}
+            for row in rows
+        ]
+        return page, (page[-1]["id"] if page else None)
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        with self._conn_lock:
+            if session_id is None:
+                row = self._conn.execute("SELECT COALESCE(SUM(interaction_count), 0) FROM sessions").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT interaction_count FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+        stored = row[0] if row else 0
+        return stored + len(self._pending_for(session_id))
+
+    def last_timestamp(self, session_id: Optional[str] = None) -> Optional[str]:
+        pending = self._pending_for(session_id)
+        if pending:
+            return pending[-1]["timestamp"]
+
+        with self._conn_lock:
+            if session_id is None:
+                row = self._conn.execute("SELECT MAX(last_timestamp) FROM sessions").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT last_timestamp FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+        return row[0] if row else None
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        self.flush()
+        with self._conn_lock, self._conn:
+            if session_id is None:
+                self._conn.execute("DELETE FROM interactions")
+                self._conn.execute("DELETE FROM sessions")
+            else:
+                self._conn.execute("DELETE FROM interactions WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._conn_lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        stats = {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "total_entries": self.count(),
+        }
+        stats.update(self._batch_stats())
+        return stats
+
+    def close(self) -> None:
+        super().close()
+        with self._conn_lock:
+            self._conn.close()
+
+
+class JSONLHistoryStore(BatchedHistoryStore):
+    """
+    History in an append-only JSON Lines file.
+
+    Each interaction is one line. Clearing appends a ``clear`` record instead
+    of rewriting the file. Only a small per-session index of ids, timestamps
+    and file offsets is kept in memory. It is rebuilt by one scan of the file
+    when the store opens.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 100):
+        self.path = path
+        # session id -> list of (id, timestamp, file offset)
+        self._index: Dict[str, List[Tuple[int, str, int]]] = {}
+        self._index_lock = threading.Lock()
+        self._file = open(path, "a+b")
+        super().__init__(flush_interval, batch_size)
+
+    def _load_next_id(self) -> int:
+        next_id = 1
+        self._file.seek(0)
+        offset = 0
+        while True:
+            line = self._file.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                record = None
+            if record is None:
+                if self._file.read(1):
+                    raise ValueError(f"Corrupt history record at byte {offset} of {self.path}")
+                # A crash in the middle of a write left the last line incomplete; drop
+                # it, so the next append starts on a line of its own
+                self._file.truncate(offset)
+                break
+            if record.get("type") == "clear":
+                self._apply_clear(record.get("session_id"))
+            else:
+                self._index.setdefault(record["session_id"], []).append((record["id"], record["timestamp"], offset))
+                next_id = max(next_id, record["id"] + 1)
+            offset += len(line)
+        return next_id
+
+    def _apply_clear(self, session_id: Optional[str]) -> None:
+        """Drop a session, or every session, from the index."""
+        if session_id is None:
+            self._index.clear()
+        else:
+            self._index.pop(session_id, None)
+
+    def _write_batch(self, entries: List[Dict[str, Any]]) -> None:
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        lines = []
+        positions = []
+        for entry in entries:
+            line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            lines.append(line)
+            positions.append((entry["session_id"], (entry["id"], entry["timestamp"], offset)))
+            offset += len(line)
+
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        with self._index_lock:
+            for session_id, position in positions:
+                self._index.setdefault(session_id, []).append(position)
+
+    def get(self, session_id: str, after: Optional[int] = None, limit: Optional[int] = None,
+            since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        self.flush()
+
+        with self._index_lock:
+            positions = [
+                offset for entry_id, timestamp, offset in self._index.get(session_id, [])
+                if (after is None or entry_id > after)
+                and (since is None or timestamp >= since)
+                and (until is None or timestamp <= until)
+            ]
+        if limit is not None:
+            positions = positions[:limit]
+
+        page = []
+        with self._write_lock:
+            for offset in positions:
+                self._file.seek(offset)
+                record = json.loads(self._file.readline())
+                page.append({
+                    "id": record["id"],
+                    "query": record["query"],
+                    "response": record["response"],
+                    "timestamp": record["timestamp"],
+                })
+        return page, (page[-1]["id"] if page else None)
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        pending = len(self._pending_for(session_id))
+        with self._index_lock:
+            if session_id is None:
+                return pending + sum(len(positions) for positions in self._index.values())
+            return pending + len(self._index.get(session_id, []))
+
+    def last_timestamp(self, session_id: Optional[str] = None) -> Optional[str]:
+        pending = self._pending_for(session_id)
+        if pending:
+            return pending[-1]["timestamp"]
+
+        with self._index_lock:
+            if session_id is None:
+                timestamps = [positions[-1][1] for positions in self._index.values() if positions]
+                return max(timestamps) if timestamps else None
+            positions = self._index.get(session_id)
+            return positions[-1][1] if positions else None
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        self.flush()
+        with self._write_lock:
+            self._file.seek(0, os.SEEK_END)
+            record = {"type": "clear", "session_id": session_id}
+            self._file.write((json.dumps(record) + "\n").encode("utf-8"))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        with self._index_lock:
+            self._apply_clear(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._index_lock:
+            sessions = len(self._index)
+        stats = {
+            "backend": "jsonl",
+            "path": self.path,
+            "sessions": sessions,
+            "total_entries": self.count(),
+        }
+        stats.update(self._batch_stats())
+        return stats
+
+    def close(self) -> None:
+        super().close()
+        with self._write_lock:
+            self._file.close()
@@ -4,47 +4,68 @@ Specialized agent for handling queries in English language.
 """
 
 import re
-from typing import Dict, Any
-from base_agent import BaseAgent
-
-try:
-    from langdetect import detect
-    LANGDETECT_AVAILABLE = True
-except ImportError:
-    LANGDETECT_AVAILABLE = False
+from typing import Dict, Any, List, Optional
+from base_agent import BaseAgent, TIER_CHAR_CLASS, TIER_LEXICON
+from phrase_matcher import PhraseMatcher, count_words
+from query_analysis import QueryAnalysis
 
 
 class EnglishAgent(BaseAgent):
     """Agent specialized in responding to English language queries."""
     
+    # Responses are a pure function of the query text
+    deterministic = True
+    
+    # Intent phrases, matched anywhere in the lowercased query, in priority order
+    INTENT_PHRASES = {
+        'greeting': ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening'],
+        'farewell': ['goodbye', 'bye', 'see you', 'farewell'],
+        'thanks': ['thank you', 'thanks', 'thank'],
+        'help': ['help', 'assist', 'support'],
+        'information': ['what is', 'what are', 'tell me about', 'explain', 'describe'],
+        'opinion': ['do you think', 'what do you', 'your opinion', 'prefer'],
+    }
+    
+    # Words that make a query meaningful English, matched anywhere in the lowercased query
+    MEANINGFUL_PHRASES = [
+        'what', 'how', 'when', 'where', 'why', 'can', 'could', 'would', 'should',
+        'hello', 'hi', 'thank', 'please', 'help'
+    ]
+    
+    # Common English patterns and indicators
+    english_indicators = [
+        # Common English words
+        'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
+        'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before',
+        'after', 'above', 'below', 'between', 'among', 'this', 'that', 'these',
+        'those', 'what', 'when', 'where', 'why', 'how', 'who', 'which',
+        
+        # Common verbs
+        'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
+        'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might',
+        'can', 'get', 'got', 'go', 'went', 'come', 'came', 'see', 'saw', 'know',
+        'think', 'tell', 'say', 'said', 'take', 'took', 'make', 'made',
+        
+        # Question words
+        'what', 'where', 'when', 'why', 'how', 'who', 'which', 'whose',
+        
+        # Common phrases
+        'hello', 'hi', 'goodbye', 'bye', 'please', 'thank', 'thanks', 'sorry',
+        'excuse', 'help', 'question', 'answer', 'explain', 'describe'
+    ]
+    
+    # Intent phrases, meaningful words and indicators, found in one pass over the
+    # query; built once for the class
+    _phrase_matcher = PhraseMatcher({
+        **INTENT_PHRASES, 'meaningful': MEANINGFUL_PHRASES, 'indicator': english_indicators
+    })
+    
     def __init__(self):
         super().__init__(
             name="English Agent", 
             description="I handle general queries and conversations in English."
         )
         
-        # Common English patterns and indicators
-        self.english_indicators = [
-            # Common English words
-            'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
-            'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before',
-            'after', 'above', 'below', 'between', 'among', 'this', 'that', 'these',
-            'those', 'what', 'when', 'where', 'why', 'how', 'who', 'which',
-            
-            # Common verbs
-            'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
-            'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might',
-            'can', 'get', 'got', 'go', 'went', 'come', 'came', 'see', 'saw', 'know',
-            'think', 'tell', 'say', 'said', 'take', 'took', 'make', 'made',
-            
-            # Question words
-            'what', 'where', 'when', 'why', 'how', 'who', 'which', 'whose',
-            
-            # Common phrases
-            'hello', 'hi', 'goodbye', 'bye', 'please', 'thank', 'thanks', 'sorry',
-            'excuse', 'help', 'question', 'answer', 'explain', 'describe'
-        ]
-        
         # English sentence patterns
         self.english_patterns = [
             r'\b(the|a|an)\s+\w+',  # Articles
@@ -53,69 +74,84 @@ class EnglishAgent(BaseAgent):
             r'\?\s*$',  # Questions ending with ?
             r'\b(what|where|when|why|how|who)\s+',  # Question words
         ]
+        
+        # Common English letter patterns
+        self.likely_english_patterns = [
+            r'\bth(e|is|at|ere|ey|ink)\b',  # Common 'th' patterns
+            r'\b(ing|tion|ed)\b',          # Common endings
+            r'\s(a|an|the)\s',             # Articles with spaces
+        ]
+    
+    def get_routing_patterns(self) -> Dict[str, List[str]]:
+        """Sentence and letter patterns, all matched on the lowercased query."""
+        return {"raw": [], "lower": self.english_patterns + self.likely_english_patterns}
     
     def can_handle(self, query: str) -> bool:
         """Check if the query is in English and should be handled by this agent."""
-        
-        # Skip very short or low-quality queries that might not be real English
-        if len(query.strip()) < 3:
-            return False
-        
-        # First, use language detection if available
-        if LANGDETECT_AVAILABLE:
-            try:
-                detected_lang = detect(query)
-                if detected_lang == 'en':
-                    # Additional check to ensure it's actually meaningful English
-                    return self._is_meaningful_english(query)
-            except:
-                pass  # Fall back to manual detection
-        
-        # Manual English detection
-        query_lower = query.lower()
-        words = query_lower.split()
+        analysis = QueryAnalysis(query)
+        return self.can_handle_routed(analysis, self.matches_routing_patterns(analysis))
+    
+    def route_tier(self, analysis: QueryAnalysis, tier: str, pattern_matched: Optional[bool]) -> Optional[bool]:
+        """Check the cheap English heuristics first and only then fall back to language detection."""
+        if tier == TIER_CHAR_CLASS:
+            # Skip very short or low-quality queries that might not be real English
+            if len(analysis.query.strip()) < 3:
+                return False
+            return None
+        
+        heuristics_match = self._matches_english_heuristics(analysis, pattern_matched)
+        meaningful = self._is_meaningful_english(analysis)
+        
+        # Language detection decides first when it reports English: meaningful
+        # English is accepted, anything else is rejected. It is only consulted
+        # when that can change the outcome of the cheap heuristics.
+        if tier == TIER_LEXICON:
+            if heuristics_match == meaningful:
+                return heuristics_match
+            return None
+        
+        if meaningful:
+            return analysis.language == 'en'
+        return analysis.language != 'en'
+    
+    def _matches_english_heuristics(self, analysis: QueryAnalysis, pattern_matched: bool) -> bool:
+        """Manual English detection based on word ratios and patterns."""
+        words = analysis.tokens
         
         # Don't handle if it looks like gibberish (too many non-dictionary-like words)
-        if self._looks_like_gibberish(query):
+        if self._looks_like_gibberish(analysis):
             return False
         
         # Check for English indicators with better threshold
-        english_word_count = 0
-        total_meaningful_words = 0
-        
-        for word in words:
-            if len(word) > 1:  # Only count meaningful words
-                total_meaningful_words += 1
-                if word in self.english_indicators:
-                    english_word_count += 1
+        occurrences = analysis.find_phrases(self._phrase_matcher)
+        english_word_count = count_words(analysis.normalized, occurrences, 'indicator')
+        total_meaningful_words = sum(1 for word in words if len(word) > 1)  # Only count meaningful words
         
         # If more than 30% of meaningful words are common English words
         if total_meaningful_words > 0 and (english_word_count / total_meaningful_words) > 0.3:
             return True
         
-        # Check for English patterns
-        for pattern in self.english_patterns:
-            if re.search(pattern, query_lower):
-                return True
+        # Check for English sentence and letter patterns
+        if pattern_matched:
+            return True
         
         # Check if it's likely English based on character patterns
-        if self._is_likely_english(query):
+        if self._is_likely_english(analysis):
             return True
         
         return False
     
-    def _is_meaningful_english(self, query: str) -> bool:
+    def _is_meaningful_english(self, analysis: QueryAnalysis) -> bool:
         """Check if the detected English text is meaningful."""
         # Check for complete sentences or meaningful phrases
         return (
-            any(word in query.lower() for word in ['what', 'how', 'when', 'where', 'why', 'can', 'could', 'would', 'should']) or
-            '?' in query or
-            any(word in query.lower() for word in ['hello', 'hi', 'thank', 'please', 'help'])
+            analysis.has_question_mark or
+            any(label == 'meaningful' for _, _, label in analysis.find_phrases(self._phrase_matcher))
         )
     
-    def _looks_like_gibberish(self, query: str) -> bool:
+    def _looks_like_gibberish(self, analysis: QueryAnalysis) -> bool:
         """Check if query looks like random gibberish."""
-        words = query.lower().split()
+        words = analysis.tokens
         if not words:
             return True
         
@@ -136,26 +172,15 @@ class EnglishAgent(BaseAgent):
         # If more than half the words look like gibberish
         return gibberish_count > len(words) / 2
     
-    def _is_likely_english(self, query: str) -> bool:
+    def _is_likely_english(self, analysis: QueryAnalysis) -> bool:
         """Additional heuristics to determine if text is likely English."""
         
-        # Check for common English letter patterns
-        english_patterns = [
-            r'\bth(e|is|at|ere|ey|ink)\b',  # Common 'th' patterns
-            r'\b(ing|tion|ed)\b',          # Common endings
-            r'\s(a|an|the)\s',             # Articles with spaces
-        ]
-        
-        for pattern in english_patterns:
-            if re.search(pattern, query.lower()):
-                return True
-        
         # Check character distribution (English uses certain letters more frequently)
-        text_length = len(query.replace(' ', ''))
+        text_length = len(analysis.query.replace(' ', ''))
         if text_length > 0:
             # Count common English letters
             common_letters = 'etaoinshrdlu'
-            common_count = sum(query.lower().count(letter) for letter in common_letters)
+            common_count = sum(analysis.lower.count(letter) for letter in common_letters)
             if (common_count / text_length) > 0.4:
                 return True
         
@@ -163,8 +188,13 @@ class EnglishAgent(BaseAgent):
     
     def process(self, query: str) -> Dict[str, Any]:
         """Process English language queries and provide appropriate responses."""
+        return self.process_analysis(QueryAnalysis(query))
+    
+    def process_analysis(self, analysis: QueryAnalysis) -> Dict[str, Any]:
+        """Process an analyzed English query and provide an appropriate response."""
+        query = analysis.query
         try:
-            response = self._generate_english_response(query)
+            response = self._generate_english_response(analysis)
             return {
                 "agent": self.name,
                 "success": True,
@@ -181,44 +211,46 @@ class EnglishAgent(BaseAgent):
                 "type": "english_language_response"
             }
     
-    def _generate_english_response(self, query: str) -> str:
+    def _generate_english_response(self, analysis: QueryAnalysis) -> str:
         """Generate appropriate responses for English queries."""
-        query_lower = query.lower().strip()
+        query = analysis.query
+        intents = self._phrase_matcher.labels_of(analysis.find_phrases(self._phrase_matcher))
         
         # Greeting responses
-        if any(greeting in query_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
+        if 'greeting' in intents:
             return "Hello! I'm the English Agent. How can I help you today? I can assist with general questions, provide information, or have a conversation in English."
         
         # Farewell responses
-        if any(farewell in query_lower for farewell in ['goodbye', 'bye', 'see you', 'farewell']):
+        if 'farewell' in intents:
             return "Goodbye! It was nice talking with you. Feel free to come back anytime if you need help with English language queries!"
         
         # Thank you responses
-        if any(thanks in query_lower for thanks in ['thank you', 'thanks', 'thank']):
+        if 'thanks' in intents:
             return "You're welcome! I'm glad I could help. Is there anything else you'd like to know or discuss?"
         
         # Help requests
-        if any(help_word in query_lower for help_word in ['help', 'assist', 'support']):
+        if 'help' in intents:
             return "I'm here to help! I can assist with general questions, provide explanations, discuss topics, or help with English language queries. What would you like to know about?"
         
         # Question identification and responses
         if query.strip().endswith('?'):
-            return self._handle_question(query)
+            return self._handle_question(analysis)
         
         # Information requests
-        if any(word in query_lower for word in ['what is', 'what are', 'tell me about', 'explain', 'describe']):
+        if 'information' in intents:
             return self._handle_information_request(query)
         
         # Opinion or preference queries
-        if any(word in query_lower for word in ['do you think', 'what do you', 'your opinion', 'prefer']):
+        if 'opinion' in intents:
             return self._handle_opinion_request(query)
         
         # General conversation
         return self._handle_general_conversation(query)
     
-    def _handle_question(self, query: str) -> str:
+    def _handle_question(self, analysis: QueryAnalysis) -> str:
         """Handle questions ending with question marks."""
-        query_lower = query.lower()
+        query = analysis.query
+        query_lower = analysis.lower
         
         if query_lower.startswith('what'):
             return f"That's an interesting 'what' question: '{query}'. While I can understand and respond in English, I might not have specific knowledge about every topic. Could you provide more context or rephrase your question?"
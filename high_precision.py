@@ -0,0 +1,198 @@
+"""
+High Precision
+Evaluates constants and expressions such as ``pi``, ``sqrt(2)`` or
+``exp(1) / 3`` to thousands of digits with mpmath. The expression is checked
+against a whitelist AST and evaluated at the requested precision plus guard
+digits; decimal literals are read exactly, so ``0.1`` is one tenth and not the
+nearest float. Meant to run in a worker process under a deadline: mpmath is
+only imported by the first evaluation.
+"""
+
+import ast
+from typing import Any, Callable, Dict, List, Tuple
+
+from query_cache import LRUCache
+from safe_eval import (BINARY_OPERATORS, MAX_EXPRESSION_LENGTH, MAX_NODES, UNARY_OPERATORS,
+                       ExpressionError, ExpressionLimitError)
+
+# Most digits a result may have
+MAX_DIGITS = 100000
+
+# Extra digits carried through the computation and rounded off at the end
+GUARD_DIGITS = 15
+
+# Functions an expression may call, and the mpmath function of each
+FUNCTIONS: Dict[str, str] = {
+    "sqrt": "sqrt", "cbrt": "cbrt", "exp": "exp",
+    "ln": "ln", "log": "ln", "log10": "log10",
+    "sin": "sin", "cos": "cos", "tan": "tan",
+    "asin": "asin", "acos": "acos", "atan": "atan",
+    "arcsin": "asin", "arccos": "acos", "arctan": "atan",
+    "sinh": "sinh", "cosh": "cosh", "tanh": "tanh",
+    "gamma": "gamma", "zeta": "zeta", "abs": "fabs",
+}
+
+# Named constants, and the mpmath constant of each
+CONSTANTS: Dict[str, str] = {"pi": "pi", "e": "e", "phi": "phi", "euler": "euler", "catalan": "catalan"}
+
+# Compiled program: ("num", text) pushes a literal, ("const", name) a constant,
+# ("call", name) applies a function and (operator, arity) an operator
+Program = Tuple[Tuple[str, Any], ...]
+
+_OPERATORS: Dict[str, Callable[..., Any]] = {
+    symbol: function for symbol, function in list(BINARY_OPERATORS.values()) + list(UNARY_OPERATORS.values())
+}
+
+# Compiled expressions
+_programs = LRUCache(max_size=256)
+
+# Constants by (name, precision in bits); mpmath would otherwise rebuild each
+# one from its highest cached precision on every use
+_constants = LRUCache(max_size=64)
+
+
+def compile_expression(expression: str) -> Program:
+    """
+    Parse and check an expression, using the cached program when there is one.
+
+    Args:
+        expression (str): Expression over numbers and ``CONSTANTS``, in Python syntax
+
+    Returns:
+        Program: The compiled stack program
+
+    Raises:
+        ExpressionError: If the expression is not valid or uses anything outside the whitelist
+        ExpressionLimitError: If it is too long or has too many nodes
+    """
+    program = _programs.get(expression)
+    if program is not None:
+        return program
+
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionLimitError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+        raise ExpressionError(f"Invalid expression: {expression}") from e
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ExpressionLimitError(f"Expression has more than {MAX_NODES} operations and numbers")
+
+    source = expression.strip()
+    compiled: List[Tuple[str, Any]] = []
+    pending = [(tree.body, False)]
+    # Iterative post-order walk; a node is emitted after its operands
+    while pending:
+        node, operands_done = pending.pop()
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            # The literal as written, so decimals keep every digit
+            compiled.append(("num", ast.get_source_segment(source, node) or repr(node.value)))
+        elif isinstance(node, ast.Name) and node.id in CONSTANTS:
+            compiled.append(("const", node.id))
+        elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            if operands_done:
+                compiled.append((BINARY_OPERATORS[type(node.op)][0], 2))
+            else:
+                pending.extend([(node, True), (node.right, False), (node.left, False)])
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            if operands_done:
+                compiled.append((UNARY_OPERATORS[type(node.op)][0], 1))
+            else:
+                pending.extend([(node, True), (node.operand, False)])
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+              and len(node.args) == 1 and not node.keywords):
+            if operands_done:
+                compiled.append(("call", node.func.id))
+            else:
+                pending.extend([(node, True), (node.args[0], False)])
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            raise ExpressionError(f"Unknown function '{node.func.id}' or wrong number of arguments")
+        elif isinstance(node, ast.Name):
+            raise ExpressionError(f"Unknown name '{node.id}' in expression: {expression}")
+        else:
+            raise ExpressionError(f"Unsupported syntax in expression: {expression}")
+
+    program = tuple(compiled)
+    _programs.put(expression, program)
+    return program
+
+
+def _constant(mpmath, name: str) -> Any:
+    """A constant at the working precision, computed once per precision."""
+    key = (name, mpmath.mp.prec)
+    value = _constants.get(key)
+    if value is None:
+        value = +getattr(mpmath, CONSTANTS[name])
+        _constants.put(key, value)
+    return value
+
+
+def evaluate(expression: str, digits: int, decimal_places: bool = False) -> str:
+    """
+    Evaluate an expression to a number of digits.
+
+    Args:
+        expression (str): Expression over numbers and ``CONSTANTS``, in Python syntax
+        digits (int): Significant digits, or digits after the decimal point
+        decimal_places (bool): Count ``digits`` after the decimal point
+
+    Returns:
+        str: The value, rounded to the requested digits
+
+    Raises:
+        ExpressionError: If the expression is invalid or its value is not a real number
+        ExpressionLimitError: If more than ``MAX_DIGITS`` digits are requested
+    """
+    if digits < 1:
+        raise ExpressionError("Ask for at least one digit")
+    if digits > MAX_DIGITS:
+        raise ExpressionLimitError(f"At most {MAX_DIGITS} digits can be computed")
+    program = compile_expression(expression)
+
+    import mpmath
+
+    with mpmath.workdps(digits + GUARD_DIGITS):
+        value = _run(mpmath, program)
+        if not decimal_places:
+            return mpmath.nstr(value, digits, strip_zeros=False)
+        if not value:
+            return "0." + "0" * digits
+        # Decimal places need as many more significant digits as the value has before the point
+        integer_digits = int(mpmath.floor(mpmath.log10(abs(value)))) + 1
+
+    significant = digits + integer_digits
+    if significant > MAX_DIGITS:
+        raise ExpressionLimitError(f"The value has more than {MAX_DIGITS} digits")
+    if significant < 1:
+        return ("-" if value < 0 else "") + "0." + "0" * digits
+    if integer_digits > 0:
+        with mpmath.workdps(significant + GUARD_DIGITS):
+            value = _run(mpmath, program)
+    return mpmath.nstr(value, significant, strip_zeros=False, min_fixed=-mpmath.inf, max_fixed=mpmath.inf)
+
+
+def _run(mpmath, program: Program) -> Any:
+    """Run a compiled program at the working precision; the result must be real."""
+    stack: List[Any] = []
+    for symbol, argument in program:
+        if symbol == "num":
+            stack.append(mpmath.mpf(argument))
+        elif symbol == "const":
+            stack.append(_constant(mpmath, argument))
+        elif symbol == "call":
+            stack.append(getattr(mpmath, FUNCTIONS[argument])(stack.pop()))
+        elif argument == 1:
+            stack.append(_OPERATORS[symbol](stack.pop()))
+        else:
+            right = stack.pop()
+            left = stack.pop()
+            if symbol in ("/", "//", "%") and not right:
+                raise ExpressionError("Division by zero")
+            stack.append(_OPERATORS[symbol](left, right))
+
+    value = stack[0]
+    if isinstance(value, mpmath.mpc):
+        raise ExpressionError("The value is not a real number")
+    if not mpmath.isfinite(value):
+        raise ExpressionError("The value is not a finite number")
+    return value
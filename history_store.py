@@ -0,0 +1,243 @@
+"""
+History Store
+Interface for conversation history backends, and the default in-memory store:
+history partitioned by session, with a ring-buffer cap per session and
+global budgets on the number and the size of the stored interactions.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+# Session used when the caller does not identify one (CLI, GUI, scripts)
+DEFAULT_SESSION = "default"
+
+
+def entry_size(query: str, response: Dict[str, Any]) -> int:
+    """
+    Size charged to an interaction against a store's byte budget.
+
+    Counts the characters of the query and of the response's text fields,
+    which hold everything that grows with the query (e.g. a 100,000-digit
+    result); for the ASCII text the agents produce, that is its size in bytes.
+    """
+    return len(query) + sum(len(value) for value in response.values() if isinstance(value, str))
+
+
+class HistoryStore(ABC):
+    """
+    Abstract base class for conversation history backends.
+
+    Interactions are grouped by session and carry an ``id`` that increases
+    across the store, used as the cursor for paged reads. Timestamps use the
+    sortable "%Y-%m-%d %H:%M:%S" format, so time ranges compare as strings.
+    """
+
+    # Whether the history survives a restart
+    durable = False
+
+    @abstractmethod
+    def append(self, session_id: str, query: str, response: Dict[str, Any], timestamp: str) -> int:
+        """
+        Record an interaction for a session.
+
+        Args:
+            session_id (str): The session the interaction belongs to
+            query (str): The user's input query
+            response (Dict[str, Any]): The response given to the user
+            timestamp (str): When the interaction happened
+
+        Returns:
+            int: The id of the new interaction
+        """
+        pass
+
+    @abstractmethod
+    def get(self, session_id: str, after: Optional[int] = None, limit: Optional[int] = None,
+            since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Read a page of a session's history, oldest first.
+
+        Args:
+            session_id (str): The session to read
+            after (Optional[int]): Only return interactions with an id greater than this cursor
+            limit (Optional[int]): Maximum number of interactions to return
+            since (Optional[str]): Only return interactions at or after this timestamp
+            until (Optional[str]): Only return interactions at or before this timestamp
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[int]]: The interactions, and the cursor
+            to pass as ``after`` for the next page (None if nothing was returned)
+        """
+        pass
+
+    @abstractmethod
+    def count(self, session_id: Optional[str] = None) -> int:
+        """Number of stored interactions for a session, or for all sessions."""
+        pass
+
+    @abstractmethod
+    def last_timestamp(self, session_id: Optional[str] = None) -> Optional[str]:
+        """Timestamp of the latest interaction of a session, or of any session."""
+        pass
+
+    @abstractmethod
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """Clear the history of one session, or of every session."""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the store's size and settings."""
+        pass
+
+    def flush(self) -> None:
+        """Write out any buffered interactions; nothing to do for unbuffered stores."""
+        pass
+
+    def close(self) -> None:
+        """Flush and release the store's resources."""
+        self.flush()
+
+
+class SessionHistoryStore(HistoryStore):
+    """
+    In-memory history store with bounded memory use.
+
+    Each session keeps at most ``max_entries_per_session`` interactions, the
+    oldest being dropped first. When all sessions together exceed
+    ``max_total_entries`` interactions or ``max_total_bytes`` of text (see
+    ``entry_size``), the oldest interactions of the least recently active
+    session are dropped. Appends are O(1), amortized over the evictions.
+
+    Every interaction gets an ``id`` that increases across the store, used as
+    the cursor for paged reads.
+    """
+
+    def __init__(self, max_entries_per_session: int = 200, max_total_entries: int = 10000,
+                 max_total_bytes: int = 64 * 1024 * 1024):
+        self.max_entries_per_session = max_entries_per_session
+        self.max_total_entries = max_total_entries
+        self.max_total_bytes = max_total_bytes
+
+        # Sessions ordered from least to most recently active; each entry is
+        # kept with its size, as the response may be changed after it is stored
+        self._sessions: "OrderedDict[str, Deque[Tuple[int, Dict[str, Any]]]]" = OrderedDict()
+        self._next_id = 0
+        self._total_entries = 0
+        self._total_bytes = 0
+        self._last_interaction: Optional[str] = None
+        self._lock = threading.Lock()
+
+        # Interactions dropped to respect the caps
+        self.evictions = 0
+
+    def append(self, session_id: str, query: str, response: Dict[str, Any], timestamp: str) -> int:
+        """Record an interaction for a session, evicting old ones to respect the caps."""
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is None:
+                entries = deque(maxlen=self.max_entries_per_session)
+                self._sessions[session_id] = entries
+            else:
+                self._sessions.move_to_end(session_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+
+            if len(entries) == entries.maxlen:
+                # The deque drops its oldest entry on append
+                self._total_entries -= 1
+                self._total_bytes -= entries[0][0]
+                self.evictions += 1
+
+            size = entry_size(query, response)
+            entries.append((size, {
+                "id": entry_id,
+                "query": query,
+                "response": response,
+                "timestamp": timestamp,
+            }))
+            self._total_entries += 1
+            self._total_bytes += size
+            self._last_interaction = timestamp
+
+            # An interaction larger than the whole budget is not kept either
+            while self._total_entries > self.max_total_entries or self._total_bytes > self.max_total_bytes:
+                self._evict_oldest()
+
+            return entry_id
+
+    def _evict_oldest(self) -> None:
+        """Drop the oldest interaction of the least recently active session."""
+        session_id, entries = next(iter(self._sessions.items()))
+        size, _ = entries.popleft()
+        self._total_entries -= 1
+        self._total_bytes -= size
+        self.evictions += 1
+        if not entries:
+            del self._sessions[session_id]
+
+    def get(self, session_id: str, after: Optional[int] = None, limit: Optional[int] = None,
+            since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Read a page of a session's history, oldest first."""
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if not entries:
+                return [], None
+
+            remaining = (entry for _, entry in entries)
+            if after is not None or since is not None or until is not None:
+                remaining = (
+                    entry for _, entry in entries
+                    if (after is None or entry["id"] > after)
+                    and (since is None or entry["timestamp"] >= since)
+                    and (until is None or entry["timestamp"] <= until)
+                )
+            page = list(islice(remaining, limit))
+
+        return page, (page[-1]["id"] if page else None)
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        """Number of stored interactions for a session, or for all sessions."""
+        if session_id is None:
+            return self._total_entries
+        entries = self._sessions.get(session_id)
+        return len(entries) if entries else 0
+
+    def last_timestamp(self, session_id: Optional[str] = None) -> Optional[str]:
+        """Timestamp of the latest interaction of a session, or of any session."""
+        if session_id is None:
+            return self._last_interaction
+        entries = self._sessions.get(session_id)
+        return entries[-1][1]["timestamp"] if entries else None
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """Clear the history of one session, or of every session."""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._total_entries = 0
+                self._total_bytes = 0
+                self._last_interaction = None
+            else:
+                entries = self._sessions.pop(session_id, None)
+                if entries:
+                    self._total_entries -= len(entries)
+                    self._total_bytes -= sum(size for size, _ in entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the store's size and limits."""
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "total_entries": self._total_entries,
+            "total_bytes": self._total_bytes,
+            "max_entries_per_session": self.max_entries_per_session,
+            "max_total_entries": self.max_total_entries,
+            "max_total_bytes": self.max_total_bytes,
+            "evictions": self.evictions,
+        }
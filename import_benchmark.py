@@ -0,0 +1,106 @@
+"""
+Import Time Benchmark
+Measures the cold start of ``cli.py --version`` and of a first plain query,
+``cli.py "hello"``, in fresh interpreters. Fails when either goes over a time
+budget or imports a module it should not need, so heavy imports don't creep
+back into startup or into the path of queries that don't use them.
+
+Usage:
+  python import_benchmark.py                 # Default budget
+  python import_benchmark.py --budget 0.3    # Budget in seconds
+  python import_benchmark.py --show-imports  # Also list the slowest imports
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+
+# Budget for the median cold start of each command, in seconds
+DEFAULT_BUDGET = float(os.environ.get("AGENT_IMPORT_BUDGET", "0.5"))
+
+# Modules only the math, web and durable history paths need
+HEAVY_MODULES = ("sympy", "langdetect", "numpy", "mpmath", "flask", "multiprocessing", "sqlite3")
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+# Commands timed, and the modules each must not import. Printing the version
+# loads no agent at all; a greeting loads the agents and detects the language,
+# but none of the math, web or storage dependencies
+COMMANDS: Tuple[Tuple[List[str], Tuple[str, ...]], ...] = (
+    (["--version"], HEAVY_MODULES + ("math_agent", "english_agent", "spanish_agent", "language_id")),
+    (["--quiet", "hello"], HEAVY_MODULES),
+)
+
+
+def time_cold_start(arguments: List[str], runs: int) -> List[float]:
+    """Run ``cli.py`` with the arguments in fresh interpreters and return the wall time of each run."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI_PATH] + arguments, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def profile_imports(arguments: List[str]) -> List[Tuple[str, int]]:
+    """Import every module ``cli.py`` needs for the arguments under ``-X importtime``, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", CLI_PATH] + arguments,
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        imports.append((parts[2].rstrip(), int(parts[1])))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def main() -> int:
+    """Run the benchmark; returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Cold start budget check for cli.py --version and a first query")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='Maximum median cold start in seconds (env: AGENT_IMPORT_BUDGET)')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to time')
+    parser.add_argument('--show-imports', action='store_true', help='List the slowest imports')
+    args = parser.parse_args()
+
+    failed = False
+    for arguments, forbidden in COMMANDS:
+        label = "cli.py " + " ".join(arguments)
+        timings = sorted(time_cold_start(arguments, args.runs))
+        median = timings[len(timings) // 2]
+        print(f"{label} cold start: median {median * 1000:.1f} ms, "
+              f"min {timings[0] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms ({args.runs} runs)")
+
+        imports = profile_imports(arguments)
+        loaded = {name.strip() for name, _ in imports}
+        heavy = [module for module in forbidden if module in loaded]
+
+        if args.show_imports:
+            print("  Slowest imports (cumulative):")
+            for name, microseconds in imports[:15]:
+                print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+        if heavy:
+            print(f"❌ {label} imported heavy modules: {', '.join(heavy)}")
+            failed = True
+        if median > args.budget:
+            print(f"❌ {label} is over budget: {median * 1000:.1f} ms > {args.budget * 1000:.1f} ms")
+            failed = True
+
+    if failed:
+        return 1
+    print(f"✅ Within budget of {args.budget * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
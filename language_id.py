@@ -0,0 +1,289 @@
+"""
+Language Identifier
+Character n-gram language identifier trained from the bundled language
+profiles. N-grams are hashed into a fixed-size count vector and scored against
+per-language log-probability weights with a single dot product (a multinomial
+naive Bayes model). Texts too short or too unlike any profile to tell, such
+as "0ybz8", "12 minus 5" or random letters, get no language. A single text is
+scored from cached per-word scores in plain Python; batches sum the same
+scores with NumPy when it is installed, which is only imported for them.
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+from importlib.util import find_spec
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# NumPy is imported by the first batch, so single detections never load it
+NUMPY_AVAILABLE = find_spec("numpy") is not None
+
+
+# Training text, one <language code>.txt file per language
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_data", "profiles")
+
+# Languages below this probability are left out of the results, as langdetect does
+PROBABILITY_THRESHOLD = 0.1
+
+# Runs of letters; digits, punctuation and symbols separate words
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+# Texts without a word this long, like "a1b2" or "ba28960", are not identified,
+# nor are texts with as many digits as letters, like "49a6aay25587"
+MIN_WORD_LENGTH = 3
+
+# Texts whose n-grams are on average less than this many nats more likely in
+# the best language than a uniform guess among the hash buckets are not
+# identified; random letters like "eeybp oybjp zypj" fall well short
+MIN_NGRAM_LIFT = 1.6
+
+# Texts whose most likely language is below this confidence are not
+# identified, like "12 minus 5" ("minus" is as likely Spanish as Italian)
+MIN_CONFIDENCE = 0.6
+
+# Words whose hashed n-grams and scores are remembered, so repeated words aren't hashed again
+WORD_CACHE_SIZE = 50000
+
+
+class NgramLanguageIdentifier:
+    """
+    Multinomial naive Bayes language identifier over hashed character n-grams.
+
+    Each word is padded with spaces and split into n-grams, which are hashed
+    into ``num_features`` buckets. A text's score for a language is the dot
+    product of its bucket counts with the language's smoothed log-probabilities,
+    and the scores are normalized into confidences. As the score is a sum over
+    the text's words, each word's scores are cached. Texts get no language
+    without a word of ``MIN_WORD_LENGTH`` letters or with as many digits as
+    letters, when their n-grams fit even the best language poorly
+    (``MIN_NGRAM_LIFT``), or when no language reaches ``MIN_CONFIDENCE``.
+    Results are deterministic: the same text always gets the same languages
+    and confidences.
+    """
+
+    def __init__(self, training_texts: Dict[str, str], ngram_range: Tuple[int, int] = (1, 3),
+                 num_features: int = 4096, smoothing: float = 0.5):
+        """
+        Train the model.
+
+        Args:
+            training_texts (Dict[str, str]): Training text for each language code
+            ngram_range (Tuple[int, int]): Smallest and largest n-gram length
+            num_features (int): Number of hash buckets n-grams are counted in
+            smoothing (float): Additive smoothing for n-grams unseen in training
+        """
+        if not training_texts:
+            raise ValueError("training_texts must not be empty")
+
+        self.ngram_range = ngram_range
+        self.num_features = num_features
+        self.smoothing = smoothing
+        self.languages: List[str] = sorted(training_texts)
+        self._word_features: Dict[str, List[int]] = {}
+        self._word_scores: Dict[str, Tuple[int, Tuple[float, ...]]] = {}
+        # Lowest average n-gram score of the best language a text may have
+        self._min_ngram_score = MIN_NGRAM_LIFT - math.log(num_features)
+
+        # Log-probability of each hash bucket, one row per language
+        self._weights: List[List[float]] = []
+        for language in self.languages:
+            counts = [0] * num_features
+            for index, count in self.vectorize(training_texts[language]).items():
+                counts[index] += count
+            denominator = math.log(sum(counts) + smoothing * num_features)
+            self._weights.append([math.log(count + smoothing) - denominator for count in counts])
+
+    @classmethod
+    def from_directory(cls, path: str = PROFILES_DIR, **kwargs) -> "NgramLanguageIdentifier":
+        """Train a model from a directory of ``<language code>.txt`` files."""
+        training_texts = {}
+        for filename in sorted(os.listdir(path)):
+            language, extension = os.path.splitext(filename)
+            if extension == ".txt":
+                with open(os.path.join(path, filename), encoding="utf-8") as profile:
+                    training_texts[language] = profile.read()
+        return cls(training_texts, **kwargs)
+
+    def vectorize(self, text: str) -> Dict[int, int]:
+        """
+        Count the hashed n-grams of a text.
+
+        Args:
+            text (str): The text to vectorize
+
+        Returns:
+            Dict[int, int]: Count of each non-empty hash bucket
+        """
+        counts: Dict[int, int] = {}
+        for word in WORD_PATTERN.findall(text.lower()):
+            features = self._word_features.get(word)
+            if features is None:
+                features = self._hash_word(word)
+            for index in features:
+                counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def _hash_word(self, word: str) -> List[int]:
+        """Hash bucket of every n-gram of a space-padded word."""
+        min_n, max_n = self.ngram_range
+        padded = f" {word} "
+        features = [
+            zlib.crc32(padded[start:start + n].encode("utf-8")) % self.num_features
+            for n in range(min_n, max_n + 1)
+            for start in range(len(padded) - n + 1)
+            if padded[start:start + n] != " "
+        ]
+        if len(self._word_features) >= WORD_CACHE_SIZE:
+            self._word_features.clear()
+        self._word_features[word] = features
+        return features
+
+    def detect_probabilities(self, text: str) -> Dict[str, float]:
+        """
+        Identify the language of a text.
+
+        Args:
+            text (str): The text to identify
+
+        Returns:
+            Dict[str, float]: Likely languages and their confidences, most likely
+            first; empty if the language cannot be told
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        if not self._has_evidence(text, words):
+            return {}
+        ngram_count = 0
+        scores: List[float] = [0.0] * len(self.languages)
+        for word in words:
+            word_scores = self._word_scores.get(word)
+            if word_scores is None:
+                word_scores = self._score_word(word)
+            ngram_count += word_scores[0]
+            scores = [score + word_score for score, word_score in zip(scores, word_scores[1])]
+        return self._normalize(scores, ngram_count)
+
+    def _score_word(self, word: str) -> Tuple[int, Tuple[float, ...]]:
+        """Number of n-grams of a word, and the score of one occurrence for each language."""
+        features = self._word_features.get(word)
+        if features is None:
+            features = self._hash_word(word)
+        scores = tuple(sum(weights[index] for index in features) for weights in self._weights)
+        if len(self._word_scores) >= WORD_CACHE_SIZE:
+            self._word_scores.clear()
+        # Returned from a local: another thread may clear the cache meanwhile
+        word_scores = (len(features), scores)
+        self._word_scores[word] = word_scores
+        return word_scores
+
+    @staticmethod
+    def _has_evidence(text: str, words: List[str]) -> bool:
+        """Whether a text has a word long enough to tell its language by, and fewer digits than letters."""
+        if not any(len(word) >= MIN_WORD_LENGTH for word in words):
+            return False
+        letters = sum(len(word) for word in words)
+        # Only a text that is at most half letters can have more digits
+        return letters * 2 >= len(text) or letters > sum(char.isdigit() for char in text)
+
+    def detect(self, text: str) -> Optional[str]:
+        """The most likely language code of a text, or None if it cannot be told."""
+        probabilities = self.detect_probabilities(text)
+        return next(iter(probabilities), None)
+
+    def detect_batch(self, texts: Iterable[str], chunk_size: int = 256) -> List[Dict[str, float]]:
+        """
+        Identify the language of many texts at once.
+
+        With NumPy, the cached scores of the distinct words in a chunk of texts
+        are gathered into a table once, and the rows of each text's words are
+        summed and normalized in a few array operations.
+
+        Args:
+            texts (Iterable[str]): The texts to identify
+            chunk_size (int): Number of texts scored together
+
+        Returns:
+            List[Dict[str, float]]: The result of ``detect_probabilities`` for each text
+        """
+        texts = list(texts)
+        if not NUMPY_AVAILABLE or len(texts) < 2:
+            return [self.detect_probabilities(text) for text in texts]
+
+        import numpy as np
+
+        results: List[Dict[str, float]] = [{} for _ in texts]
+        for offset in range(0, len(texts), chunk_size):
+            # Each distinct word of the chunk gets a row of cached scores; the
+            # texts are runs of rows, summed in one array operation
+            rows: Dict[str, int] = {}
+            table: List[Tuple[float, ...]] = []
+            row_ngrams: List[int] = []
+            word_rows: List[int] = []
+            starts: List[int] = []
+            ngram_counts: List[int] = []
+            positions: List[int] = []
+            for position in range(offset, min(offset + chunk_size, len(texts))):
+                text = texts[position]
+                words = WORD_PATTERN.findall(text.lower())
+                if not self._has_evidence(text, words):
+                    continue
+                positions.append(position)
+                starts.append(len(word_rows))
+                ngram_count = 0
+                for word in words:
+                    row = rows.get(word)
+                    if row is None:
+                        word_scores = self._word_scores.get(word)
+                        if word_scores is None:
+                            word_scores = self._score_word(word)
+                        row = rows[word] = len(table)
+                        table.append(word_scores[1])
+                        row_ngrams.append(word_scores[0])
+                    word_rows.append(row)
+                    ngram_count += row_ngrams[row]
+                ngram_counts.append(ngram_count)
+            if not positions:
+                continue
+
+            scores = np.add.reduceat(np.array(table)[word_rows], starts, axis=0)
+            best = scores.max(axis=1, keepdims=True)
+            fits = best[:, 0] / np.array(ngram_counts)
+            scores -= best
+            probabilities = np.exp(scores)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+            for position, fit, row in zip(positions, fits.tolist(), probabilities.tolist()):
+                if fit >= self._min_ngram_score:
+                    results[position] = self._format(row)
+        return results
+
+    def _normalize(self, scores: List[float], ngram_count: int) -> Dict[str, float]:
+        """Turn per-language scores of a text with this many n-grams into confidences."""
+        best = max(scores)
+        if best / ngram_count < self._min_ngram_score:
+            return {}
+        exponentials = [math.exp(score - best) for score in scores]
+        total = sum(exponentials)
+        return self._format([value / total for value in exponentials])
+
+    def _format(self, probabilities: List[float]) -> Dict[str, float]:
+        """Map confidences to language codes, most likely first, dropping unlikely languages."""
+        if max(probabilities) < MIN_CONFIDENCE:
+            return {}
+        ranked = sorted(zip(self.languages, probabilities), key=lambda item: item[1], reverse=True)
+        return {language: probability for language, probability in ranked if probability >= PROBABILITY_THRESHOLD}
+
+
+_identifier: Optional[NgramLanguageIdentifier] = None
+_identifier_lock = threading.Lock()
+
+
+def get_language_identifier() -> NgramLanguageIdentifier:
+    """Get the shared identifier, training it from the bundled profiles on first use."""
+    global _identifier
+    if _identifier is None:
+        with _identifier_lock:
+            if _identifier is None:
+                _identifier = NgramLanguageIdentifier.from_directory()
+    return _identifier
@@ -0,0 +1,446 @@
+"""
+Linear Algebra
+Matrix literals, matrix operations and systems of linear equations on NumPy.
+Matrices are written inline as ``[[1, 2], [3, 4]]`` or ``[1 2; 3 4]``;
+systems as equations such as ``2x + 3y = 5, x - y = 1``. Equations are read
+by a flat term scanner rather than a recursive parser, so a pasted system of
+hundreds of equations costs one pass per equation, and it is solved by
+LAPACK through ``numpy.linalg`` instead of symbolically.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from safe_eval import ExpressionError, ExpressionLimitError
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Largest number of rows or columns of a matrix, and of equations or unknowns of a system
+MAX_DIMENSION = 1000
+
+# Rows and columns shown when a matrix or a solution is written out
+MAX_SHOWN = 10
+
+# Relative tolerance under which a value is written as an integer
+INTEGER_TOLERANCE = 1e-9
+
+# Operations on matrices, and how each is named in messages
+OPERATIONS: Dict[str, str] = {
+    "inverse": "Inverse", "determinant": "Determinant", "eigenvalues": "Eigenvalues",
+    "transpose": "Transpose", "rank": "Rank", "trace": "Trace", "multiply": "Multiply",
+    "add": "Add", "subtract": "Subtract", "solve": "Solve",
+}
+
+# Words naming each operation, tried in order on the lowercased text outside the matrices
+OPERATION_WORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("inverse", ("inverse", "invert")),
+    ("determinant", ("determinant", "det")),
+    ("eigenvalues", ("eigen",)),
+    ("transpose", ("transpose",)),
+    ("rank", ("rank",)),
+    ("trace", ("trace",)),
+    ("solve", ("solve", "=")),
+    ("multiply", ("multiply", "product", "times", "*", "@", "×")),
+    ("add", ("add", "sum", "plus", "+")),
+    ("subtract", ("subtract", "difference", "minus", "-")),
+]
+
+# Entries of a matrix literal: integer, decimal or scientific notation
+_NUMBER_PATTERN = re.compile(r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?')
+
+# Rows of a "[1 2; 3 4]" literal are separated by semicolons
+_ROW_SEPARATOR = re.compile(r'\s*;\s*')
+
+# A term "3x", "2.5 * y", "x" or "7" of a linear equation, and a side made of them
+_TERM_BODY = r'(?:(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?(?:\s*\*?\s*[A-Za-z_][A-Za-z_0-9]*)?|[A-Za-z_][A-Za-z_0-9]*)'
+_LINEAR_SIDE = re.compile(rf'\s*[-+]?\s*{_TERM_BODY}(?:\s*[-+]\s*{_TERM_BODY})*\s*')
+_LINEAR_TERM = re.compile(
+    r'([-+]?)\s*(?:((?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)(?:\s*\*?\s*([A-Za-z_][A-Za-z_0-9]*))?|([A-Za-z_][A-Za-z_0-9]*))'
+)
+
+# Tokens of a linear equation side, for terms the side pattern doesn't cover
+_TERM_TOKEN = re.compile(
+    r'\s*(?:(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)|(?P<name>[A-Za-z_][A-Za-z_0-9]*)|(?P<op>[-+*/]))'
+)
+
+# Separators between the equations of a system
+_EQUATION_SEPARATOR = re.compile(r'\s*(?:[,;\n]|\band\b)\s*')
+
+# Words before the first equation and after the last one
+_SYSTEM_PREFIX = re.compile(
+    r'^\s*(?:please\s+)?(?:(?:solve|find|compute)\s+)?(?:the\s+)?(?:(?:linear\s+)?system(?:\s+of\s+(?:linear\s+)?equations)?\s*)?:?\s*',
+    re.IGNORECASE
+)
+_SYSTEM_SUFFIX = re.compile(r'\s+for\s+[A-Za-z_][\w,\s]*$|[.?!]+$', re.IGNORECASE)
+
+
+def find_matrices(text: str) -> List[Tuple[int, int, "np.ndarray"]]:
+    """
+    Find the matrix and vector literals in a text.
+
+    Args:
+        text (str): Text with literals such as ``[[1, 2], [3, 4]]``, ``[1 2; 3 4]`` or ``[5, 6]``
+
+    Returns:
+        List[Tuple[int, int, np.ndarray]]: Start and end offsets and value of each
+        literal, in order; vectors are 1-D arrays
+
+    Raises:
+        ExpressionError: If a bracketed literal is not a rectangular array of numbers
+        ExpressionLimitError: If it has more than ``MAX_DIMENSION`` rows or columns
+    """
+    literals = []
+    position = 0
+    while True:
+        start = text.find('[', position)
+        if start < 0:
+            return literals
+        # The matching bracket; literals nest at most two deep
+        depth = 0
+        for end in range(start, len(text)):
+            if text[end] == '[':
+                depth += 1
+            elif text[end] == ']':
+                depth -= 1
+                if depth == 0:
+                    break
+        else:
+            raise ExpressionError("Unbalanced brackets in matrix")
+        literals.append((start, end + 1, parse_matrix(text[start:end + 1])))
+        position = end + 1
+
+
+def parse_matrix(literal: str) -> "np.ndarray":
+    """
+    Parse one matrix or vector literal.
+
+    Args:
+        literal (str): ``[[1, 2], [3, 4]]``, ``[1 2; 3 4]``, ``[1, 2]`` or ``[1 2]``
+
+    Returns:
+        np.ndarray: 2-D array for a matrix, 1-D for a vector
+    """
+    inner = literal.strip()[1:-1].strip()
+    if inner.startswith('['):
+        rows = [row.strip() for row in re.findall(r'\[([^\[\]]*)\]', inner)]
+        if re.sub(r'\[[^\[\]]*\]|[\s,;]', '', inner):
+            raise ExpressionError(f"Invalid matrix: {literal}")
+    elif ';' in inner:
+        rows = _ROW_SEPARATOR.split(inner)
+    else:
+        rows = None
+
+    if rows is None:
+        vector = _parse_row(inner, literal)
+        if len(vector) > MAX_DIMENSION:
+            raise ExpressionLimitError(f"Vectors can have at most {MAX_DIMENSION} entries")
+        return np.array(vector, dtype=float)
+
+    if len(rows) > MAX_DIMENSION:
+        raise ExpressionLimitError(f"Matrices can have at most {MAX_DIMENSION} rows")
+    values = [_parse_row(row, literal) for row in rows]
+    if len({len(row) for row in values}) != 1:
+        raise ExpressionError(f"Rows of the matrix have different lengths: {literal}")
+    if len(values[0]) > MAX_DIMENSION:
+        raise ExpressionLimitError(f"Matrices can have at most {MAX_DIMENSION} columns")
+    return np.array(values, dtype=float)
+
+
+def _parse_row(row: str, literal: str) -> List[float]:
+    """Numbers of a row, separated by commas or spaces."""
+    numbers = _NUMBER_PATTERN.findall(row)
+    if not numbers or _NUMBER_PATTERN.sub('', row).strip(' ,\t'):
+        raise ExpressionError(f"Invalid matrix: {literal}")
+    return [float(number) for number in numbers]
+
+
+def _parse_side(text: str, equation: str) -> Tuple[Dict[str, float], float]:
+    """
+    Read one side of a linear equation as coefficients per unknown and a constant.
+
+    Terms are a signed product of numbers and at most one unknown, such as
+    ``-3x``, ``2.5 * y``, ``x1 / 4`` or ``7``.
+    """
+    coefficients: Dict[str, float] = {}
+    constant = 0.0
+    # Most sides are sums of "3x" terms, read by one regex pass
+    if _LINEAR_SIDE.fullmatch(text):
+        for sign, number, unknown, alone in _LINEAR_TERM.findall(text):
+            value = float(number) if number else 1.0
+            if sign == '-':
+                value = -value
+            unknown = unknown or alone
+            if unknown:
+                coefficients[unknown] = coefficients.get(unknown, 0.0) + value
+            else:
+                constant += value
+        return coefficients, constant
+
+    matches = list(_TERM_TOKEN.finditer(text))
+    # Anything the tokens don't cover, such as "^" or "(", is not part of a linear term
+    if sum(match.end() - match.start() for match in matches) != len(text.rstrip()):
+        raise ExpressionError(f"Could not read the equation: {equation}")
+    tokens = [(match.lastgroup, match.group(match.lastgroup)) for match in matches]
+
+    index = 0
+    while index < len(tokens):
+        sign = 1.0
+        while index < len(tokens) and tokens[index][1] in ('+', '-'):
+            if tokens[index][1] == '-':
+                sign = -sign
+            index += 1
+
+        # Factors of the term, joined by '*', '/' or nothing as in "3x"
+        value, unknown = sign, None
+        divide, expect_factor = False, True
+        while index < len(tokens) and not (tokens[index][1] in ('+', '-') and not expect_factor):
+            kind, token = tokens[index]
+            index += 1
+            if kind == 'op':
+                if expect_factor:
+                    raise ExpressionError(f"Could not read the equation: {equation}")
+                divide, expect_factor = token == '/', True
+                continue
+            if kind == 'number':
+                if divide and not float(token):
+                    raise ExpressionError(f"Division by zero in equation: {equation}")
+                value = value / float(token) if divide else value * float(token)
+            elif divide or unknown is not None:
+                raise ExpressionError(f"Equation is not linear: {equation}")
+            else:
+                unknown = token
+            divide, expect_factor = False, False
+        if expect_factor:
+            raise ExpressionError(f"Could not read the equation: {equation}")
+
+        if unknown is None:
+            constant += value
+        else:
+            coefficients[unknown] = coefficients.get(unknown, 0.0) + value
+    return coefficients, constant
+
+
+def parse_linear_system(text: str) -> Tuple["np.ndarray", "np.ndarray", List[str]]:
+    """
+    Parse a system of linear equations such as ``2x + 3y = 5, x - y = 1``.
+
+    Equations are separated by commas, semicolons, newlines or "and"; a
+    leading "solve" and a trailing "for x and y" are ignored.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[str]]: Coefficient matrix A, right-hand
+        side b and the unknowns in order of appearance, so that A x = b
+
+    Raises:
+        ExpressionError: If an equation is not linear or cannot be read
+        ExpressionLimitError: If there are more than ``MAX_DIMENSION`` equations or unknowns
+    """
+    body = _SYSTEM_SUFFIX.sub('', _SYSTEM_PREFIX.sub('', text.strip()))
+    equations = [equation for equation in _EQUATION_SEPARATOR.split(body) if equation]
+    if len(equations) > MAX_DIMENSION:
+        raise ExpressionLimitError(f"Systems can have at most {MAX_DIMENSION} equations")
+
+    rows = []
+    unknowns: Dict[str, int] = {}
+    for equation in equations:
+        sides = equation.split('=')
+        if len(sides) != 2:
+            raise ExpressionError(f"Not an equation: {equation}")
+        left, left_constant = _parse_side(sides[0], equation)
+        right, right_constant = _parse_side(sides[1], equation)
+        for unknown, coefficient in right.items():
+            left[unknown] = left.get(unknown, 0.0) - coefficient
+        for unknown in left:
+            unknowns.setdefault(unknown, len(unknowns))
+        rows.append((left, right_constant - left_constant))
+
+    if not unknowns:
+        raise ExpressionError("The equations have no unknowns")
+    if len(unknowns) > MAX_DIMENSION:
+        raise ExpressionLimitError(f"Systems can have at most {MAX_DIMENSION} unknowns")
+
+    matrix = np.zeros((len(rows), len(unknowns)))
+    constants = np.empty(len(rows))
+    for row, (coefficients, constant) in enumerate(rows):
+        matrix[row, [unknowns[unknown] for unknown in coefficients]] = list(coefficients.values())
+        constants[row] = constant
+    return matrix, constants, list(unknowns)
+
+
+def solve_linear_system(matrix: "np.ndarray", constants: "np.ndarray") -> Tuple[Optional["np.ndarray"], str]:
+    """
+    Solve A x = b.
+
+    A square system of full rank goes straight to LAPACK's LU solver
+    (``numpy.linalg.solve``). Any other system is classified by rank: with no
+    solution, None is returned; with infinitely many, the least-squares
+    solution of smallest norm.
+
+    Returns:
+        Tuple[Optional[np.ndarray], str]: The solution, and "unique",
+        "infinite" or "none"
+    """
+    if constants.shape[0] != matrix.shape[0]:
+        raise ExpressionError(f"A has {matrix.shape[0]} rows but b has {constants.shape[0]} entries")
+
+    if matrix.shape[0] == matrix.shape[1]:
+        try:
+            return np.linalg.solve(matrix, constants), "unique"
+        except np.linalg.LinAlgError:
+            pass  # Singular: classify by rank below
+
+    rank = np.linalg.matrix_rank(matrix)
+    if rank < np.linalg.matrix_rank(np.column_stack([matrix, constants])):
+        return None, "none"
+    solution = np.linalg.lstsq(matrix, constants, rcond=None)[0]
+    return solution, "unique" if rank == matrix.shape[1] else "infinite"
+
+
+def find_operation(text: str) -> Optional[str]:
+    """
+    The operation a query asks for, from the text around its matrices.
+
+    Returns:
+        Optional[str]: A key of ``OPERATIONS``, or None if no operation is named
+    """
+    for operation, words in OPERATION_WORDS:
+        if any(word in text for word in words):
+            return operation
+    return None
+
+
+def _square(matrix: "np.ndarray", operation: str) -> "np.ndarray":
+    """Check that an operation gets a square matrix."""
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ExpressionError(f"The {operation} needs a square matrix, not {_shape(matrix)}")
+    return matrix
+
+
+def _shape(matrix: "np.ndarray") -> str:
+    """Shape of a matrix as "2x3", or of a vector as "a vector of 3"."""
+    if matrix.ndim == 1:
+        return f"a vector of {matrix.shape[0]}"
+    return f"a {matrix.shape[0]}x{matrix.shape[1]} matrix"
+
+
+def apply_operation(operation: str, matrices: List["np.ndarray"]) -> str:
+    """
+    Apply an operation to the matrices of a query.
+
+    Args:
+        operation (str): A key of ``OPERATIONS``
+        matrices (List[np.ndarray]): The matrices, in the order they appear
+
+    Returns:
+        str: The answer
+
+    Raises:
+        ExpressionError: If the matrices don't fit the operation
+    """
+    matrix = matrices[0]
+    if operation in ("multiply", "add", "subtract", "solve") and len(matrices) < 2:
+        raise ExpressionError(f"{OPERATIONS[operation]} needs two matrices")
+
+    try:
+        if operation == "inverse":
+            return f"The inverse is {format_matrix(np.linalg.inv(_square(matrix, operation)))}"
+        if operation == "determinant":
+            return f"The determinant is {format_number(np.linalg.det(_square(matrix, operation)))}"
+        if operation == "eigenvalues":
+            matrix = _square(matrix, operation)
+            if np.allclose(matrix, matrix.T):
+                values = np.linalg.eigvalsh(matrix)
+            else:
+                values = np.linalg.eigvals(matrix)
+                values = values[np.lexsort((values.imag, values.real))]
+            return f"The eigenvalues are {format_vector(values)}"
+        if operation == "transpose":
+            return f"The transpose is {format_matrix(np.atleast_2d(matrix).T)}"
+        if operation == "rank":
+            return f"The rank is {np.linalg.matrix_rank(matrix)}"
+        if operation == "trace":
+            return f"The trace is {format_number(np.trace(_square(matrix, operation)))}"
+        if operation == "multiply":
+            result = matrix
+            for other in matrices[1:]:
+                result = result @ other
+            return f"The product is {format_matrix(np.atleast_1d(result))}"
+        if operation in ("add", "subtract"):
+            if any(other.shape != matrix.shape for other in matrices[1:]):
+                raise ExpressionError(f"Can only {operation} matrices of the same shape")
+            result = matrix + sum(matrices[1:]) if operation == "add" else matrix - sum(matrices[1:])
+            return f"The {'sum' if operation == 'add' else 'difference'} is {format_matrix(result)}"
+        if operation == "solve":
+            solution, kind = solve_linear_system(matrix, matrices[1])
+            return _describe_solution(solution, kind, [f"x{index}" for index in range(1, matrix.shape[1] + 1)])
+    except np.linalg.LinAlgError as e:
+        if str(e) == "Singular matrix":
+            raise ExpressionError("The matrix is singular") from e
+        raise ExpressionError(f"Could not compute the {operation}: {str(e)}") from e
+    except ValueError as e:
+        # NumPy reports mismatched shapes as ValueError
+        shapes = " and ".join(_shape(other) for other in matrices)
+        raise ExpressionError(f"Can't {OPERATIONS[operation].lower()} {shapes}") from e
+    raise ExpressionError(f"Unknown matrix operation '{operation}'")
+
+
+def describe_system(text: str) -> str:
+    """
+    Solve a system of linear equations and write out the solution.
+
+    Raises:
+        ExpressionError: If the text is not a system of linear equations
+    """
+    matrix, constants, unknowns = parse_linear_system(text)
+    solution, kind = solve_linear_system(matrix, constants)
+    return _describe_solution(solution, kind, unknowns)
+
+
+def _describe_solution(solution: Optional["np.ndarray"], kind: str, unknowns: List[str]) -> str:
+    """The solution of a system, every unknown written out."""
+    if kind == "none":
+        return "The system has no solution"
+    values = ", ".join(f"{unknown} = {format_number(value)}" for unknown, value in zip(unknowns, solution))
+    if kind == "infinite":
+        return f"The system has infinitely many solutions, for example {values}"
+    return f"The solution is {values}"
+
+
+def format_number(value: complex) -> str:
+    """A value with up to 10 significant digits, integers and real numbers written plainly."""
+    if isinstance(value, complex) or np.iscomplexobj(value):
+        if abs(value.imag) <= INTEGER_TOLERANCE * max(1.0, abs(value.real)):
+            value = value.real
+        else:
+            sign = '+' if value.imag >= 0 else '-'
+            return f"{format_number(value.real)} {sign} {format_number(abs(value.imag))}i"
+    value = float(value)
+    if abs(value - round(value)) <= INTEGER_TOLERANCE * max(1.0, abs(value)) and abs(value) < 1e15:
+        return str(int(round(value)))
+    return f"{value:.10g}"
+
+
+def format_vector(vector: "np.ndarray") -> str:
+    """A vector as ``[1, 2, 3]``, the middle elided past ``MAX_SHOWN`` entries."""
+    values = [format_number(value) for value in vector[:MAX_SHOWN]]
+    if len(vector) > MAX_SHOWN:
+        values = values[:MAX_SHOWN - 2] + ['...'] + [format_number(value) for value in vector[-1:]]
+    return "[" + ", ".join(values) + "]"
+
+
+def format_matrix(matrix: "np.ndarray") -> str:
+    """A matrix as ``[[1, 2], [3, 4]]``, rows and columns elided past ``MAX_SHOWN``."""
+    if matrix.ndim == 1:
+        return format_vector(matrix)
+    rows = [format_vector(row) for row in matrix[:MAX_SHOWN]]
+    if len(matrix) > MAX_SHOWN:
+        rows = rows[:MAX_SHOWN - 2] + ['...'] + [format_vector(matrix[-1])]
+    text = "[" + ", ".join(rows) + "]"
+    if matrix.shape[0] > MAX_SHOWN or matrix.shape[1] > MAX_SHOWN:
+        text = f"{matrix.shape[0]}x{matrix.shape[1]} matrix {text}"
+    return text
@@ -0,0 +1,376 @@
+"""
+Load Test
+Starts the web UI on localhost and drives it with simulated clients, over the
+REST API (POST /api/query) and over Socket.IO (send_query, answered by
+query_response). Reports throughput, end-to-end latency percentiles and error
+rates per transport, and samples the server's threads, sessions and background
+queue from /metrics while the test runs. Everything stays on localhost.
+
+Usage:
+  python load_test.py                                   # 20 clients for 30 s, both transports
+  python load_test.py --clients 50 --duration 60 --transport socketio
+  python load_test.py --url http://127.0.0.1:5000       # Use a server that is already running
+  python load_test.py --output load.json                # Also save the results
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+from routing_benchmark import build_corpus, percentile
+
+try:
+    import socketio
+    SOCKETIO_CLIENT_AVAILABLE = True
+except ImportError:
+    SOCKETIO_CLIENT_AVAILABLE = False
+
+
+TRANSPORTS = ("rest", "socketio")
+
+# Seconds to wait for a locally started server to answer
+STARTUP_TIMEOUT = 30.0
+
+# Metrics sampled from /metrics while the test runs
+SAMPLED_METRICS = {
+    "threads": "process_threads",
+    "sessions": "agentic_web_active_sessions",
+    "queued": 'agentic_web_background_queries{state="queued"}',
+    "running": 'agentic_web_background_queries{state="running"}',
+}
+
+
+class Recorder:
+    """Collects the outcome of every query, from all client threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.results: List[Tuple[str, float, float, Optional[str]]] = []  # transport, finished at, latency, error
+        self._lock = threading.Lock()
+
+    def record(self, transport: str, latency: float, error: Optional[str] = None) -> None:
+        """Record one query; ``error`` is None if it succeeded."""
+        with self._lock:
+            self.results.append((transport, time.perf_counter() - self.started, latency, error))
+
+    def count(self) -> Tuple[int, int]:
+        """Number of queries and of errors so far."""
+        with self._lock:
+            return len(self.results), sum(1 for result in self.results if result[3] is not None)
+
+
+class RestClient:
+    """Sends queries to POST /api/query, one at a time."""
+
+    transport = "rest"
+
+    def __init__(self, url: str, timeout: float):
+        self.endpoint = f"{url}/api/query"
+        self.timeout = timeout
+        self.session_id = f"load-{id(self):x}"
+
+    def connect(self) -> None:
+        pass
+
+    def query(self, text: str) -> Optional[str]:
+        """Send a query and wait for the answer; returns the error type, or None."""
+        body = json.dumps({"query": text, "session_id": self.session_id}).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return f"http_{e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            reason = getattr(e, "reason", e)
+            return "timeout" if isinstance(reason, socket.timeout) else type(reason).__name__
+        except ValueError:
+            return "invalid_json"
+        return None if payload.get("success") else "failed"
+
+    def close(self) -> None:
+        pass
+
+
+class SocketIOClient:
+    """Sends queries as send_query events and waits for the matching query_response."""
+
+    transport = "socketio"
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self.client = socketio.Client(reconnection=False)
+        self._pending: Optional[str] = None
+        self._error: Optional[str] = None
+        self._answered = threading.Event()
+        self.client.on("query_response", self._on_response)
+        self.client.on("error", self._on_error)
+
+    def connect(self) -> None:
+        self.client.connect(self.url, wait_timeout=self.timeout)
+
+    def _on_response(self, data: Dict[str, Any]) -> None:
+        if data.get("query") == self._pending:
+            self._error = None if data.get("response", {}).get("success") else "failed"
+            self._answered.set()
+
+    def _on_error(self, data: Dict[str, Any]) -> None:
+        if data.get("query", self._pending) == self._pending:
+            self._error = "server_error"
+            self._answered.set()
+
+    def query(self, text: str) -> Optional[str]:
+        """Send a query and wait for the answer; returns the error type, or None."""
+        self._pending = text.strip()
+        self._answered.clear()
+        try:
+            self.client.emit("send_query", {"query": text})
+        except socketio.exceptions.SocketIOError as e:
+            return type(e).__name__
+        if not self._answered.wait(self.timeout):
+            return "timeout" if self.client.connected else "disconnected"
+        return self._error
+
+    def close(self) -> None:
+        self.client.disconnect()
+
+
+def run_client(client, queries: List[str], offset: int, deadline: float,
+               think_time: float, recorder: Recorder) -> None:
+    """Send queries in a closed loop until the deadline, starting at ``offset`` in the corpus."""
+    started = time.perf_counter()
+    try:
+        client.connect()
+    except Exception as e:
+        recorder.record(client.transport, time.perf_counter() - started, f"connect_{type(e).__name__}")
+        return
+
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            text = queries[index % len(queries)]
+            index += 1
+            started = time.perf_counter()
+            error = client.query(text)
+            recorder.record(client.transport, time.perf_counter() - started, error)
+            if think_time:
+                time.sleep(think_time)
+    finally:
+        client.close()
+
+
+def read_metrics(url: str, timeout: float = 5.0) -> Dict[str, float]:
+    """Fetch /metrics and return the value of each sample, keyed by name and labels."""
+    with urllib.request.urlopen(f"{url}/metrics", timeout=timeout) as response:
+        text = response.read().decode("utf-8")
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def sample_server(url: str, interval: float, recorder: Recorder, stop: threading.Event,
+                  timeline: List[Dict[str, Any]]) -> None:
+    """Every ``interval`` seconds, record the queries completed since the last sample and the server's gauges."""
+    last_queries = last_errors = 0
+    while not stop.wait(interval):
+        queries, errors = recorder.count()
+        sample: Dict[str, Any] = {
+            "elapsed": round(time.perf_counter() - recorder.started, 1),
+            "queries_per_second": (queries - last_queries) / interval,
+            "errors": errors - last_errors,
+        }
+        last_queries, last_errors = queries, errors
+        try:
+            metrics = read_metrics(url)
+            for key, name in SAMPLED_METRICS.items():
+                sample[key] = metrics.get(name)
+        except (urllib.error.URLError, OSError, ValueError):
+            sample.update(dict.fromkeys(SAMPLED_METRICS))
+        timeline.append(sample)
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Dict[str, Any]]:
+    """Throughput, latency percentiles and errors, per transport and overall."""
+    groups: Dict[str, List[Tuple[str, float, float, Optional[str]]]] = {}
+    for result in recorder.results:
+        groups.setdefault(result[0], []).append(result)
+    groups["all"] = recorder.results
+
+    summary = {}
+    for transport, results in groups.items():
+        latencies = [latency for _, _, latency, error in results if error is None]
+        errors: Dict[str, int] = {}
+        for _, _, _, error in results:
+            if error is not None:
+                errors[error] = errors.get(error, 0) + 1
+        summary[transport] = {
+            "queries": len(results),
+            "throughput_qps": len(latencies) / duration,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "error_rate": sum(errors.values()) / len(results) if results else 0.0,
+            "errors": errors,
+        }
+    return summary
+
+
+def _free_port() -> int:
+    """A TCP port on localhost that is free right now."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    """Start the web UI in a child process and wait until it answers."""
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)],
+                              stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/api/status", timeout=1.0):
+                return server
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server did not answer within {STARTUP_TIMEOUT:.0f} s")
+
+
+def serve(port: int) -> None:
+    """Run the web UI on localhost, without the debugger, reloader or request log."""
+    import web_app
+    from math_agent import get_symbolic_pool
+
+    # Exit normally on terminate() so the worker pool is shut down at exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    get_symbolic_pool().start()
+    web_app.socketio.run(web_app.app, host="127.0.0.1", port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+
+def print_report(summary: Dict[str, Dict[str, Any]], timeline: List[Dict[str, Any]]) -> None:
+    """Print the server timeline and the per-transport results."""
+    def show(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:g}"
+
+    if timeline:
+        print(f"{'Time (s)':>9}{'Queries/s':>11}{'Errors':>8}{'Threads':>9}{'Sessions':>10}{'Queued':>8}{'Running':>9}")
+        for sample in timeline:
+            print(f"{sample['elapsed']:>9}{sample['queries_per_second']:>11.1f}{sample['errors']:>8}"
+                  f"{show(sample['threads']):>9}{show(sample['sessions']):>10}"
+                  f"{show(sample['queued']):>8}{show(sample['running']):>9}")
+        print()
+
+    print(f"{'Transport':<10}{'Queries':>9}{'Queries/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>9}")
+    for transport, result in summary.items():
+        print(f"{transport:<10}{result['queries']:>9}{result['throughput_qps']:>11.1f}{result['p50_ms']:>9.2f}"
+              f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['error_rate']:>9.1%}")
+    for transport, result in summary.items():
+        if transport != "all" and result["errors"]:
+            details = ", ".join(f"{error}: {count}" for error, count in sorted(result["errors"].items()))
+            print(f"  {transport} errors: {details}")
+
+
+def main() -> int:
+    """Run the load test and print the report; returns the exit code."""
+    parser = argparse.ArgumentParser(description="Load test the web UI on localhost over REST and Socket.IO")
+    parser.add_argument('--clients', type=int, default=20, help='Simulated clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to send queries for')
+    parser.add_argument('--transport', choices=TRANSPORTS + ('both',), default='both',
+                        help='How clients send queries; with both, half the clients use each')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Seconds each client waits between queries')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for an answer')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between samples of /metrics')
+    parser.add_argument('--seed', type=int, default=2025, help='Seed of the generated queries')
+    parser.add_argument('--url', help='Server that is already running (default: start one on a free port)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=5000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return 0
+
+    transports = TRANSPORTS if args.transport == 'both' else (args.transport,)
+    if 'socketio' in transports and not SOCKETIO_CLIENT_AVAILABLE:
+        print("The Socket.IO client is not installed: pip install \"python-socketio[client]\"", file=sys.stderr)
+        return 2
+
+    server = None
+    url = args.url.rstrip('/') if args.url else None
+    if url is None:
+        port = _free_port()
+        server = start_server(port)
+        url = f"http://127.0.0.1:{port}"
+
+    try:
+        queries = list(chain.from_iterable(build_corpus(per_category=200, seed=args.seed).values()))
+        clients = [
+            (SocketIOClient if transports[index % len(transports)] == 'socketio' else RestClient)(url, args.timeout)
+            for index in range(args.clients)
+        ]
+
+        recorder = Recorder()
+        timeline: List[Dict[str, Any]] = []
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_server, args=(url, args.interval, recorder, stop, timeline),
+                                   daemon=True)
+        deadline = recorder.started + args.duration
+        threads = [
+            threading.Thread(target=run_client, daemon=True,
+                             args=(client, queries, index * len(queries) // len(clients), deadline,
+                                   args.think_time, recorder))
+            for index, client in enumerate(clients)
+        ]
+
+        print(f"Load testing {url} with {args.clients} clients ({', '.join(transports)}) for {args.duration:g} s\n")
+        sampler.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - recorder.started
+        stop.set()
+        sampler.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    summary = summarize(recorder, elapsed)
+    print_report(summary, timeline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump({"clients": args.clients, "transports": list(transports), "duration": elapsed,
+                       "summary": summary, "timeline": timeline}, output, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    return 0 if recorder.results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
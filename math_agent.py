@@ -3,92 +3,262 @@ Math Geek Agent
 Specialized agent for handling mathematical queries and calculations.
 """
 
+import os
 import re
 import math
-from typing import Dict, Any
-from base_agent import BaseAgent
+import threading
+import time
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Dict, Any, Optional
+from base_agent import BaseAgent, TIER_CHAR_CLASS
+import combinatorics
+import high_precision
+from math_tokens import (BANG, COMMA, EQUALS, LBRACKET, LPAREN, NAME, NUMBER, OPERATOR, RPAREN, MathTokens,
+                         SequenceIndex, sequence)
+from query_analysis import QueryAnalysis
+from safe_eval import ExpressionError, ExpressionLimitError, SafeEvaluator, normalize_expression
+from symbolic_cache import SymbolicCache, canonical_key
+from worker_pool import WorkerError, WorkerPool, WorkerTimeoutError
 
-try:
-    import sympy as sp
-    SYMPY_AVAILABLE = True
-except ImportError:
-    SYMPY_AVAILABLE = False
+# sympy takes a long time to import, so it is only imported by the first
+# symbolic computation (or up front by the pre-warmed worker processes)
+SYMPY_AVAILABLE = find_spec("sympy") is not None
+MPMATH_AVAILABLE = find_spec("mpmath") is not None
+
+# High-precision results up to this many digits go in the symbolic cache
+CACHED_DIGITS = 20000
+
+# Seconds sympy gets to find exact roots of a polynomial before the numeric roots are used
+EXACT_ROOTS_TIMEOUT = 2.0
+
+# Polynomials above this degree go straight to the numeric roots
+MAX_EXACT_DEGREE = 50
+
+# Words around the polynomial of a root-finding query, e.g. "find the roots of
+# x^7 - 2x + 1" or "solve x^3 = 8 for x"
+POLYNOMIAL_PREFIX_PATTERN = re.compile(
+    r'^(?:please\s+)?(?:(?:solve|find|compute|calculate|what are)\s+)?(?:all\s+)?(?:the\s+)?'
+    r'(?:(?:real|complex)\s+)?(?:(?:roots?|zeros?|solutions?)\s+(?:of|for|to)\s+)?(?:the\s+)?'
+    r'(?:polynomial|equation)?\s*(?:for\s+[a-z]\s*)?:?\s*',
+    re.IGNORECASE
+)
+POLYNOMIAL_SUFFIX_PATTERN = re.compile(r'\s*(?:,?\s*for\s+[a-z])?\s*[.?!]*\s*$', re.IGNORECASE)
+
+# Seconds each method gets on a definite integral, sympy in a worker and quadrature inline
+INTEGRATION_TIMEOUT = 5.0
+
+# An integral, e.g. "integral of exp(-x^2) sin(x) from 0 to 5", "integrate 1/x dx
+# from 1 to e" or "the antiderivative of x^2"
+INTEGRAL_PATTERN = re.compile(
+    r'^\s*(?:(?:what is|what\'s|compute|calculate|evaluate|find|solve)\s+)?(?:the\s+)?(?:(?:definite|indefinite)\s+)?'
+    r'(?:integral|integrate|antiderivative)\s+(?:of\s+)?(?P<expression>.+?)(?:\s*\bd(?P<variable>[a-z]))?'
+    r'(?:\s+(?:from|between)\s+(?P<start>\S+?)\s+(?:to|and)\s+(?P<stop>[^\s?!]+?))?\s*[.?!]?\s*$',
+    re.IGNORECASE
+)
+
+# Integral bounds meaning infinity
+INFINITY_WORDS = {'inf': math.inf, 'infinity': math.inf, 'oo': math.inf, '∞': math.inf}
+
+# Trigonometric functions by the words that name them
+TRIGONOMETRY_WORDS = {'sin': 'sin', 'sine': 'sin', 'cos': 'cos', 'cosine': 'cos', 'tan': 'tan', 'tangent': 'tan'}
+
+# Functions written by name, e.g. "sin(30)", "ln 5" or "cosine of 60"
+FUNCTION_WORDS = frozenset({'log', 'ln', 'exp', 'sqrt'}).union(TRIGONOMETRY_WORDS)
+
+# Variables of an algebraic expression, as in "x + 1", and the letters a range runs over
+VARIABLE_WORDS = frozenset('xyz')
+LETTERS = frozenset('abcdefghijklmnopqrstuvwxyz')
+
+# Units of a requested precision, as in "to 50 digits" or "to 10 decimal places"
+PRECISION_WORDS = frozenset({'digits', 'decimals', 'places', 'figures'})
+
+# Words that name a matrix operation; the matrix literal follows them
+MATRIX_WORDS = frozenset({
+    'matrix', 'matrices', 'determinant', 'inverse', 'invert', 'eigen', 'eigenvalue', 'eigenvalues',
+    'eigenvector', 'eigenvectors', 'transpose', 'rank', 'trace',
+})
+
+INTEGRAL_WORDS = frozenset({'integral', 'integrate', 'antiderivative'})
+POLYNOMIAL_WORDS = frozenset({'solve', 'root', 'roots', 'zero', 'zeros'})
+COMBINATORICS_WORDS = frozenset({'binomial', 'combination', 'combinations', 'permutation', 'permutations'})
+
+# Token sequences that make a query mathematical; "..." skips to anywhere later on the line
+ROUTING_SEQUENCES = SequenceIndex([
+    sequence(VARIABLE_WORDS, OPERATOR, NUMBER),                         # Algebraic expressions
+    sequence(NUMBER, BANG),                                             # Factorials
+    sequence(LPAREN, NUMBER, ..., RPAREN),                              # Parenthesized expressions
+    sequence(FUNCTION_WORDS, {LPAREN, NUMBER}.union(VARIABLE_WORDS)),   # Functions
+    sequence(FUNCTION_WORDS, {'of'}, NUMBER),
+    sequence({'calculate', 'compute', 'solve', 'equation'}, ..., NUMBER),
+    sequence(NUMBER, ..., {'factorial', 'square', 'sqrt', 'root', 'power', 'exponent'}),
+    sequence({'integral', 'derivative', 'limit', 'sum', 'product'}, ..., {NAME, NUMBER}),
+    sequence({'mathematic', 'mathematics'}),
+    sequence('math', ..., {'problem', 'question', 'calculation'}),
+    sequence('square', 'root'),
+    sequence('calculate', ..., 'of'),
+    sequence('for', LETTERS, {'from', 'in', EQUALS}, NUMBER),           # Ranges
+    sequence('for', LETTERS, {'from', 'in', EQUALS}, {'-', '+'}, NUMBER),
+    sequence(MATRIX_WORDS, ..., LBRACKET),                              # Matrix operations
+    sequence(NUMBER, 'choose', NUMBER),                                 # Combinatorics
+    sequence(COMBINATORICS_WORDS, ..., NUMBER),
+    sequence({'to', 'with'}, NUMBER, PRECISION_WORDS),                  # Precision
+    sequence({'to', 'with'}, NUMBER, {'decimal', 'significant'}, PRECISION_WORDS),
+    sequence(NUMBER, 'digits', 'of'),
+    sequence(NUMBER, 'decimal', 'places', 'of'),
+])
+
+# Words that make a query mathematical if it has a number or asks "what is"
+STRONG_MATH_WORDS = frozenset({'calculate', 'compute', 'factorial', 'sqrt', 'logarithm'})
+WHAT_IS = sequence('what', 'is')
+
+SQUARE_ROOT = sequence('square', 'root')
+
+# "n!"; "n != m" is a comparison
+FACTORIAL = sequence(NUMBER, BANG)
+
+# "n choose k", "nCk", "C(n, k)" or "binomial(n, k)"
+COMBINATIONS = [
+    sequence({'c', 'binomial'}, LPAREN, NUMBER, COMMA, NUMBER, RPAREN),
+    sequence(NUMBER, {'choose', 'c'}, NUMBER),
+]
+
+# "nPk" or "P(n, k)"
+PERMUTATIONS = [
+    sequence('p', LPAREN, NUMBER, COMMA, NUMBER, RPAREN),
+    sequence(NUMBER, 'p', NUMBER),
+]
+
+# "2 to the power of 8", "2^8" or "2**8"
+POWERS = [
+    sequence(NUMBER, 'to', 'the', 'power', 'of', NUMBER),
+    sequence(NUMBER, {'^', '**'}, NUMBER),
+]
+
+# A requested precision, e.g. "pi to 10000 places", "sqrt(2) with 50 digits"
+# or "the first 1000 digits of e"
+PRECISION_PATTERN = re.compile(
+    r'\b(?:to|with|at|in)\s+(?P<digits>\d+)\s+(?:significant\s+)?(?P<unit>digits|decimal places|decimals|places|figures)\b'
+    r'|\b(?:the\s+)?(?:first\s+)?(?P<leading>\d+)\s+(?P<leading_unit>digits|decimal places|decimals|places)\s+of\b\s*',
+    re.IGNORECASE
+)
+
+# Words around the expression of a precision query
+PRECISE_PREFIX_PATTERN = re.compile(
+    r'^(?:(?:what is|what\'s|compute|calculate|evaluate|give me|show me|print|find|write)\s+)?(?:the\s+)?(?:value\s+of\s+)?',
+    re.IGNORECASE
+)
+
+# Spelled-out functions and constants, and how they are written in an expression
+PRECISE_WORDS = [
+    (re.compile(r'\bsquare\s+root\b', re.IGNORECASE), 'sqrt'),
+    (re.compile(r'\bcube\s+root\b', re.IGNORECASE), 'cbrt'),
+    (re.compile(r'\bnatural\s+(?:log|logarithm)\b', re.IGNORECASE), 'ln'),
+    (re.compile(r'\bgolden\s+ratio\b', re.IGNORECASE), 'phi'),
+    (re.compile(r'\beuler\'?s\s+number\b', re.IGNORECASE), 'e'),
+    (re.compile(r'π'), 'pi'),
+]
+
+# A function applied without parentheses, as in "sqrt of 2" or "ln 10"
+FUNCTION_ARGUMENT_PATTERN = re.compile(
+    r'\b(' + '|'.join(sorted(high_precision.FUNCTIONS, key=len, reverse=True)) + r')\s+(?:of\s+)?([\w.]+)'
+)
+
+# Range bound or step: integer, decimal or scientific notation
+_RANGE_NUMBER = r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?'
+
+# An expression over a range, e.g. "sin(x) for x from 0 to 10 step 0.01"
+# or "table of x^2+3x for x in 1..1e6"
+RANGE_QUERY_PATTERN = re.compile(
+    rf'^\s*(?P<expression>.+?)\s+for\s+(?P<variable>[a-z])\s*(?:from|in|=)\s*(?P<start>{_RANGE_NUMBER})'
+    rf'\s*(?:to|\.\.\.?)\s*(?P<stop>{_RANGE_NUMBER})'
+    rf'(?:\s*,?\s*(?:step|by|in steps of)\s+(?P<step>{_RANGE_NUMBER}))?\s*[.?!]?\s*$',
+    re.IGNORECASE
+)
+
+# Words that introduce the expression of a range query
+RANGE_PREFIX_PATTERN = re.compile(
+    r'^(?:(?:please|make|give me|show(?: me)?|print|list)\s+)?(?:(?:a|the)\s+)?'
+    r'(?:table of|tabulate|values? of|evaluate|compute|calculate|plot|what is|what are)\s+'
+    r'(?:the\s+values?\s+of\s+)?|^(?:[a-z]|f\s*\(\s*[a-z]\s*\))\s*=\s*',
+    re.IGNORECASE
+)
 
 
 class MathGeekAgent(BaseAgent):
     """Agent specialized in mathematical calculations and problem solving."""
     
-    def __init__(self):
+    # Symbolic math can take a long time, keep it off the event loop
+    blocking = True
+    
+    def __init__(self, symbolic_timeout: Optional[float] = 10.0, use_worker_pool: bool = True,
+                 use_symbolic_cache: bool = True, precision_digits: Optional[int] = None):
+        """
+        Args:
+            symbolic_timeout (Optional[float]): Deadline in seconds for a sympy computation,
+                or None for the pool's default
+            use_worker_pool (bool): Run sympy computations in the shared worker process
+                pool, where they can be killed at the deadline; otherwise run them inline
+            use_symbolic_cache (bool): Reuse sympy results through the shared symbolic
+                cache (on disk too if AGENT_SYMBOLIC_CACHE_PATH is set)
+            precision_digits (Optional[int]): Significant digits for numeric expressions
+                such as "sqrt(2) / 3" that don't ask for a precision themselves; None
+                leaves them to the float handlers
+        """
         super().__init__(
             name="Math Geek", 
             description="I solve mathematical problems, perform calculations, and work with equations."
         )
         
-        # Mathematical keywords and patterns
-        self.math_keywords = [
-            'calculate', 'compute', 'solve', 'equation', 'integral', 'derivative',
-            'factorial', 'square', 'sqrt', 'root', 'logarithm', 'log', 'sin', 'cos',
-            'tan', 'trigonometry', 'algebra', 'geometry', 'calculus', 'matrix',
-            'polynomial', 'function', 'limit', 'sum', 'product', 'mathematics',
-            'math', 'arithmetic', 'power', 'exponent'
-        ]
+        self.symbolic_timeout = symbolic_timeout
+        self.symbolic_pool: Optional[WorkerPool] = get_symbolic_pool() if use_worker_pool else None
+        self.symbolic_cache: Optional[SymbolicCache] = get_symbolic_cache() if use_symbolic_cache else None
+        self.precision_digits = precision_digits
         
-        # Math operators and symbols
-        self.math_patterns = [
-            r'\d+\s*[\+\-\*\/\^\%]\s*\d+',  # Basic arithmetic
-            r'sin|cos|tan|log|ln|exp|sqrt',  # Functions
-            r'\d+\s*[\+\-\*\/]\s*\d+',      # Simple operations
-            r'x\s*[\+\-\*\/\^]\s*\d+',      # Algebraic expressions
-            r'\d+\!',                        # Factorial
-            r'\(\s*\d+.*\)',                 # Parentheses expressions
-        ]
+        # Arithmetic is parsed once per distinct expression and evaluated with cost limits
+        self.evaluator = SafeEvaluator()
+        # NumPy evaluator for range queries, created by the first one
+        self._tabulator = None
+        
+        # Token sequences and words that claim a query, see ``route_tier``
+        self.math_sequences = ROUTING_SEQUENCES
+        self.strong_math_keywords = STRONG_MATH_WORDS
     
     def can_handle(self, query: str) -> bool:
         """Check if the query contains mathematical content."""
-        query_lower = query.lower()
+        return self.can_handle_routed(QueryAnalysis(query), False)
+    
+    def route_tier(self, analysis: QueryAnalysis, tier: str, pattern_matched: Optional[bool]) -> Optional[bool]:
+        """
+        Claim numbers joined by operators at the character-class tier, everything
+        else on the query's math tokens.
         
-        # First check for explicit mathematical patterns
-        for pattern in self.math_patterns:
-            if re.search(pattern, query):
+        The tokens are the ones dispatch and the handlers use, so a query is only
+        claimed for what they can read in it: "explain" is not "exp", and
+        "computer" is not "compute".
+        """
+        if tier == TIER_CHAR_CLASS:
+            if analysis.has_operators and analysis.math_tokens.operator_between_numbers:
                 return True
+            # Every sequence and keyword needs a digit or a letter
+            if not analysis.has_digits and not analysis.has_letters:
+                return False
+            return None
         
-        # Check for numbers with operators
-        if re.search(r'\d+.*[\+\-\*\/\^\%].*\d+', query):
+        tokens = analysis.math_tokens
+        if tokens.has_matrix or tokens.find_any(self.math_sequences):
             return True
-        
-        # More specific math keyword checking to avoid false positives
-        math_context_patterns = [
-            r'\b(calculate|compute|solve|equation)\b.*\d+',
-            r'\d+.*\b(factorial|square|sqrt|root|power|exponent)\b',
-            r'\b(sin|cos|tan|log|ln|exp)\s*\(',
-            r'\b(integral|derivative|limit|sum|product)\b.*\w+',
-            r'\bmathematics?\b|\bmath\b.*\b(problem|question|calculation)\b',
-            r'\b(square\s+root|what\s+is.*factorial|calculate.*of)\b',
-        ]
-        
-        for pattern in math_context_patterns:
-            if re.search(pattern, query_lower):
-                return True
-        
-        # Check for strong math keywords only in mathematical context
-        strong_math_keywords = ['calculate', 'compute', 'factorial', 'sqrt', 'square root', 'logarithm']
-        for keyword in strong_math_keywords:
-            if keyword in query_lower and (re.search(r'\d+', query) or 'what is' in query_lower):
-                return True
-        
-        # Check if it's purely mathematical expression
-        cleaned_query = re.sub(r'[^\w\s\+\-\*\/\^\(\)\.]', '', query)
-        if re.match(r'^[\s\w]*[\d\+\-\*\/\^\(\)\.]+[\s\w]*$', cleaned_query) and re.search(r'\d', query):
-            # Make sure it's not just words containing numbers
-            if re.search(r'\d+\s*[\+\-\*\/\^]\s*\d+', query):
-                return True
-            
-        return False
+        return bool(tokens.keys & self.strong_math_keywords) and (analysis.has_digits or tokens.find(WHAT_IS) is not None)
     
     def process(self, query: str) -> Dict[str, Any]:
         """Process mathematical queries and return results."""
+        return self.process_analysis(QueryAnalysis(query))
+    
+    def process_analysis(self, analysis: QueryAnalysis) -> Dict[str, Any]:
+        """Process an analyzed mathematical query and return results."""
+        query = analysis.query
         try:
-            result = self._solve_math_query(query)
+            result = self._solve_math_query(analysis)
             return {
                 "agent": self.name,
                 "success": True,
@@ -96,6 +266,16 @@ class MathGeekAgent(BaseAgent):
                 "query": query,
                 "type": "mathematical_calculation"
             }
+        except WorkerTimeoutError as e:
+            return {
+                "agent": self.name,
+                "success": False,
+                "error": str(e),
+                "error_type": "timeout",
+                "timeout": e.timeout,
+                "query": query,
+                "type": "mathematical_calculation"
+            }
         except Exception as e:
             return {
                 "agent": self.name,
@@ -105,145 +285,520 @@ class MathGeekAgent(BaseAgent):
                 "type": "mathematical_calculation"
             }
     
-    def _solve_math_query(self, query: str) -> str:
+    def _solve_math_query(self, analysis: QueryAnalysis) -> str:
         """Solve various types of mathematical queries."""
-        query_lower = query.lower()
+        query = analysis.query
+        tokens = analysis.math_tokens
+        words = tokens.words
         
-        # Handle basic arithmetic expressions
-        if self._is_arithmetic_expression(query):
-            return self._evaluate_arithmetic(query)
+        # Handle expressions over a range, e.g. "sin(x) for x from 0 to 10"
+        if 'for' in words:
+            range_match = RANGE_QUERY_PATTERN.match(query)
+            if range_match:
+                with self.timed("tabulation"):
+                    return self._handle_range(range_match)
+        
+        # Handle integrals, racing sympy against quadrature when they are definite
+        if words & INTEGRAL_WORDS:
+            integral_match = INTEGRAL_PATTERN.match(query)
+            if integral_match:
+                result = self._handle_integral(integral_match)
+                if result is not None:
+                    return result
+        
+        # Handle precision requests, e.g. "sqrt of 2 to 1000 digits"
+        if MPMATH_AVAILABLE and (self.precision_digits is not None or words & PRECISION_WORDS):
+            result = self._handle_precise(query)
+            if result is not None:
+                return result
+        
+        # Handle matrices, e.g. "inverse of [[1, 2], [3, 4]]", and systems of
+        # linear equations, e.g. "solve 2x + 3y = 5, x - y = 1"
+        if tokens.has_matrix or tokens.count(EQUALS) >= 2:
+            with self.timed("linear_algebra"):
+                result = self._handle_linear_algebra(analysis)
+            if result is not None:
+                return result
+        
+        # Handle roots of polynomials, e.g. "solve x^7 - 2x + 1 = 0"
+        if words & POLYNOMIAL_WORDS:
+            result = self._handle_polynomial(query)
+            if result is not None:
+                return result
+        
+        # Handle arithmetic expressions; a run of tokens that touches a word, as
+        # in "x^2 + 3x" or "sin(30) + 1", is left to the symbolic handlers
+        expression = tokens.expression if analysis.has_operators else None
+        if expression is not None:
+            with self.timed("arithmetic"):
+                return self._evaluate_arithmetic(expression, query)
         
         # Handle specific mathematical functions
-        if 'factorial' in query_lower:
-            return self._handle_factorial(query)
+        if 'factorial' in words or tokens.find(FACTORIAL):
+            with self.timed("combinatorics"):
+                return self._handle_factorial(tokens)
         
-        if any(func in query_lower for func in ['sin', 'cos', 'tan']):
-            return self._handle_trigonometry(query)
+        arguments = self._combinatorics_arguments(tokens)
+        if arguments is not None or words & COMBINATORICS_WORDS:
+            with self.timed("combinatorics"):
+                return self._handle_combinatorics(tokens, arguments)
         
-        if 'sqrt' in query_lower or 'square root' in query_lower:
-            return self._handle_square_root(query)
+        if words & TRIGONOMETRY_WORDS.keys():
+            return self._handle_trigonometry(tokens)
         
-        if 'power' in query_lower or '^' in query or '**' in query:
-            return self._handle_power(query)
+        if 'sqrt' in words or tokens.find(SQUARE_ROOT):
+            return self._handle_square_root(tokens)
+        
+        # Numeric '^' and '**' are arithmetic; this handles "2 to the power of 8"
+        if 'power' in words:
+            return self._handle_power(tokens)
         
         # Try to use sympy for more complex expressions
         if SYMPY_AVAILABLE:
-            return self._handle_with_sympy(query)
+            return self._handle_with_sympy(tokens)
         
         # Fallback to basic evaluation
-        return self._evaluate_simple_expression(query)
-    
-    def _is_arithmetic_expression(self, query: str) -> bool:
-        """Check if query is a simple arithmetic expression."""
-        # Look for patterns like "25 + 17", "Calculate 5 * 3", etc.
-        arithmetic_patterns = [
-            r'\d+\s*[\+\-\*\/]\s*\d+',  # Simple arithmetic like "25 + 17"
-            r'calculate\s+\d+\s*[\+\-\*\/]\s*\d+',  # "Calculate 25 + 17"
-            r'\d+\s*[\+\-\*\/]\s*\d+\s*[\+\-\*\/]\s*\d+',  # Multiple operations
+        return self._evaluate_simple_expression(tokens)
+    
+    def _evaluate_arithmetic(self, expression: str, query: str) -> str:
+        """Evaluate an arithmetic expression found in the query, with precedence and parentheses."""
+        try:
+            # '^' is the usual way to write powers in a question
+            result = self.evaluator.evaluate(expression.replace('^', '**'))
+        except ZeroDivisionError:
+            return "Cannot divide by zero"
+        except ExpressionLimitError as e:
+            return f"The expression {expression} is too large to evaluate: {str(e)}"
+        except ExpressionError as e:
+            return f"Could not evaluate the arithmetic expression: {query}. Error: {str(e)}"
+        
+        # Format result nicely
+        if isinstance(result, float) and result.is_integer() and abs(result) < 1e15:
+            result = int(result)
+        
+        return f"The result of {expression} is {result}"
+    
+    def _get_tabulator(self):
+        """The NumPy expression evaluator, created on first use; None without numpy."""
+        if self._tabulator is None:
+            # NumPy is only imported by the first query that needs it
+            from tabulation import NUMPY_AVAILABLE, Tabulator
+            if not NUMPY_AVAILABLE:
+                return None
+            self._tabulator = Tabulator()
+        return self._tabulator
+    
+    def _handle_range(self, range_match: re.Match) -> str:
+        """Tabulate an expression over a range and summarize the values."""
+        if self._get_tabulator() is None:
+            return "Tabulating an expression over a range requires numpy"
+        
+        text = RANGE_PREFIX_PATTERN.sub('', range_match.group('expression')).strip()
+        variable = range_match.group('variable').lower()
+        start, stop = float(range_match.group('start')), float(range_match.group('stop'))
+        step = float(range_match.group('step')) if range_match.group('step') else None
+        
+        try:
+            summary = self._tabulator.tabulate(normalize_expression(text), start, stop, step, variable)
+        except ExpressionLimitError as e:
+            return f"The range of {text} is too large to tabulate: {str(e)}"
+        except ExpressionError as e:
+            return f"Could not tabulate {text}: {str(e)}"
+        
+        def number(value: float) -> str:
+            return f"{value:.10g}"
+        
+        lines = [
+            f"{text} for {variable} from {number(summary['start'])} to {number(summary['stop'])}"
+            f" step {number(summary['step'])}: {summary['points']} values"
         ]
+        undefined = summary['points'] - summary['defined']
+        if summary['defined']:
+            lines.append(
+                f"min {number(summary['min'])} at {variable} = {number(summary['argmin'])}, "
+                f"max {number(summary['max'])} at {variable} = {number(summary['argmax'])}, "
+                f"mean {number(summary['mean'])}, std {number(summary['std'])}"
+            )
+        if undefined:
+            lines.append(f"{undefined} value{'s are' if undefined > 1 else ' is'} undefined and left out")
         
-        for pattern in arithmetic_patterns:
-            if re.search(pattern, query.lower()):
-                return True
-                
-        return False
+        # Preview of both ends of the range, with a gap marker if they don't meet
+        rows = summary['head']
+        if summary['points'] > len(summary['head']) + len(summary['tail']):
+            rows = rows + [None]
+        for row in rows + summary['tail']:
+            lines.append("..." if row is None else f"{variable} = {number(row[0])}: {number(row[1])}")
+        return "\n".join(lines)
+    
+    def _handle_integral(self, integral_match: re.Match) -> Optional[str]:
+        """
+        Integrate an expression, definite or indefinite.
+        
+        A definite integral is computed by sympy in a worker and by adaptive
+        quadrature in this thread at the same time, each under
+        ``INTEGRATION_TIMEOUT``; the first acceptable answer wins: an exact
+        value, or a numeric one whose error estimate met the tolerance. An
+        indefinite integral needs sympy, under the usual symbolic deadline.
+        
+        Returns:
+            Optional[str]: The answer, or None if there is no way to integrate here
+        """
+        text = integral_match.group('expression').strip()
+        expression = normalize_expression(text)
+        variable = integral_match.group('variable') or _integration_variable(expression)
+        start_text, stop_text = integral_match.group('start'), integral_match.group('stop')
+        bounds = f" from {start_text} to {stop_text}" if start_text is not None else ""
+        key = canonical_key(expression, f"integral:{variable}:{start_text}:{stop_text}", _sympy_version())
+        if self.symbolic_cache is not None:
+            cached = self.symbolic_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        def exact_answer(exact: Optional[tuple]) -> Optional[str]:
+            if exact is None:
+                return None
+            if start_text is None:
+                return f"The integral of {text} with respect to {variable} is {exact[0]} + C (exact, by sympy)"
+            return f"The integral of {text}{bounds} is {exact[0]} = {exact[1]:.15g} (exact, by sympy)"
+        
+        if start_text is None:
+            if not SYMPY_AVAILABLE:
+                return None
+            try:
+                exact = self._run_symbolic(_integrate_with_sympy, expression, variable, None, None, stage="integral")
+            except WorkerTimeoutError:
+                raise
+            except Exception as e:
+                return f"Could not integrate {text}: {str(e)}"
+            if exact is None:
+                return f"sympy found no closed form for the integral of {text}"
+            result = exact_answer(exact)
+            if self.symbolic_cache is not None:
+                self.symbolic_cache.put(key, result)
+            return result
+        
+        tabulator = self._get_tabulator()
+        if tabulator is None and not SYMPY_AVAILABLE:
+            return None
+        timeout = min(INTEGRATION_TIMEOUT, self.symbolic_timeout or INTEGRATION_TIMEOUT)
+        
+        # Sympy runs in the background where a worker can be killed at the deadline;
+        # without the pool it would run unbounded, so it only runs if quadrature fails
+        race: Dict[str, Any] = {"exact": None, "numeric": None}
+        finished, answered = threading.Event(), threading.Event()
+        
+        def attempt() -> None:
+            try:
+                race["exact"] = self._run_symbolic(_integrate_with_sympy, expression, variable, start_text,
+                                                   stop_text, stage="integral", timeout=timeout)
+            except Exception:
+                pass
+            finished.set()
+            # Whatever answered is kept, so the race is not run again
+            if self.symbolic_cache is not None and answered.wait(timeout):
+                result = exact_answer(race["exact"]) or race["numeric"]
+                if result is not None:
+                    self.symbolic_cache.put(key, result)
+        
+        racing = SYMPY_AVAILABLE and self.symbolic_pool is not None
+        if racing:
+            threading.Thread(target=attempt, daemon=True).start()
+        
+        numeric, error = None, None
+        if tabulator is not None:
+            import quadrature
+            try:
+                start, stop = self._integral_bound(start_text), self._integral_bound(stop_text)
+                program = tabulator.compile(expression, variable)
+                with self.timed("quadrature"):
+                    numeric = quadrature.integrate(lambda values: tabulator.evaluate(program, values), start, stop,
+                                                   deadline=time.monotonic() + timeout)
+            except (ExpressionError, ValueError) as e:
+                error = str(e)
+        
+        if numeric is not None:
+            note = "" if numeric["converged"] else "; the estimate did not reach the requested accuracy"
+            race["numeric"] = (
+                f"The integral of {text}{bounds} is {numeric['value']:.15g} ± {numeric['error']:.1e}"
+                f" (numeric, adaptive Gauss-Kronrod quadrature over {numeric['intervals']} intervals{note})"
+            )
+        answered.set()
+        
+        if racing:
+            # An exact answer that came in first wins; otherwise one that meets the tolerance does
+            if not finished.is_set() and not (numeric is not None and numeric["converged"]):
+                finished.wait(timeout)
+            if finished.is_set() and race["exact"] is not None:
+                return exact_answer(race["exact"])
+        elif SYMPY_AVAILABLE and not (numeric is not None and numeric["converged"]):
+            try:
+                race["exact"] = self._run_symbolic(_integrate_with_sympy, expression, variable,
+                                                   start_text, stop_text, stage="integral")
+            except Exception:
+                pass
+            if race["exact"] is not None:
+                return exact_answer(race["exact"])
+        
+        if race["numeric"] is not None:
+            return race["numeric"]
+        return f"Could not integrate {text}{bounds}: {error or 'no method found the value in time'}"
+    
+    def _integral_bound(self, text: str) -> float:
+        """Value of an integral bound such as "0", "pi/2" or "-infinity"."""
+        sign = -1.0 if text.startswith('-') else 1.0
+        word = text.lstrip('+-').lower()
+        if word in INFINITY_WORDS:
+            return sign * INFINITY_WORDS[word]
+        import numpy as np
+        # A bound has no variable, so it evaluates the same at any point
+        program = self._tabulator.compile(normalize_expression(text), " ")
+        return float(self._tabulator.evaluate(program, np.zeros(1))[0])
     
-    def _evaluate_arithmetic(self, query: str) -> str:
-        """Safely evaluate arithmetic expressions."""
+    def _handle_precise(self, query: str) -> Optional[str]:
+        """
+        Evaluate an expression with mpmath to the digits the query asks for, or to
+        ``precision_digits``.
+        
+        Returns:
+            Optional[str]: The answer, or None if the query asks for no precision
+            and isn't a plain expression
+        """
+        precision = PRECISION_PATTERN.search(query)
+        if precision:
+            digits = int(precision.group('digits') or precision.group('leading'))
+            unit = (precision.group('unit') or precision.group('leading_unit')).lower()
+            decimal_places = unit in ('decimal places', 'decimals', 'places')
+            text = query[:precision.start()] + ' ' + query[precision.end():]
+        elif self.precision_digits is not None:
+            digits, decimal_places, text = self.precision_digits, False, query
+        else:
+            return None
+        
+        text = PRECISE_PREFIX_PATTERN.sub('', text.strip().rstrip('?.!').strip()).strip()
+        for pattern, replacement in PRECISE_WORDS:
+            text = pattern.sub(replacement, text)
+        expression = normalize_expression(FUNCTION_ARGUMENT_PATTERN.sub(r'\1(\2)', text))
         try:
-            # Extract and clean the mathematical expression more carefully
-            # Look for patterns like "Calculate 25 + 17" or "25 + 17"
-            
-            # First try to find a clear mathematical expression
-            math_expression_match = re.search(r'(\d+(?:\.\d+)?)\s*([\+\-\*\/])\s*(\d+(?:\.\d+)?)', query)
-            
-            if math_expression_match:
-                # Found a simple binary operation
-                num1 = float(math_expression_match.group(1))
-                operator = math_expression_match.group(2)
-                num2 = float(math_expression_match.group(3))
-                
-                if operator == '+':
-                    result = num1 + num2
-                elif operator == '-':
-                    result = num1 - num2
-                elif operator == '*':
-                    result = num1 * num2
-                elif operator == '/':
-                    if num2 != 0:
-                        result = num1 / num2
-                    else:
-                        return "Cannot divide by zero"
-                
-                # Format result nicely
-                if result == int(result):
-                    result = int(result)
-                
-                return f"The result of {num1} {operator} {num2} is {result}"
-            
-            # Try to extract a more complex expression
-            # Remove words but keep mathematical symbols and numbers
-            expression = re.sub(r'\b(calculate|compute|solve|what is|the result of)\b', '', query.lower())
-            expression = re.sub(r'[^\d\+\-\*\/\(\)\.\s]', '', expression)
-            expression = expression.strip()
-            
-            if expression and re.search(r'\d', expression):
-                # Safely evaluate the expression
-                result = eval(expression)
-                
-                # Format result nicely
-                if isinstance(result, float) and result == int(result):
-                    result = int(result)
-                
-                return f"The result of {expression} is {result}"
-            else:
-                return f"Could not extract a mathematical expression from: {query}"
-                
-        except Exception as e:
-            return f"Could not evaluate the arithmetic expression: {query}. Error: {str(e)}"
+            high_precision.compile_expression(expression)
+        except ExpressionError as e:
+            if precision:
+                return f"Could not compute {text} to {digits} digits: {str(e)}"
+            return None
+        
+        if digits > high_precision.MAX_DIGITS:
+            return f"At most {high_precision.MAX_DIGITS} digits can be computed, not {digits}"
+        
+        unit = 'decimal places' if decimal_places else 'digits'
+        key = canonical_key(expression, f"{unit}:{digits}", _mpmath_version())
+        # Long results would crowd everything else out of the cache
+        cacheable = self.symbolic_cache is not None and digits <= CACHED_DIGITS
+        if cacheable:
+            cached = self.symbolic_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        try:
+            value = self._run_symbolic(high_precision.evaluate, expression, digits, decimal_places, stage="precision")
+        except (ExpressionError, WorkerError) as e:
+            return f"Could not compute {text} to {digits} {unit}: {str(e)}"
+        
+        result = f"{text} to {digits} {unit}: {value}"
+        if cacheable:
+            self.symbolic_cache.put(key, result)
+        return result
+    
+    def _handle_linear_algebra(self, analysis: QueryAnalysis) -> Optional[str]:
+        """
+        Apply a matrix operation with NumPy, or solve a system of linear equations
+        with LAPACK, which stays fast for hundreds of equations where sympy doesn't.
+        
+        Returns:
+            Optional[str]: The answer, or None if the query has no matrix and isn't
+            a system of linear equations
+        """
+        query, query_lower = analysis.query, analysis.lower
+        has_matrix = analysis.math_tokens.has_matrix
+        if not has_matrix and analysis.math_tokens.count(EQUALS) < 2:
+            return None
+        
+        # NumPy is only imported by the first matrix or system query
+        import linear_algebra
+        if not linear_algebra.NUMPY_AVAILABLE:
+            return "Matrix operations and linear systems require numpy" if has_matrix else None
+        
+        if not has_matrix:
+            try:
+                return linear_algebra.describe_system(query)
+            except ExpressionLimitError as e:
+                return f"The system is too large to solve: {str(e)}"
+            except ExpressionError:
+                # Not a linear system, e.g. "x^2 + y = 3, x = y"; left to sympy
+                return None
+        
+        try:
+            literals = linear_algebra.find_matrices(query)
+        except ExpressionLimitError as e:
+            return f"The matrix is too large: {str(e)}"
+        except ExpressionError as e:
+            return f"Could not read the matrix: {str(e)}"
+        
+        # The operation is named by the words around the matrices
+        words, position = [], 0
+        for start, end, _ in literals:
+            words.append(query_lower[position:start])
+            position = end
+        words.append(query_lower[position:])
+        operation = linear_algebra.find_operation(" ".join(words))
+        if operation is None:
+            return "Please say what to do with the matrix, e.g. determinant, inverse, eigenvalues or multiply"
+        
+        try:
+            return linear_algebra.apply_operation(operation, [matrix for _, _, matrix in literals])
+        except ExpressionError as e:
+            return str(e)
+    
+    def _handle_polynomial(self, query: str) -> Optional[str]:
+        """
+        Find the roots of a polynomial in one variable: exactly with sympy if it
+        answers within ``EXACT_ROOTS_TIMEOUT``, otherwise numerically from the
+        eigenvalues of the companion matrix.
+        
+        Returns:
+            Optional[str]: The roots and the method that found them, or None if the
+            query isn't about a polynomial of degree one or more
+        """
+        text = POLYNOMIAL_SUFFIX_PATTERN.sub('', POLYNOMIAL_PREFIX_PATTERN.sub('', query.strip(), count=1))
+        sides = [side.strip() for side in text.split('=')]
+        if len(sides) > 2 or not all(sides):
+            return None
+        # "p = q" has the roots of p - q
+        expression = normalize_expression(sides[0] if sides[1:] in ([], ['0']) else f"{sides[0]} - ({sides[1]})")
+        
+        # NumPy is only imported by the first polynomial
+        import polynomials
+        if not polynomials.NUMPY_AVAILABLE:
+            return None
+        try:
+            variable = polynomials.find_variable(expression)
+            if variable is None:
+                return None
+            with self.timed("polynomial"):
+                coefficients = polynomials.coefficients(expression, variable)
+        except ExpressionLimitError as e:
+            return f"The polynomial is too large to solve: {str(e)}"
+        except ExpressionError:
+            return None
+        degree = len(coefficients) - 1
+        if degree < 1:
+            return None
+        
+        key = canonical_key(expression, "roots", _sympy_version())
+        if self.symbolic_cache is not None:
+            cached = self.symbolic_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        note = ""
+        if SYMPY_AVAILABLE and degree <= MAX_EXACT_DEGREE:
+            timeout = min(EXACT_ROOTS_TIMEOUT, self.symbolic_timeout or EXACT_ROOTS_TIMEOUT)
+            try:
+                exact = self._run_symbolic(_exact_roots, expression, variable, stage="polynomial", timeout=timeout)
+            except WorkerTimeoutError:
+                exact, note = None, f" (no exact roots within {timeout:g} seconds)"
+            except Exception:
+                exact = None
+            if exact is not None:
+                result = f"Roots of {text} (exact, by sympy): {exact}"
+                if self.symbolic_cache is not None:
+                    self.symbolic_cache.put(key, result)
+                return result
+        
+        with self.timed("polynomial"):
+            roots = polynomials.numeric_roots(coefficients)
+        real = int((roots.imag == 0).sum())
+        result = (f"Roots of {text} (numeric, eigenvalues of the companion matrix refined by Newton's method"
+                  f"{note}): {polynomials.describe_roots(roots, variable)}"
+                  f" [{real} real, {degree - real} complex]")
+        # A timed-out exact attempt is not retried for the same polynomial
+        if self.symbolic_cache is not None:
+            self.symbolic_cache.put(key, result)
+        return result
     
-    def _handle_factorial(self, query: str) -> str:
-        """Handle factorial calculations."""
-        numbers = re.findall(r'\d+', query)
+    def _handle_factorial(self, tokens: MathTokens) -> str:
+        """Handle factorial calculations, summarizing results too long to write out."""
+        match = tokens.find(FACTORIAL)
+        numbers = [match[0][1]] if match else tokens.numbers
         if numbers:
+            if not numbers[0].isdigit():
+                return f"The factorial is only defined for whole numbers, not {numbers[0]}"
             n = int(numbers[0])
-            if n <= 20:  # Prevent huge calculations
-                result = math.factorial(n)
-                return f"The factorial of {n} is {result}"
-            else:
+            if n > combinatorics.MAX_N:
                 return f"Factorial of {n} is too large to calculate"
+            return f"The factorial of {n} is {combinatorics.factorial(n).describe()}"
         return "Could not find a number for factorial calculation"
     
-    def _handle_trigonometry(self, query: str) -> str:
+    def _combinatorics_arguments(self, tokens: MathTokens) -> Optional[tuple]:
+        """
+        The arguments of "10 choose 3", "10C3", "C(10, 3)" or "P(10, 3)".
+        
+        Returns:
+            Optional[tuple]: Whether it is a permutation, n and k; None if the
+            query has none of these forms with whole numbers
+        """
+        for is_permutation, forms in ((False, COMBINATIONS), (True, PERMUTATIONS)):
+            for steps in forms:
+                match = tokens.find(steps)
+                if match is None:
+                    continue
+                numbers = [text for kind, text, _, _ in match if kind == NUMBER]
+                if all(number.isdigit() for number in numbers):
+                    return is_permutation, int(numbers[0]), int(numbers[1])
+        return None
+    
+    def _handle_combinatorics(self, tokens: MathTokens, arguments: Optional[tuple]) -> str:
+        """Handle binomial coefficients ("10 choose 3") and permutations ("P(10, 3)")."""
+        if arguments is not None:
+            is_permutation, n, k = arguments
+        else:
+            numbers = tokens.integers
+            if len(numbers) < 2:
+                return "Please give the number of items and how many to pick, e.g. 10 choose 3"
+            # "ways to choose 3 of 10" and "combinations of 10 taken 3" both mean C(10, 3)
+            n, k = max(numbers[:2]), min(numbers[:2])
+            is_permutation = bool(tokens.words & {'permutation', 'permutations'})
+        
+        if max(n, k) > combinatorics.MAX_N:
+            return f"The numbers must be at most {combinatorics.MAX_N}"
+        if is_permutation:
+            return f"P({n}, {k}) is {combinatorics.permutations(n, k).describe()}"
+        return f"C({n}, {k}) is {combinatorics.binomial(n, k).describe()}"
+    
+    def _handle_trigonometry(self, tokens: MathTokens) -> str:
         """Handle trigonometric functions."""
-        numbers = re.findall(r'\d+(?:\.\d+)?', query)
+        numbers = tokens.numbers
         if not numbers:
             return "Please specify a number for trigonometric calculation"
         
         angle = float(numbers[0])
-        query_lower = query.lower()
         
         # Convert to radians if it seems like degrees
-        if 'degree' in query_lower or 'deg' in query_lower:
+        if tokens.words & {'deg', 'degree', 'degrees'} or '°' in tokens.keys:
             angle_rad = math.radians(angle)
         else:
             angle_rad = angle
         
-        if 'sin' in query_lower:
-            result = math.sin(angle_rad)
-            return f"sin({angle}) = {result:.6f}"
-        elif 'cos' in query_lower:
-            result = math.cos(angle_rad)
-            return f"cos({angle}) = {result:.6f}"
-        elif 'tan' in query_lower:
-            result = math.tan(angle_rad)
-            return f"tan({angle}) = {result:.6f}"
+        # The first function named in the query
+        for kind, text, _, _ in tokens.tokens:
+            name = TRIGONOMETRY_WORDS.get(text) if kind == NAME else None
+            if name is not None:
+                result = getattr(math, name)(angle_rad)
+                return f"{name}({angle}) = {result:.6f}"
         
         return "Could not determine which trigonometric function to use"
     
-    def _handle_square_root(self, query: str) -> str:
+    def _handle_square_root(self, tokens: MathTokens) -> str:
         """Handle square root calculations."""
-        numbers = re.findall(r'\d+(?:\.\d+)?', query)
+        numbers = tokens.numbers
         if numbers:
             n = float(numbers[0])
             if n >= 0:
@@ -253,71 +808,227 @@ class MathGeekAgent(BaseAgent):
                 return f"Cannot calculate square root of negative number {n}"
         return "Could not find a number for square root calculation"
     
-    def _handle_power(self, query: str) -> str:
+    def _handle_power(self, tokens: MathTokens) -> str:
         """Handle power calculations."""
-        # Look for patterns like "2 to the power of 3" or "2^3" or "2**3"
-        power_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:to the power of|\^|\*\*)\s*(\d+(?:\.\d+)?)', query)
-        if power_match:
-            base = float(power_match.group(1))
-            exponent = float(power_match.group(2))
-            result = base ** exponent
-            return f"{base} to the power of {exponent} is {result}"
+        # Look for patterns like "2 to the power of 3"
+        for steps in POWERS:
+            match = tokens.find(steps)
+            if match:
+                base = float(match[0][1])
+                exponent = float(match[-1][1])
+                result = base ** exponent
+                return f"{base} to the power of {exponent} is {result}"
         
         return "Could not parse the power expression"
     
-    def _handle_with_sympy(self, query: str) -> str:
-        """Use sympy for more complex mathematical expressions."""
+    def _handle_with_sympy(self, tokens: MathTokens) -> str:
+        """Use sympy for more complex expressions."""
+        # The first run of numbers, operators other than "%", parentheses, x and
+        # function calls like "exp("
+        run = []
+        for index, token in enumerate(tokens.tokens):
+            following = tokens.tokens[index + 1] if index + 1 < len(tokens.tokens) else None
+            if (token[0] in (NUMBER, LPAREN, RPAREN) or (token[0] == OPERATOR and token[1] != '%')
+                    or (token[0] == NAME and token[1] == 'x')
+                    or (token[1] in FUNCTION_WORDS and following is not None and following[0] == LPAREN
+                        and tokens.adjacent(token, following))):
+                run.append(token)
+            elif run:
+                break
+        if not run:
+            return "Could not parse the mathematical expression"
+        
+        expr_str = normalize_expression(tokens.query[run[0][2]:run[-1][3]])
+        
+        operation = None
+        for name in ('solve', 'derivative', 'integral'):
+            if name in tokens.words:
+                operation = name
+                break
+        
+        # Textbook problems come up again and again; only successful results are cached
+        key = canonical_key(expr_str, operation, _sympy_version())
+        if self.symbolic_cache is not None:
+            cached = self.symbolic_cache.get(key)
+            if cached is not None:
+                return cached
+        
         try:
-            # Try to extract mathematical expressions from the query
-            # This is a simplified approach
-            expression_match = re.search(r'[\d\+\-\*\/\^\(\)x]+', query)
-            if expression_match:
-                expr_str = expression_match.group()
-                expr_str = expr_str.replace('^', '**')  # Convert to Python power notation
-                
-                if 'x' in expr_str:
-                    x = sp.Symbol('x')
-                    expr = sp.sympify(expr_str)
-                    
-                    if 'solve' in query.lower():
-                        solution = sp.solve(expr, x)
-                        return f"Solution(s) for {expr_str} = 0: {solution}"
-                    elif 'derivative' in query.lower():
-                        derivative = sp.diff(expr, x)
-                        return f"Derivative of {expr_str} is: {derivative}"
-                    elif 'integral' in query.lower():
-                        integral = sp.integrate(expr, x)
-                        return f"Integral of {expr_str} is: {integral}"
-                    else:
-                        return f"Expression: {expr_str} = {expr}"
-                else:
-                    expr = sp.sympify(expr_str)
-                    result = expr.evalf()
-                    return f"The result of {expr_str} is {result}"
+            result = self._run_symbolic(_compute_with_sympy, expr_str, operation)
+        except WorkerTimeoutError:
+            raise
         except Exception as e:
             return f"Could not process with sympy: {str(e)}"
         
-        return "Could not parse the mathematical expression"
+        if self.symbolic_cache is not None:
+            self.symbolic_cache.put(key, result)
+        return result
     
-    def _evaluate_simple_expression(self, query: str) -> str:
+    def _run_symbolic(self, func, *args, stage: str = "sympy", timeout: Optional[float] = None) -> str:
+        """
+        Run a symbolic computation in the worker pool, or inline if the pool is disabled.
+        
+        The deadline is ``timeout`` if given, otherwise ``symbolic_timeout``.
+        """
+        with self.timed(stage):
+            if self.symbolic_pool is None:
+                return func(*args)
+            return self.symbolic_pool.run(func, *args, timeout=timeout if timeout is not None else self.symbolic_timeout)
+    
+    def _evaluate_simple_expression(self, tokens: MathTokens) -> str:
         """Fallback method for simple evaluations."""
-        # Extract numbers from the query
-        numbers = re.findall(r'\d+(?:\.\d+)?', query)
+        numbers = tokens.numbers
         
         if len(numbers) >= 2:
             a, b = float(numbers[0]), float(numbers[1])
-            query_lower = query.lower()
+            # Words and operator symbols alike
+            keys = tokens.keys
             
-            if any(op in query_lower for op in ['add', 'plus', '+']):
+            if keys & {'add', 'plus', '+'}:
                 return f"{a} + {b} = {a + b}"
-            elif any(op in query_lower for op in ['subtract', 'minus', '-']):
+            elif keys & {'subtract', 'minus', '-'}:
                 return f"{a} - {b} = {a - b}"
-            elif any(op in query_lower for op in ['multiply', 'times', '*']):
+            elif keys & {'multiply', 'times', '*'}:
                 return f"{a} * {b} = {a * b}"
-            elif any(op in query_lower for op in ['divide', 'divided by', '/']):
+            elif keys & {'divide', 'divided', '/'}:
                 if b != 0:
                     return f"{a} / {b} = {a / b}"
                 else:
                     return "Cannot divide by zero"
         
-        return f"I understand this is a math question, but I need a clearer mathematical expression to solve. Could you rephrase? Original query: {query}"
+        return f"I understand this is a math question, but I need a clearer mathematical expression to solve. Could you rephrase? Original query: {tokens.query}"
+
+
+def _compute_with_sympy(expr_str: str, operation: Optional[str]) -> str:
+    """Evaluate an expression with sympy; runs inside a symbolic worker process."""
+    import sympy as sp
+    
+    expr = sp.sympify(expr_str)
+    # The x of "exp(2)" is not a variable
+    if expr.free_symbols:
+        x = sp.Symbol('x')
+        
+        if operation == 'solve':
+            solution = sp.solve(expr, x)
+            return f"Solution(s) for {expr_str} = 0: {solution}"
+        elif operation == 'derivative':
+            derivative = sp.diff(expr, x)
+            return f"Derivative of {expr_str} is: {derivative}"
+        elif operation == 'integral':
+            integral = sp.integrate(expr, x)
+            return f"Integral of {expr_str} is: {integral}"
+        else:
+            return f"Expression: {expr_str} = {expr}"
+    else:
+        result = expr.evalf()
+        return f"The result of {expr_str} is {result}"
+
+
+def _integrate_with_sympy(expression: str, variable: str, start: Optional[str],
+                          stop: Optional[str]) -> Optional[tuple]:
+    """
+    Integrate with sympy; runs inside a symbolic worker process.
+    
+    Returns:
+        Optional[tuple]: The antiderivative, or the exact value of a definite
+        integral and its float; None if sympy leaves the integral unevaluated
+    """
+    import sympy as sp
+    
+    symbol = sp.Symbol(variable)
+    expr = sp.sympify(expression, locals={variable: symbol})
+    if start is None:
+        result = sp.integrate(expr, symbol)
+        return None if result.has(sp.Integral) else (str(result),)
+    
+    def bound(text: str):
+        word = text.lstrip('+-').lower()
+        if word in INFINITY_WORDS:
+            return -sp.oo if text.startswith('-') else sp.oo
+        return sp.sympify(text.replace('^', '**'))
+    
+    result = sp.integrate(expr, (symbol, bound(start), bound(stop)))
+    if result.has(sp.Integral):
+        return None
+    value = complex(sp.N(result, 17))
+    if value.imag or not math.isfinite(value.real):
+        return None
+    return (str(result), value.real)
+
+
+def _integration_variable(expression: str) -> str:
+    """The one-letter variable of an integrand, "x" if there is none or several."""
+    letters = set(re.findall(r'\b([a-df-z])\b', expression))
+    return letters.pop() if len(letters) == 1 else 'x'
+
+
+def _exact_roots(expression: str, variable: str) -> Optional[str]:
+    """
+    Exact roots of a polynomial with sympy; runs inside a symbolic worker process.
+    
+    Returns:
+        Optional[str]: The roots in radicals, with their multiplicities, or None if
+        sympy can't express all of them that way (as for most polynomials of degree 5+)
+    """
+    import sympy as sp
+    
+    symbol = sp.Symbol(variable)
+    polynomial = sp.Poly(sp.sympify(expression, locals={variable: symbol}), symbol)
+    roots = sp.roots(polynomial)
+    if sum(roots.values()) < polynomial.degree():
+        return None
+    return ", ".join(
+        f"{variable} = {root}" + (f" (multiplicity {count})" if count > 1 else "")
+        for root, count in roots.items()
+    )
+
+
+# Symbolic worker pool shared by all Math Geek agents, started on first use
+_symbolic_pool: Optional[WorkerPool] = None
+
+
+def get_symbolic_pool() -> WorkerPool:
+    """Get the shared pool of sympy worker processes."""
+    global _symbolic_pool
+    if _symbolic_pool is None:
+        _symbolic_pool = WorkerPool(size=2, timeout=10.0, memory_limit_mb=512, preload_modules=("sympy", "mpmath"))
+    return _symbolic_pool
+
+
+# Symbolic results shared by all Math Geek agents, created on first use
+_symbolic_cache: Optional[SymbolicCache] = None
+
+
+def get_symbolic_cache() -> SymbolicCache:
+    """
+    Get the shared cache of sympy results.
+    
+    Results are kept in memory, and also in the SQLite file named by the
+    AGENT_SYMBOLIC_CACHE_PATH environment variable if it is set, so they
+    survive restarts and are shared with other processes using the same file.
+    """
+    global _symbolic_cache
+    if _symbolic_cache is None:
+        _symbolic_cache = SymbolicCache(path=os.environ.get('AGENT_SYMBOLIC_CACHE_PATH'))
+    return _symbolic_cache
+
+
+@lru_cache(maxsize=None)
+def _sympy_version() -> str:
+    """Installed sympy version, or "none"; cached results of one version are not reused by another."""
+    # Imported on first use: reading package metadata is slow to import
+    from importlib import metadata
+    try:
+        return metadata.version("sympy")
+    except metadata.PackageNotFoundError:
+        return "none"
+
+
+@lru_cache(maxsize=None)
+def _mpmath_version() -> str:
+    """Installed mpmath version, namespacing cached high-precision results."""
+    from importlib import metadata
+    try:
+        return "mpmath-" + metadata.version("mpmath")
+    except metadata.PackageNotFoundError:
+        return "mpmath-none"
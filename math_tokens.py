@@ -0,0 +1,316 @@
+"""
+Math Tokens
+Single-pass tokenizer for math queries. The query is split once into typed
+tokens: numbers, words, operators, brackets and punctuation. The Math Geek
+Agent reads everything it routes and dispatches on off this one token
+stream: the words and numbers, short token sequences such as "10 choose 3",
+"sin(" or "5!", matrix literals, and the arithmetic expression, if there is one.
+"""
+
+import re
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+# Token kinds
+NUMBER = "NUMBER"
+NAME = "NAME"
+OPERATOR = "OPERATOR"
+LPAREN = "LPAREN"
+RPAREN = "RPAREN"
+LBRACKET = "LBRACKET"
+RBRACKET = "RBRACKET"
+COMMA = "COMMA"
+SEMICOLON = "SEMICOLON"
+EQUALS = "EQUALS"
+COMPARISON = "COMPARISON"
+BANG = "BANG"
+NEWLINE = "NEWLINE"
+OTHER = "OTHER"
+KINDS = frozenset({
+    NUMBER, NAME, OPERATOR, LPAREN, RPAREN, LBRACKET, RBRACKET, COMMA, SEMICOLON, EQUALS, COMPARISON, BANG,
+    NEWLINE, OTHER,
+})
+
+# One alternative per kind, tried in order; spaces and tabs only separate tokens.
+# "!=" is a comparison, so "5!" is a factorial and "5 != 6" is not
+TOKEN_PATTERN = re.compile(
+    r'(?P<NUMBER>\d+(?:\.\d*)?|\.\d+)|(?P<NAME>[^\W\d_]+)|(?P<OPERATOR>\*\*|[-+*/^%])'
+    r'|(?P<LPAREN>\()|(?P<RPAREN>\))|(?P<LBRACKET>\[)|(?P<RBRACKET>\])|(?P<COMMA>,)|(?P<SEMICOLON>;)'
+    r'|(?P<COMPARISON>[!=<>]=|[<>])|(?P<EQUALS>=)|(?P<BANG>!)|(?P<NEWLINE>\n)|(?P<OTHER>[^ \t])'
+)
+
+# Most tokens read from a query. Longer queries are large matrices, systems and
+# polynomials, which their handlers parse from the text; they are routed and
+# dispatched on their beginning
+MAX_TOKENS = 10000
+
+# A token: kind, lowercased text, and start and end offsets in the query
+Token = Tuple[str, str, int, int]
+
+# A step of a token sequence: the kinds and lowercased texts it accepts, or
+# None for any run of tokens on the same line
+Step = Optional[FrozenSet[str]]
+
+# Kinds nearly every query has, so the last to index a sequence under
+_COMMON_KINDS = frozenset({NUMBER, NAME})
+
+# Tokens an arithmetic expression is made of, e.g. "(3 + 4) * 2^3"
+_EXPRESSION_KINDS = frozenset({NUMBER, OPERATOR, LPAREN, RPAREN})
+
+
+def sequence(*steps: Union[str, Iterable[str], Any]) -> Tuple[Step, ...]:
+    """
+    Compile a token sequence for ``MathTokens.find``.
+
+    Args:
+        *steps: A kind such as ``NUMBER`` or a lowercase word, a collection of
+            them to accept any, or ``...`` for any run of tokens on the same line;
+            the first step is not ``...``
+
+    Returns:
+        Tuple[Step, ...]: The steps, ready to match
+    """
+    return tuple(
+        None if step is ... else frozenset({step} if isinstance(step, str) else step)
+        for step in steps
+    )
+
+
+class SequenceIndex:
+    """
+    Token sequences looked for together, as by ``MathTokens.find_any``.
+
+    Each sequence is indexed under the texts of its most selective step,
+    preferring words to kinds and numbers and words in general last, so a
+    query only tries the few sequences whose words it contains.
+    """
+
+    def __init__(self, sequences: Iterable[Tuple[Step, ...]]):
+        self.sequences: List[Tuple[Step, ...]] = list(sequences)
+        self.index: Dict[str, List[int]] = {}
+        for number, steps in enumerate(self.sequences):
+            trigger = min((step for step in steps if step is not None),
+                          key=lambda step: (not step.isdisjoint(KINDS), not step.isdisjoint(_COMMON_KINDS), len(step)))
+            for key in trigger:
+                self.index.setdefault(key, []).append(number)
+
+
+class MathTokens:
+    """
+    The tokens of one query, and the features read off them.
+
+    Tokens are found in one pass on construction, up to ``MAX_TOKENS``;
+    ``QueryAnalysis.math_tokens`` creates them on first access, so routing,
+    dispatch and the handlers share a single tokenization.
+    """
+
+    def __init__(self, query: str, lower: Optional[str] = None):
+        """
+        Tokenize a query.
+
+        Args:
+            query (str): The query
+            lower (Optional[str]): The query lowercased, if already at hand
+        """
+        self.query = query
+        if lower is None:
+            lower = query.lower()
+        if len(lower) == len(query):
+            matches = islice(TOKEN_PATTERN.finditer(lower), MAX_TOKENS)
+            self.tokens: List[Token] = [(match.lastgroup, match[0], match.start(), match.end()) for match in matches]
+        else:
+            # Offsets into the lowercased text would not hold for the query
+            matches = islice(TOKEN_PATTERN.finditer(query), MAX_TOKENS)
+            self.tokens = [(match.lastgroup, match[0].lower(), match.start(), match.end()) for match in matches]
+        # Every text and kind, so ``find`` rejects sequences that cannot occur
+        self.keys: Set[str] = set()
+        for kind, token_text, _, _ in self.tokens:
+            self.keys.add(kind)
+            self.keys.add(token_text)
+
+    @property
+    def words(self) -> Set[str]:
+        """Lowercased words of the query."""
+        return {text for kind, text, _, _ in self.tokens if kind == NAME}
+
+    @property
+    def numbers(self) -> List[str]:
+        """Numbers in the query, in order of appearance."""
+        return [text for kind, text, _, _ in self.tokens if kind == NUMBER]
+
+    @property
+    def integers(self) -> List[int]:
+        """Whole numbers in the query, in order of appearance."""
+        return [int(text) for kind, text, _, _ in self.tokens if kind == NUMBER and text.isdigit()]
+
+    def count(self, kind: str) -> int:
+        """Number of tokens of a kind."""
+        if kind not in self.keys:
+            return 0
+        return sum(1 for token in self.tokens if token[0] == kind)
+
+    def find(self, steps: Tuple[Step, ...]) -> Optional[List[Token]]:
+        """
+        First place where a token sequence occurs.
+
+        Consecutive steps match consecutive tokens, so only spaces may separate
+        them, except across a ``...`` step, which skips any tokens up to the end
+        of the line. Each run of steps after a ``...`` is matched where it first
+        occurs, which allows the rest of the sequence wherever a later place
+        would, so no token is tried twice for the same run and the search is
+        linear in the number of tokens.
+
+        Args:
+            steps (Tuple[Step, ...]): Sequence from ``sequence``
+
+        Returns:
+            Optional[List[Token]]: The tokens matched by the steps other than
+            ``...``, or None if the sequence does not occur
+        """
+        # Every step must accept some token of the query
+        for step in steps:
+            if step is not None and step.isdisjoint(self.keys):
+                return None
+        # Runs of consecutive steps, split at the ``...`` steps
+        runs: List[List[FrozenSet[str]]] = [[]]
+        for step in steps:
+            if step is None:
+                runs.append([])
+            else:
+                runs[-1].append(step)
+
+        tokens = self.tokens
+        start = 0
+        while start < len(tokens):
+            if not self._match_run(runs[0], start):
+                start += 1
+                continue
+            matched = tokens[start:start + len(runs[0])]
+            position = start + len(runs[0])
+            for run in runs[1:]:
+                while (position < len(tokens) and tokens[position][0] != NEWLINE
+                       and not self._match_run(run, position)):
+                    position += 1
+                if position >= len(tokens) or tokens[position][0] == NEWLINE:
+                    break
+                matched += tokens[position:position + len(run)]
+                position += len(run)
+            else:
+                return matched
+            # A later start on the line would find each run here or further on,
+            # and miss the same one, so go on at the next line
+            start = position + 1
+        return None
+
+    def find_any(self, sequences: SequenceIndex) -> bool:
+        """Whether any of the indexed sequences occurs."""
+        candidates = sorted({number for key in self.keys.intersection(sequences.index)
+                             for number in sequences.index[key]})
+        return any(self.find(sequences.sequences[number]) is not None for number in candidates)
+
+    def _match_run(self, run: List[FrozenSet[str]], position: int) -> bool:
+        """Whether consecutive steps match the tokens from ``position`` on."""
+        if position + len(run) > len(self.tokens):
+            return False
+        for offset, step in enumerate(run):
+            kind, text, _, _ = self.tokens[position + offset]
+            if kind not in step and text not in step:
+                return False
+        return True
+
+    @staticmethod
+    def adjacent(first: Token, second: Token) -> bool:
+        """Whether two tokens touch, with no space between them."""
+        return first[3] == second[2]
+
+    @property
+    def operator_between_numbers(self) -> bool:
+        """Whether an operator comes between two numbers on the same line, as in "25 + 17"."""
+        first_number = operator_after = False
+        for kind, _, _, _ in self.tokens:
+            if kind == NEWLINE:
+                first_number = operator_after = False
+            elif kind == NUMBER:
+                if operator_after:
+                    return True
+                first_number = True
+            elif kind == OPERATOR and first_number:
+                operator_after = True
+        return False
+
+    @property
+    def has_matrix(self) -> bool:
+        """Whether the query has a matrix literal, "[[1, 2], [3, 4]]" or "[1 2; 3 4]"."""
+        if LBRACKET not in self.keys:
+            return False
+        tokens = self.tokens
+        for index, (kind, _, _, _) in enumerate(tokens):
+            if kind != LBRACKET:
+                continue
+            first = index + 1
+            nested = first < len(tokens) and tokens[first][0] == LBRACKET
+            if nested:
+                first += 1
+            if first < len(tokens) and tokens[first][1] in ('-', '+'):
+                first += 1
+            if first >= len(tokens) or tokens[first][0] != NUMBER:
+                continue
+            if nested:
+                return True
+            # A flat matrix separates its rows with semicolons
+            for kind, _, _, _ in tokens[first + 1:]:
+                if kind in (LBRACKET, RBRACKET):
+                    break
+                if kind == SEMICOLON:
+                    return True
+        return False
+
+    @property
+    def expression(self) -> Optional[str]:
+        """
+        The arithmetic expression of the query, like "25 + 17" or "(3 + 4) * 2^3".
+
+        Returns:
+            Optional[str]: The first run of number, operator and parenthesis tokens
+            that contains an operation, or None if there is none. A run that
+            touches a word, as in "x^2 + 3x" or "sin(30) + 1", is not arithmetic.
+        """
+        if OPERATOR not in self.keys:
+            return None
+        tokens = self.tokens
+        index = 0
+        while index < len(tokens):
+            if not self._in_expression(tokens[index]):
+                index += 1
+                continue
+            end = index
+            while end + 1 < len(tokens) and self._in_expression(tokens[end + 1]):
+                end += 1
+            if self._has_operation(tokens[index:end + 1]):
+                before = tokens[index - 1] if index > 0 else None
+                after = tokens[end + 1] if end + 1 < len(tokens) else None
+                if ((before is not None and before[0] == NAME and self.adjacent(before, tokens[index]))
+                        or (after is not None and after[0] == NAME and self.adjacent(tokens[end], after))):
+                    return None
+                # Drop a sentence-ending period
+                return self.query[tokens[index][2]:tokens[end][3]].rstrip('.').strip()
+            index = end + 1
+        return None
+
+    @staticmethod
+    def _in_expression(token: Token) -> bool:
+        """Whether a token can be part of an arithmetic expression."""
+        return token[0] in _EXPRESSION_KINDS or token[1] == '.'
+
+    @staticmethod
+    def _has_operation(run: List[Token]) -> bool:
+        """Whether a run has a number or ")" followed by an operator and, past any signs and "(", a number."""
+        for index in range(len(run) - 2):
+            if run[index][0] not in (NUMBER, RPAREN) or run[index + 1][0] != OPERATOR:
+                continue
+            following = index + 2
+            while following < len(run) and (run[following][0] == LPAREN or run[following][1] in ('-', '+')):
+                following += 1
+            if following < len(run) and run[following][0] == NUMBER:
+                return True
+        return False
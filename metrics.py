@@ -0,0 +1,198 @@
+"""
+Metrics
+Latency histograms with fixed buckets and event counters, recorded through a
+pluggable sink. The in-memory sink keeps them for ``get_status()``; other
+sinks can forward them to a monitoring system.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Histogram bucket upper bounds in seconds, from 100 microseconds to 10 seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Metric names recorded by the framework
+AGENT_CAN_HANDLE_SECONDS = "agent_can_handle_seconds"  # labels: agent
+AGENT_PROCESS_SECONDS = "agent_process_seconds"        # labels: agent
+STAGE_SECONDS = "stage_seconds"                        # labels: stage, plus agent for agent stages
+QUERY_SECONDS = "query_seconds"                        # labels: none
+ROUTING_DECISIONS = "routing_decisions_total"          # labels: agent, tier
+AGENT_ERRORS = "agent_errors_total"                    # labels: agent, error_type
+
+Labels = Dict[str, str]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Observations are counted in the first bucket whose upper bound is at least
+    the value, or in the overflow bucket. Recording is a binary search and two
+    additions, so it is cheap enough to leave on.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # Last one is the overflow bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket that contains it.
+
+        Args:
+            q (float): The quantile, between 0 and 1
+
+        Returns:
+            float: The estimate, or 0.0 if nothing was observed
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the count, sum, quantile estimates and cumulative bucket counts."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"{bound:g}"] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class MetricsSink(ABC):
+    """
+    Abstract destination for metrics.
+
+    ``observe`` is called with latencies in seconds and ``increment`` with
+    event counts. Sinks must be thread-safe and fast: they are called on the
+    request path.
+    """
+
+    @abstractmethod
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        """
+        Record a value, e.g. a latency, in the named histogram.
+
+        Args:
+            name (str): The metric name
+            value (float): The observed value
+            labels (Optional[Labels]): Label values identifying the series
+        """
+        pass
+
+    @abstractmethod
+    def increment(self, name: str, labels: Optional[Labels] = None, amount: int = 1) -> None:
+        """Add to the named counter."""
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the recorded metrics; sinks that forward them elsewhere return nothing."""
+        return {}
+
+    @contextmanager
+    def timer(self, name: str, labels: Optional[Labels] = None) -> Iterator[None]:
+        """Time the body of a ``with`` block into the named histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+
+class NullMetricsSink(MetricsSink):
+    """Sink that drops everything, to turn metrics off."""
+
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        pass
+
+    def increment(self, name: str, labels: Optional[Labels] = None, amount: int = 1) -> None:
+        pass
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """Keeps a histogram or counter per metric name and label set, in memory."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        """Record a value in the histogram for this name and label set."""
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, labels: Optional[Labels] = None, amount: int = 1) -> None:
+        """Add to the counter for this name and label set."""
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get every histogram and counter.
+
+        Returns:
+            Dict[str, Any]: ``histograms`` and ``counters``, each mapping a metric
+            name to its series: the labels plus the histogram snapshot or the
+            counter value
+        """
+        with self._lock:
+            histograms: Dict[str, List[Dict[str, Any]]] = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(name, []).append({"labels": dict(labels), **histogram.snapshot()})
+
+            counters: Dict[str, List[Dict[str, Any]]] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+        return {"histograms": histograms, "counters": counters}
+
+    def reset(self) -> None:
+        """Drop every histogram and counter."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+# Sink for agents that are not attached to a Primary Agent
+NULL_SINK = NullMetricsSink()
@@ -0,0 +1,129 @@
+"""
+Phrase Matcher
+Aho-Corasick automaton over labeled phrases: every occurrence of every phrase
+in a text is found in a single left-to-right pass, however many phrases there
+are. The language agents use it for intent phrases and lexicon indicators.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# An occurrence of a phrase: start and end offsets in the text, and its label
+Occurrence = Tuple[int, int, str]
+
+
+class PhraseMatcher:
+    """
+    Finds labeled phrases in a text with an Aho-Corasick automaton.
+
+    The automaton is compiled into a full transition table (one dict per
+    state, failure links already followed), so the scan does a single dict
+    lookup per character. Phrases are matched as substrings; use
+    ``count_words`` to keep only occurrences that are whole words.
+    """
+
+    def __init__(self, phrases: Dict[str, Iterable[str]]):
+        """
+        Build the automaton.
+
+        Args:
+            phrases (Dict[str, Iterable[str]]): Phrases for each label, labels
+                in priority order; the same phrase may appear under several labels
+        """
+        self.labels: Tuple[str, ...] = tuple(phrases)
+        self._priority = {label: rank for rank, label in enumerate(self.labels)}
+
+        # Trie of the phrases, with the (length, label) pairs that end at each state
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[int, str]]] = [[]]
+        for label, label_phrases in phrases.items():
+            for phrase in label_phrases:
+                if not phrase:
+                    continue
+                state = 0
+                for char in phrase:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][char] = next_state
+                        goto.append({})
+                        outputs.append([])
+                    state = next_state
+                if (len(phrase), label) not in outputs[state]:
+                    outputs[state].append((len(phrase), label))
+
+        # Breadth-first pass: failure links, inherited outputs and the full transition table
+        fail = [0] * len(goto)
+        self._transitions: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = list(goto[0].values())
+        for state in queue:
+            transitions = dict(self._transitions[fail[state]])
+            transitions.update(goto[state])
+            self._transitions[state] = transitions
+            outputs[state].extend(output for output in outputs[fail[state]] if output not in outputs[state])
+            for char, next_state in goto[state].items():
+                fail[next_state] = self._transitions[fail[state]].get(char, 0)
+                queue.append(next_state)
+
+        self._outputs: List[Tuple[Tuple[int, str], ...]] = [tuple(output) for output in outputs]
+
+    def find_all(self, text: str) -> List[Occurrence]:
+        """
+        Find every occurrence of every phrase, overlapping ones included.
+
+        Args:
+            text (str): The text to scan
+
+        Returns:
+            List[Occurrence]: ``(start, end, label)`` of each occurrence, by end offset
+        """
+        transitions = self._transitions
+        outputs = self._outputs
+        occurrences: List[Occurrence] = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                for length, label in outputs[state]:
+                    occurrences.append((end - length, end, label))
+        return occurrences
+
+    def match(self, text: str) -> List[str]:
+        """Labels with at least one phrase in the text, in priority order."""
+        return self.labels_of(self.find_all(text))
+
+    def labels_of(self, occurrences: Iterable[Occurrence]) -> List[str]:
+        """Labels of some occurrences, each once, in priority order."""
+        return sorted({label for _, _, label in occurrences}, key=self._priority.__getitem__)
+
+
+def count_words(text: str, occurrences: Sequence[Occurrence], label: str) -> int:
+    """
+    Count the whitespace-separated words of a text covered by whole-word
+    occurrences of a label's phrases.
+
+    A multi-word phrase such as ``'por favor'`` covers each of its words; a word
+    covered by several occurrences is counted once.
+
+    Args:
+        text (str): The text the occurrences were found in
+        occurrences (Sequence[Occurrence]): Result of ``PhraseMatcher.find_all``
+        label (str): The label to count
+
+    Returns:
+        int: Number of covered words
+    """
+    word_starts = None
+    covered = set()
+    for start, end, occurrence_label in occurrences:
+        if occurrence_label != label:
+            continue
+        if (start and not text[start - 1].isspace()) or (end < len(text) and not text[end].isspace()):
+            continue
+        if word_starts is None:
+            word_starts = [index for index, char in enumerate(text)
+                           if not char.isspace() and (index == 0 or text[index - 1].isspace())]
+        first = bisect_right(word_starts, start) - 1
+        last = bisect_right(word_starts, end - 1) - 1
+        covered.update(range(first, last + 1))
+    return len(covered)
@@ -0,0 +1,215 @@
+"""
+Polynomials
+Roots of polynomials in one variable, found numerically with NumPy. The
+expression is checked against a whitelist AST and expanded into coefficients
+(so ``(x - 1)(x + 2)^3`` works as well as ``x^7 - 2x + 1``); the roots are
+the eigenvalues of the companion matrix, polished by a few vectorized Newton
+steps. Exact roots are left to sympy, under a deadline, by the caller.
+"""
+
+import ast
+from typing import List, Optional, Tuple
+
+from linear_algebra import format_number
+from safe_eval import ExpressionError, ExpressionLimitError
+
+try:
+    import numpy as np
+    from numpy.polynomial import polynomial as P
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Highest degree solved; the companion matrix has this many rows and columns
+MAX_DEGREE = 500
+
+# Longest expression and most AST nodes accepted; polynomials are written out
+# term by term, so both are larger than for arithmetic
+MAX_EXPRESSION_LENGTH = 20000
+MAX_NODES = 10000
+
+# Newton steps applied to the eigenvalues; each one only keeps roots it improves
+REFINE_STEPS = 3
+
+# Relative size under which the imaginary part of a root is dropped
+REAL_TOLERANCE = 1e-9
+
+# Relative distance under which roots are taken for one multiple root. The
+# eigenvalues of a root of multiplicity m scatter by about eps^(1/m) around it,
+# while their mean stays accurate
+CLUSTER_TOLERANCE = 1e-4
+
+
+def find_variable(expression: str) -> Optional[str]:
+    """
+    The single variable of an expression in Python syntax.
+
+    Returns:
+        Optional[str]: The variable, or None if there is none
+
+    Raises:
+        ExpressionError: If the expression is invalid or has more than one variable
+    """
+    tree = _parse(expression)
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    if len(names) > 1:
+        raise ExpressionError(f"Expression has more than one variable: {', '.join(sorted(names))}")
+    return names.pop() if names else None
+
+
+def _parse(expression: str) -> ast.Expression:
+    """Parse an expression, within the length and node limits."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionLimitError(f"Polynomial is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+        raise ExpressionError(f"Invalid expression: {expression}") from e
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise ExpressionLimitError(f"Polynomial has more than {MAX_NODES} operations and numbers")
+    return tree
+
+
+def coefficients(expression: str, variable: str = "x") -> "np.ndarray":
+    """
+    Expand a polynomial into its coefficients.
+
+    Args:
+        expression (str): Polynomial in the variable, in Python syntax, e.g. ``x**3 - 2*(x + 1)**2``
+        variable (str): Name of the variable
+
+    Returns:
+        np.ndarray: Coefficients from the constant term up, without trailing zeros
+
+    Raises:
+        ExpressionError: If the expression is not a polynomial in the variable
+        ExpressionLimitError: If it is too long or its degree is above ``MAX_DEGREE``
+    """
+    tree = _parse(expression)
+    stack: List["np.ndarray"] = []
+    pending = [(tree.body, False)]
+    # Iterative post-order walk; a node is applied to its operands' coefficients
+    while pending:
+        node, operands_done = pending.pop()
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            stack.append(np.array([float(node.value)]))
+        elif isinstance(node, ast.Name) and node.id == variable:
+            stack.append(np.array([0.0, 1.0]))
+        elif isinstance(node, ast.BinOp) and type(node.op) in (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow):
+            if not operands_done:
+                pending.extend([(node, True), (node.right, False), (node.left, False)])
+                continue
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(_apply(node.op, left, right, expression))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in (ast.UAdd, ast.USub):
+            if not operands_done:
+                pending.extend([(node, True), (node.operand, False)])
+            elif isinstance(node.op, ast.USub):
+                stack.append(-stack.pop())
+        elif isinstance(node, ast.Name):
+            raise ExpressionError(f"Unknown name '{node.id}' in polynomial: {expression}")
+        else:
+            raise ExpressionError(f"Not a polynomial: {expression}")
+
+    result = P.polytrim(stack[0])
+    if not np.all(np.isfinite(result)):
+        raise ExpressionLimitError("Polynomial coefficients are too large")
+    return result
+
+
+def _apply(operator: ast.operator, left: "np.ndarray", right: "np.ndarray", expression: str) -> "np.ndarray":
+    """Combine the coefficients of two operands."""
+    if isinstance(operator, ast.Add):
+        return P.polyadd(left, right)
+    if isinstance(operator, ast.Sub):
+        return P.polysub(left, right)
+    if isinstance(operator, ast.Mult):
+        if (len(left) - 1) + (len(right) - 1) > MAX_DEGREE:
+            raise ExpressionLimitError(f"Polynomials can have degree at most {MAX_DEGREE}")
+        return P.polymul(left, right)
+    if isinstance(operator, ast.Div):
+        # Only division by a number keeps a polynomial
+        if len(P.polytrim(right)) > 1:
+            raise ExpressionError(f"Not a polynomial: {expression}")
+        if not right[0]:
+            raise ExpressionError("Division by zero")
+        return left / right[0]
+
+    # Powers need a whole, non-negative exponent
+    exponent = P.polytrim(right)
+    if len(exponent) > 1 or exponent[0] < 0 or not float(exponent[0]).is_integer():
+        raise ExpressionError(f"Not a polynomial: {expression}")
+    if (len(P.polytrim(left)) - 1) * exponent[0] > MAX_DEGREE:
+        raise ExpressionLimitError(f"Polynomials can have degree at most {MAX_DEGREE}")
+    return P.polypow(left, int(exponent[0]))
+
+
+def numeric_roots(coefficients: "np.ndarray", refine: bool = True) -> "np.ndarray":
+    """
+    Roots of a polynomial, from the eigenvalues of its companion matrix.
+
+    Eigenvalues closer than ``CLUSTER_TOLERANCE`` are taken for one multiple
+    root, at their mean; each distinct root is then polished with Newton's
+    method for its multiplicity m, x - m p(x) / p'(x).
+
+    Args:
+        coefficients (np.ndarray): Coefficients from the constant term up, the last one nonzero
+        refine (bool): Polish the roots with up to ``REFINE_STEPS`` Newton steps
+
+    Returns:
+        np.ndarray: The roots, repeated by multiplicity, real ones before complex
+        ones, each group sorted
+    """
+    roots, multiplicities = _clusters(P.polyroots(coefficients).astype(complex))
+    if refine and len(roots):
+        derivative = P.polyder(coefficients)
+        values = P.polyval(roots, coefficients)
+        with np.errstate(all="ignore"):
+            for _ in range(REFINE_STEPS):
+                candidates = roots - multiplicities * values / P.polyval(roots, derivative)
+                candidate_values = P.polyval(candidates, coefficients)
+                # A step is only kept where it brings the polynomial closer to zero
+                better = np.isfinite(candidates) & (abs(candidate_values) < abs(values))
+                if not better.any():
+                    break
+                roots = np.where(better, candidates, roots)
+                values = np.where(better, candidate_values, values)
+
+    roots = np.repeat(roots, multiplicities)
+    real = abs(roots.imag) <= REAL_TOLERANCE * np.maximum(1.0, abs(roots))
+    return np.concatenate([np.sort(roots[real].real).astype(complex),
+                           roots[~real][np.lexsort((roots[~real].imag, roots[~real].real))]])
+
+
+def _clusters(roots: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Distinct roots, each the mean of a cluster of eigenvalues, and the cluster sizes."""
+    centers, sizes = [], []
+    clusters: List[List[complex]] = []
+    for root in roots[np.argsort(roots.real, kind="stable")]:
+        for cluster in clusters:
+            if abs(root - cluster[0]) <= CLUSTER_TOLERANCE * max(1.0, abs(cluster[0])):
+                cluster.append(root)
+                break
+        else:
+            clusters.append([root])
+    for cluster in clusters:
+        centers.append(sum(cluster) / len(cluster))
+        sizes.append(len(cluster))
+    return np.array(centers, dtype=complex), np.array(sizes)
+
+
+def describe_roots(roots: "np.ndarray", variable: str = "x") -> str:
+    """Roots written out as ``x = 1 (multiplicity 2), x = -2 + 1i, ...``."""
+    values, counts = [], []
+    for root in roots:
+        if values and root == values[-1]:
+            counts[-1] += 1
+        else:
+            values.append(root)
+            counts.append(1)
+    return ", ".join(
+        f"{variable} = {format_number(root)}" + (f" (multiplicity {count})" if count > 1 else "")
+        for root, count in zip(values, counts)
+    )
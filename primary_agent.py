@@ -3,11 +3,46 @@ Primary Agent
 The main agent that interfaces with users and routes requests to specialized agents.
 """
 
-from typing import List, Dict, Any, Optional
+import importlib
+import os
+import time
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterable, Iterator, Tuple
 from base_agent import BaseAgent
-from math_agent import MathGeekAgent
-from english_agent import EnglishAgent
-from spanish_agent import SpanishAgent
+from router import CompiledRouter
+from query_analysis import QueryAnalysis
+from query_cache import LRUCache
+from history_store import HistoryStore, SessionHistoryStore, DEFAULT_SESSION
+from metrics import MetricsSink, InMemoryMetricsSink, AGENT_ERRORS, AGENT_PROCESS_SECONDS, QUERY_SECONDS
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor  # Imported on use: it pulls in logging
+
+
+# Specialized agents by name, in order of priority: (module, class) pairs,
+# imported and constructed only when the Primary Agent first needs them
+AGENT_REGISTRY: Dict[str, Tuple[str, str]] = {
+    "math": ("math_agent", "MathGeekAgent"),
+    "spanish": ("spanish_agent", "SpanishAgent"),  # Spanish before English to catch Spanish first
+    "english": ("english_agent", "EnglishAgent"),
+}
+
+
+def register_agent(name: str, module_name: str, class_name: str) -> None:
+    """
+    Register a specialized agent so Primary Agents can load it by name.
+    
+    Args:
+        name (str): Name used in ``PrimaryAgent(agent_names=[...])``
+        module_name (str): Module that defines the agent class
+        class_name (str): Agent class, constructed without arguments
+    """
+    AGENT_REGISTRY[name] = (module_name, class_name)
+
+
+def load_agent(name: str) -> BaseAgent:
+    """Import and construct a registered agent."""
+    module_name, class_name = AGENT_REGISTRY[name]
+    return getattr(importlib.import_module(module_name), class_name)()
 
 
 class PrimaryAgent:
@@ -16,73 +51,332 @@ class PrimaryAgent:
     Acts as the main interface between users and the agent system.
     """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, cache_ttl: Optional[float] = None,
+                 history_per_session: int = 200, history_total: int = 10000,
+                 history_total_bytes: int = 64 * 1024 * 1024, history: Optional[HistoryStore] = None, agent_names: Optional[List[str]] = None,
+                 metrics_sink: Optional[MetricsSink] = None):
+        """
+        Args:
+            cache_size (int): Maximum number of queries kept in the routing and
+                response cache; 0 disables the cache
+            cache_ttl (Optional[float]): Seconds after which a cached entry expires,
+                or None to keep entries until they are evicted
+            history_per_session (int): Maximum interactions kept per session
+            history_total (int): Maximum interactions kept across all sessions
+            history_total_bytes (int): Maximum size of the text of the interactions
+                kept across all sessions, as counted by ``history_store.entry_size``
+            history (Optional[HistoryStore]): History backend to use instead of the
+                in-memory store, e.g. a SQLiteHistoryStore or JSONLHistoryStore
+            agent_names (Optional[List[str]]): Registered agents to use, in order of
+                priority; defaults to every agent in AGENT_REGISTRY
+            metrics_sink (Optional[MetricsSink]): Where latency histograms and counters
+                go; defaults to an in-memory sink reported by ``get_status()``.
+                Pass a NullMetricsSink to turn metrics off
+        """
         self.name = "Primary Agent"
         self.description = "Main routing agent that directs queries to specialized agents"
         
-        # Initialize specialized agents
-        self.agents: List[BaseAgent] = [
-            MathGeekAgent(),
-            SpanishAgent(),  # Spanish before English to catch Spanish first
-            EnglishAgent(),
-        ]
+        # Specialized agents, constructed on first use
+        self.agent_names: List[str] = list(agent_names) if agent_names is not None else list(AGENT_REGISTRY)
+        self._agents: Optional[List[BaseAgent]] = None
+        
+        # Single-pass router compiled from the agents' routing patterns, built on first query
+        self.router: Optional[CompiledRouter] = None
         
-        # Track conversation history
-        self.conversation_history: List[Dict[str, Any]] = []
+        # Cache of routing decisions and deterministic responses, keyed by query
+        self.cache: Optional[LRUCache] = LRUCache(cache_size, cache_ttl) if cache_size > 0 else None
+        
+        # Track conversation history, partitioned by session
+        self.history: HistoryStore = history or SessionHistoryStore(
+            history_per_session, history_total, history_total_bytes)
+        
+        # Latency histograms and counters for routing and processing
+        self.metrics: MetricsSink = metrics_sink if metrics_sink is not None else InMemoryMetricsSink()
+    
+    @property
+    def agents(self) -> List[BaseAgent]:
+        """The specialized agents in order of priority, loaded on first access."""
+        if self._agents is None:
+            self._agents = [load_agent(name) for name in self.agent_names]
+        return self._agents
+    
+    @agents.setter
+    def agents(self, agents: List[BaseAgent]) -> None:
+        self._agents = agents
     
-    def process_query(self, query: str) -> Dict[str, Any]:
+    def process_query(self, query: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
         Process a user query by routing it to the appropriate specialized agent.
         
         Args:
             query (str): The user's input query
+            session_id (str): The session whose history records the interaction
             
         Returns:
             Dict[str, Any]: Response from the appropriate agent or error message
         """
         if not query or not query.strip():
-            return {
-                "agent": self.name,
-                "success": False,
-                "error": "Empty query provided",
-                "query": query
-            }
+            return self._generate_empty_query_response(query)
         
-        # Find the appropriate agent
-        suitable_agent = self._find_suitable_agent(query)
+        started = time.perf_counter()
+        self._sync_agents()
         
-        if suitable_agent:
-            # Process with the found agent
-            response = suitable_agent.process(query)
-        else:
-            # No suitable agent found, provide default response
-            response = self._generate_default_response(query)
+        suitable_agent, analysis, response = self._route_query(query)
+        if response is None:
+            response = self._respond(query, suitable_agent, analysis)
         
         # Add to conversation history
-        self.conversation_history.append({
-            "query": query,
-            "response": response,
-            "timestamp": self._get_timestamp()
-        })
+        self._record_interaction(query, response, session_id)
         
+        self.metrics.observe(QUERY_SECONDS, time.perf_counter() - started)
         return response
     
-    def _find_suitable_agent(self, query: str) -> Optional[BaseAgent]:
+    async def process_query_async(self, query: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
-        Find the most suitable agent for the given query.
+        Async counterpart of ``process_query`` for event-loop servers.
+        
+        Routing runs inline; processing goes through the agent's async
+        interface, which moves blocking agents to an executor.
         
         Args:
             query (str): The user's input query
+            session_id (str): The session whose history records the interaction
             
         Returns:
-            Optional[BaseAgent]: The most suitable agent or None if no agent can handle it
+            Dict[str, Any]: Response from the appropriate agent or error message
+        """
+        if not query or not query.strip():
+            return self._generate_empty_query_response(query)
+        
+        started = time.perf_counter()
+        self._sync_agents()
+        
+        suitable_agent, analysis, response = self._route_query(query)
+        if response is None:
+            if suitable_agent:
+                process_started = time.perf_counter()
+                response = await suitable_agent.process_analysis_async(analysis)
+                self._record_process_metrics(suitable_agent, response, time.perf_counter() - process_started)
+            else:
+                response = self._generate_default_response(query)
+            self._cache_response(query, suitable_agent, response)
+        
+        # Add to conversation history
+        self._record_interaction(query, response, session_id)
+        
+        self.metrics.observe(QUERY_SECONDS, time.perf_counter() - started)
+        return response
+    
+    def process_queries(self, queries: Iterable[str], batch_size: int = 256,
+                        parallel: bool = False, max_workers: Optional[int] = None,
+                        record_history: bool = False,
+                        session_id: str = DEFAULT_SESSION) -> Iterator[Dict[str, Any]]:
+        """
+        Process many queries, yielding the responses in the order of the input.
+        
+        Queries are consumed lazily in batches of ``batch_size``. Within a batch,
+        identical queries are processed once, which is where most of the saving
+        over ``process_query`` comes from. The languages routing needs are
+        detected in one ``detect_batch`` call, and queries routed to the same
+        agent are answered one after another, agent by agent.
+        
+        Args:
+            queries (Iterable[str]): The user queries, e.g. lines of a query log
+            batch_size (int): Number of queries read from the iterable at a time
+            parallel (bool): Spread each batch over a pool of worker processes
+            max_workers (Optional[int]): Number of worker processes in parallel mode
+            record_history (bool): Add the interactions to the conversation history
+            session_id (str): The session whose history records the interactions
+            
+        Yields:
+            Dict[str, Any]: Response for each query, in input order
+        """
+        executor = None
+        worker_count = 1
+        if parallel:
+            worker_count = max_workers or os.cpu_count() or 1
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(worker_count, initializer=_init_batch_worker, initargs=(self.agents,))
+        
+        try:
+            batch = []
+            for query in queries:
+                batch.append(query)
+                if len(batch) >= batch_size:
+                    yield from self._process_batch(batch, executor, worker_count, record_history, session_id)
+                    batch = []
+            if batch:
+                yield from self._process_batch(batch, executor, worker_count, record_history, session_id)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    
+    def _process_batch(self, batch: List[str], executor: Optional["Executor"],
+                       worker_count: int, record_history: bool, session_id: str) -> List[Dict[str, Any]]:
+        """Process one batch of queries, deduplicated, and return responses in batch order."""
+        unique_queries = list(dict.fromkeys(batch))
+        
+        if executor is None:
+            responses = self._process_unique_queries(unique_queries)
+        else:
+            # Split the batch evenly over the workers
+            chunks = [unique_queries[i::worker_count] for i in range(worker_count)]
+            responses = {}
+            for chunk_responses in executor.map(_process_in_batch_worker, [chunk for chunk in chunks if chunk]):
+                responses.update(chunk_responses)
+        
+        results = []
+        for query in batch:
+            # Duplicates get their own copy of the shared response
+            response = dict(responses[query])
+            if record_history and query and query.strip():
+                self._record_interaction(query, response, session_id)
+            results.append(response)
+        return results
+    
+    def _process_unique_queries(self, queries: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Route distinct queries, then process them in order of the agent they were routed to.
+        
+        Queries whose routing needs their language have it detected in one
+        ``detect_batch`` call before any of them is routed. That costs about
+        the same as detecting them one by one when their words are new, and
+        less once the detector has cached them.
+        """
+        self._sync_agents()
+        
+        responses: Dict[str, Dict[str, Any]] = {}
+        groups: Dict[int, List[Tuple[str, Optional[BaseAgent], QueryAnalysis]]] = {}
+        
+        analyses = {query: QueryAnalysis(query) for query in queries if query and query.strip()}
+        undecided = [analysis for analysis in analyses.values() if self.router.reaches_language_tier(analysis)]
+        if undecided:
+            # Imported here like in QueryAnalysis, so the model is only loaded when needed
+            from language_id import get_language_identifier
+            detected = get_language_identifier().detect_batch([analysis.query for analysis in undecided])
+            for analysis, probabilities in zip(undecided, detected):
+                analysis.language_probabilities = probabilities
+        
+        for query in queries:
+            if query not in analyses:
+                responses[query] = self._generate_empty_query_response(query)
+                continue
+            
+            suitable_agent, analysis, response = self._route_query(query, analyses[query])
+            if response is not None:
+                responses[query] = response
+            else:
+                groups.setdefault(id(suitable_agent), []).append((query, suitable_agent, analysis))
+        
+        for group in groups.values():
+            for query, suitable_agent, analysis in group:
+                responses[query] = self._respond(query, suitable_agent, analysis)
+        
+        return responses
+    
+    def _route_query(self, query: str, analysis: Optional[QueryAnalysis] = None
+                     ) -> Tuple[Optional[BaseAgent], Optional[QueryAnalysis], Optional[Dict[str, Any]]]:
+        """
+        Route a query, going through the cache when it is enabled.
+        
+        Args:
+            query (str): The user's input query
+            analysis (Optional[QueryAnalysis]): The query's analysis, if already made
+            
+        Returns:
+            Tuple: The routed agent (None for the default response), the query
+            analysis, and the cached response if the whole response was cached
         """
-        # Check each agent in order of priority
+        cached = self.cache.get(query) if self.cache is not None else None
+        if cached is not None:
+            suitable_agent, cached_response = cached
+            if cached_response is not None:
+                # Deterministic agent: reuse the whole response
+                return suitable_agent, None, dict(cached_response)
+            
+            # Reuse the routing decision only
+            return suitable_agent, analysis or QueryAnalysis(query), None
+        
+        # Analyze the query once and share the features with every agent
+        if analysis is None:
+            analysis = QueryAnalysis(query)
+        
+        # Find the appropriate agent
+        suitable_agent = self._find_suitable_agent(analysis)
+        if self.cache is not None:
+            self.cache.put(query, (suitable_agent, None))
+        return suitable_agent, analysis, None
+    
+    def _respond(self, query: str, agent: Optional[BaseAgent], analysis: QueryAnalysis) -> Dict[str, Any]:
+        """Process a routed query and cache the response if the agent is deterministic."""
+        response = self._process_with_agent(agent, analysis)
+        self._cache_response(query, agent, response)
+        return response
+    
+    def _cache_response(self, query: str, agent: Optional[BaseAgent], response: Dict[str, Any]) -> None:
+        """Cache the full response if the agent that produced it is deterministic."""
+        if self.cache is not None and agent is not None and agent.deterministic and response.get("success"):
+            self.cache.put(query, (agent, dict(response)))
+    
+    def _record_interaction(self, query: str, response: Dict[str, Any], session_id: str) -> None:
+        """Add an interaction to the session's conversation history."""
+        self.history.append(session_id, query, response, self._get_timestamp())
+    
+    def _generate_empty_query_response(self, query: str) -> Dict[str, Any]:
+        """Generate the error response for an empty query."""
+        return {
+            "agent": self.name,
+            "success": False,
+            "error": "Empty query provided",
+            "query": query
+        }
+    
+    def _process_with_agent(self, agent: Optional[BaseAgent], analysis: QueryAnalysis) -> Dict[str, Any]:
+        """Process the query with the routed agent, or give the default response if there is none."""
+        if agent:
+            # Process with the found agent
+            started = time.perf_counter()
+            response = agent.process_analysis(analysis)
+            self._record_process_metrics(agent, response, time.perf_counter() - started)
+            return response
+        
+        # No suitable agent found, provide default response
+        return self._generate_default_response(analysis.query)
+    
+    def _record_process_metrics(self, agent: BaseAgent, response: Dict[str, Any], seconds: float) -> None:
+        """Record how long an agent took to process a query, and count its errors."""
+        self.metrics.observe(AGENT_PROCESS_SECONDS, seconds, {"agent": agent.name})
+        if not response.get("success"):
+            self.metrics.increment(AGENT_ERRORS, {
+                "agent": agent.name,
+                "error_type": response.get("error_type", "error"),
+            })
+    
+    def _sync_agents(self) -> None:
+        """Recompile the router and drop cached decisions if the agent list has changed."""
+        if self.router is not None and tuple(self.agents) == self.router.agents:
+            return
+        
+        if self.router is not None and self.cache is not None:
+            self.cache.clear()
+        
+        # Attach the timing hooks of every agent to this Primary Agent's sink
         for agent in self.agents:
-            if agent.can_handle(query):
-                return agent
+            agent.metrics = self.metrics
+        self.router = CompiledRouter(self.agents, self.metrics)
+    
+    def _find_suitable_agent(self, analysis: QueryAnalysis) -> Optional[BaseAgent]:
+        """
+        Find the most suitable agent for the given query.
         
-        return None
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+            
+        Returns:
+            Optional[BaseAgent]: The most suitable agent or None if no agent can handle it
+        """
+        # The router keeps the agents' order of priority
+        return self.router.find_agent(analysis)
     
     def _generate_default_response(self, query: str) -> Dict[str, Any]:
         """
@@ -112,21 +406,43 @@ class PrimaryAgent:
         """Get information about all available agents."""
         return [agent.get_info() for agent in self.agents]
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get the conversation history."""
-        return self.conversation_history.copy()
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION, after: Optional[int] = None,
+                                 limit: Optional[int] = None, since: Optional[str] = None,
+                                 until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get a session's conversation history, oldest first.
+        
+        Args:
+            session_id (str): The session to read
+            after (Optional[int]): Only return interactions with an id greater than this cursor
+            limit (Optional[int]): Maximum number of interactions to return
+            since (Optional[str]): Only return interactions at or after this timestamp
+            until (Optional[str]): Only return interactions at or before this timestamp
+            
+        Returns:
+            List[Dict[str, Any]]: The interactions (id, query, response, timestamp)
+        """
+        page, _ = self.history.get(session_id, after, limit, since, until)
+        return page
     
-    def clear_history(self) -> None:
-        """Clear the conversation history."""
-        self.conversation_history.clear()
+    def clear_history(self, session_id: Optional[str] = None) -> None:
+        """Clear the conversation history of one session, or of every session."""
+        self.history.clear(session_id)
     
     def _get_timestamp(self) -> str:
         """Get current timestamp for logging."""
         from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def get_status(self) -> Dict[str, Any]:
-        """Get the current status of the primary agent and all specialized agents."""
+    def get_status(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the current status of the primary agent and all specialized agents.
+        
+        Args:
+            session_id (Optional[str]): Report conversation counts for this session
+                only, or across all sessions if None
+        """
+        self._sync_agents()
         return {
             "primary_agent": {
                 "name": self.name,
@@ -141,6 +457,26 @@ class PrimaryAgent:
                 }
                 for agent in self.agents
             ],
-            "conversation_count": len(self.conversation_history),
-            "last_interaction": self.conversation_history[-1]["timestamp"] if self.conversation_history else "None"
+            "cache": self.cache.get_stats() if self.cache is not None else {"enabled": False},
+            "routing": self.router.get_stats(),
+            "metrics": self.metrics.snapshot(),
+            "history": self.history.get_stats(),
+            "conversation_count": self.history.count(session_id),
+            "last_interaction": self.history.last_timestamp(session_id) or "None"
         }
+
+
+# Primary Agent owned by each worker process of the parallel batch mode
+_batch_worker_agent: Optional[PrimaryAgent] = None
+
+
+def _init_batch_worker(agents: List[BaseAgent]) -> None:
+    """Build the worker's Primary Agent with the same specialized agents as the parent."""
+    global _batch_worker_agent
+    _batch_worker_agent = PrimaryAgent(cache_size=0)
+    _batch_worker_agent.agents = agents
+
+
+def _process_in_batch_worker(queries: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Process a chunk of distinct queries in a worker process."""
+    return _batch_worker_agent._process_unique_queries(queries)
@@ -0,0 +1,178 @@
+"""
+Prometheus Exporter
+Renders the framework's metrics in the Prometheus text exposition format:
+the histograms and counters of an in-memory metrics sink, plus gauges and
+counters gathered at scrape time (cache, worker pool, process memory).
+"""
+
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Not available on Windows
+    RESOURCE_AVAILABLE = False
+
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Prefix of the framework's metric names
+NAMESPACE = "agentic"
+
+# A metric family gathered at scrape time: name, type, help text and samples
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# Help text of the metrics recorded by the framework and the web UI
+METRIC_HELP = {
+    "agent_can_handle_seconds": "Time an agent spent deciding whether to handle a query",
+    "agent_process_seconds": "Time an agent spent processing a query",
+    "stage_seconds": "Time spent in a routing tier or an agent processing stage",
+    "query_seconds": "End-to-end time to answer a query",
+    "routing_decisions_total": "Queries routed, by agent and deciding tier",
+    "agent_errors_total": "Unsuccessful agent responses, by error type",
+    "http_requests_total": "HTTP requests, by route, method and status",
+    "http_request_seconds": "HTTP request latency, by route",
+    "socketio_events_total": "Socket.IO events received, by event",
+}
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    """Format labels as ``{name="value",...}``, or nothing if there are none."""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in labels.items()]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value."""
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _header(lines: List[str], name: str, metric_type: str, help_text: str) -> None:
+    """Append the HELP and TYPE lines of a metric family."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def render(snapshot: Dict[str, Any], families: Iterable[MetricFamily] = (), namespace: str = NAMESPACE) -> str:
+    """
+    Render metrics in the Prometheus text format.
+
+    Args:
+        snapshot (Dict[str, Any]): Snapshot of an InMemoryMetricsSink
+        families (Iterable[MetricFamily]): Additional metric families, named
+            without the namespace
+        namespace (str): Prefix added to every metric name
+
+    Returns:
+        str: The exposition text
+    """
+    lines: List[str] = []
+
+    for name, series in sorted(snapshot.get("histograms", {}).items()):
+        full_name = f"{namespace}_{name}"
+        _header(lines, full_name, "histogram", METRIC_HELP.get(name, name))
+        for entry in series:
+            labels = entry["labels"]
+            for bound, count in entry["buckets"].items():
+                lines.append(f"{full_name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(entry['sum'])}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {entry['count']}")
+
+    for name, series in sorted(snapshot.get("counters", {}).items()):
+        full_name = f"{namespace}_{name}"
+        _header(lines, full_name, "counter", METRIC_HELP.get(name, name))
+        for entry in series:
+            lines.append(f"{full_name}{_format_labels(entry['labels'])} {entry['value']}")
+
+    for name, metric_type, help_text, samples in families:
+        full_name = name if name.startswith("process_") else f"{namespace}_{name}"
+        _header(lines, full_name, metric_type, help_text)
+        for labels, value in samples:
+            lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def cache_metrics(stats: Dict[str, Any]) -> List[MetricFamily]:
+    """Metric families for the query cache, from ``LRUCache.get_stats()``."""
+    if not stats.get("enabled"):
+        return []
+    return [
+        ("cache_hits_total", "counter", "Query cache hits", [({}, stats["hits"])]),
+        ("cache_misses_total", "counter", "Query cache misses", [({}, stats["misses"])]),
+        ("cache_evictions_total", "counter", "Query cache entries evicted to respect the size limit",
+         [({}, stats["evictions"])]),
+        ("cache_hit_ratio", "gauge", "Share of query cache lookups that hit", [({}, stats["hit_ratio"])]),
+        ("cache_entries", "gauge", "Entries in the query cache", [({}, stats["size"])]),
+    ]
+
+
+def symbolic_cache_metrics(stats: Dict[str, Any]) -> List[MetricFamily]:
+    """Metric families for the symbolic result cache, from ``SymbolicCache.get_stats()``."""
+    families: List[MetricFamily] = [
+        ("symbolic_cache_hits_total", "counter", "Symbolic cache hits, by tier",
+         [({"tier": "memory"}, stats["memory_hits"]), ({"tier": "disk"}, stats["disk_hits"])]),
+        ("symbolic_cache_misses_total", "counter", "Symbolic cache misses", [({}, stats["misses"])]),
+        ("symbolic_cache_hit_ratio", "gauge", "Share of symbolic cache lookups that hit", [({}, stats["hit_ratio"])]),
+    ]
+    entries = [({"tier": "memory"}, stats["memory_size"])]
+    if "disk_size" in stats:
+        entries.append(({"tier": "disk"}, stats["disk_size"]))
+    families.append(("symbolic_cache_entries", "gauge", "Results in the symbolic cache, by tier", entries))
+    return families
+
+
+def worker_pool_metrics(stats: Dict[str, Any], pool: str) -> List[MetricFamily]:
+    """Metric families for a worker pool, from ``WorkerPool.get_stats()``."""
+    labels = {"pool": pool}
+    return [
+        ("worker_pool_size", "gauge", "Worker processes in the pool", [(labels, stats["size"] if stats["started"] else 0)]),
+        ("worker_pool_calls_total", "counter", "Calls run in the pool", [(labels, stats["calls"])]),
+        ("worker_pool_timeouts_total", "counter", "Calls killed at their deadline", [(labels, stats["timeouts"])]),
+        ("worker_pool_crashes_total", "counter", "Worker processes that died during a call", [(labels, stats["crashes"])]),
+    ]
+
+
+def process_metrics() -> List[MetricFamily]:
+    """Memory, CPU and thread use of the current process, under the standard ``process_`` names."""
+    families: List[MetricFamily] = [
+        ("process_threads", "gauge", "Python threads in the process", [({}, threading.active_count())]),
+    ]
+
+    # Current memory from /proc (Linux)
+    try:
+        with open("/proc/self/statm") as statm:
+            virtual_pages, resident_pages = statm.read().split()[:2]
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        families.append(("process_resident_memory_bytes", "gauge", "Resident memory size in bytes",
+                         [({}, int(resident_pages) * page_size)]))
+        families.append(("process_virtual_memory_bytes", "gauge", "Virtual memory size in bytes",
+                         [({}, int(virtual_pages) * page_size)]))
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    if RESOURCE_AVAILABLE:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        families.append(("process_max_resident_memory_bytes", "gauge", "Peak resident memory size in bytes",
+                         [({}, peak)]))
+        families.append(("process_cpu_seconds_total", "counter", "User and system CPU time in seconds",
+                         [({}, usage.ru_utime + usage.ru_stime)]))
+
+    return families
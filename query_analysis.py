@@ -0,0 +1,105 @@
+"""
+Query Analysis
+Per-query features computed once by the Primary Agent and shared with every agent.
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from math_tokens import MathTokens
+    from phrase_matcher import Occurrence, PhraseMatcher
+
+
+# Integer or decimal numbers, as the math handlers extract them
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+# Arithmetic operator characters
+OPERATOR_CHARS = frozenset('+-*/^%')
+
+
+class QueryAnalysis:
+    """
+    Features of a single query: normalized text, tokens, numbers, character
+    classes and detected language.
+
+    Language detection is the expensive part, so it runs lazily on first
+    access and at most once per query, unless languages detected elsewhere,
+    e.g. in bulk for a batch, are set first.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.lower = query.lower()
+        self.normalized = self.lower.strip()
+        self.tokens: List[str] = self.lower.split()
+
+        # Numeric spans as (start, end, text)
+        self.number_spans: List[Tuple[int, int, str]] = [
+            (match.start(), match.end(), match.group()) for match in NUMBER_PATTERN.finditer(query)
+        ]
+
+        # Character class flags
+        self.is_ascii = query.isascii()
+        self.has_digits = bool(self.number_spans)
+        self.has_letters = any(char.isalpha() for char in query)
+        self.has_operators = any(char in OPERATOR_CHARS for char in query)
+        self.has_question_mark = '?' in query
+
+        self._language_probabilities: Optional[Dict[str, float]] = None
+        self._math_tokens: Optional["MathTokens"] = None
+        self._phrases: Dict["PhraseMatcher", List["Occurrence"]] = {}
+
+        # Routing tier that decided the query, set by the router
+        self.routing_tier: Optional[str] = None
+
+    @property
+    def numbers(self) -> List[str]:
+        """Numbers found in the query, in order of appearance."""
+        return [text for _, _, text in self.number_spans]
+
+    @property
+    def math_tokens(self) -> "MathTokens":
+        """
+        The query's math tokens, found on first access.
+
+        The Math Geek Agent routes, dispatches and evaluates from the same tokens.
+        """
+        if self._math_tokens is None:
+            from math_tokens import MathTokens
+            self._math_tokens = MathTokens(self.query, self.lower)
+        return self._math_tokens
+
+    def find_phrases(self, matcher: "PhraseMatcher") -> List["Occurrence"]:
+        """
+        Occurrences of a matcher's phrases in the normalized query.
+
+        The scan runs once per matcher, so an agent's routing checks and its
+        response generation share it.
+        """
+        occurrences = self._phrases.get(matcher)
+        if occurrences is None:
+            occurrences = self._phrases[matcher] = matcher.find_all(self.normalized)
+        return occurrences
+
+    @property
+    def language_probabilities(self) -> Dict[str, float]:
+        """Detected languages and their probabilities, empty if its language cannot be told."""
+        if self._language_probabilities is None:
+            # Imported on the first detection, which also trains the shared model
+            from language_id import get_language_identifier
+            self._language_probabilities = get_language_identifier().detect_probabilities(self.query)
+        return self._language_probabilities
+
+    @language_probabilities.setter
+    def language_probabilities(self, probabilities: Dict[str, float]) -> None:
+        """Use languages detected elsewhere, e.g. in bulk for a batch of queries."""
+        self._language_probabilities = probabilities
+
+    @property
+    def language(self) -> Optional[str]:
+        """The most probable language code, or None if it could not be detected."""
+        probabilities = self.language_probabilities
+        if not probabilities:
+            return None
+        return max(probabilities, key=probabilities.get)
@@ -0,0 +1,191 @@
+"""
+Compiled Router
+Combines the routing patterns of every agent into one scanner so a query is
+matched against all agents at once instead of agent by agent, and routes
+queries through tiers of increasingly expensive checks.
+"""
+
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple
+from base_agent import BaseAgent, ROUTING_TIERS
+from metrics import MetricsSink, NULL_SINK, AGENT_CAN_HANDLE_SECONDS, ROUTING_DECISIONS, STAGE_SECONDS
+from query_analysis import QueryAnalysis
+
+
+class CompiledRouter:
+    """
+    Routes queries using a single compiled scanner built from all agents' patterns.
+
+    Each agent's patterns become one optional lookahead with a named group, so a
+    single ``match`` call reports every agent whose patterns occur in the query.
+    One scanner runs over the raw query and one over its lowercased form.
+
+    Agents are asked tier by tier (see ``ROUTING_TIERS``): character-class
+    checks first, then the pattern scan and lexicon hits, and language
+    detection only for queries still undecided. The router counts the deepest
+    tier each query needed, and reports how long each agent and each tier
+    took to ``metrics``.
+    """
+
+    def __init__(self, agents: List[BaseAgent], metrics: MetricsSink = NULL_SINK):
+        self.agents: Tuple[BaseAgent, ...] = tuple(agents)
+        self.metrics = metrics
+        self._raw_scanner = self._compile_scanner("raw")
+        self._lower_scanner = self._compile_scanner("lower")
+        # Agents with routing patterns; the others never need the scan
+        self._scanned_agents = frozenset(
+            index for index, agent in enumerate(self.agents) if any(agent.get_routing_patterns().values())
+        )
+
+        # Number of queries decided at each tier
+        self.tier_counts: Dict[str, int] = {tier: 0 for tier in ROUTING_TIERS}
+        self._lock = threading.Lock()
+
+    def _compile_scanner(self, view: str) -> Optional[Pattern]:
+        """Compile the patterns of all agents for one view of the query."""
+        parts = []
+        for index, agent in enumerate(self.agents):
+            patterns = agent.get_routing_patterns().get(view, [])
+            if patterns:
+                alternation = "|".join(f"(?:{pattern})" for pattern in patterns)
+                parts.append(f"(?:(?=(?P<agent{index}>[\\s\\S]*?(?:{alternation}))))?")
+
+        if not parts:
+            return None
+        return re.compile("".join(parts))
+
+    def scan(self, analysis: QueryAnalysis) -> Set[int]:
+        """
+        Scan the query once and report which agents' patterns matched.
+
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+
+        Returns:
+            Set[int]: Indexes (into ``agents``) of the agents whose patterns matched
+        """
+        matched = set()
+        for scanner, text in ((self._raw_scanner, analysis.query), (self._lower_scanner, analysis.lower)):
+            if scanner is None:
+                continue
+            for name, value in scanner.match(text).groupdict().items():
+                if value is not None:
+                    matched.add(int(name[len("agent"):]))
+        return matched
+
+    def find_agent(self, analysis: QueryAnalysis) -> Optional[BaseAgent]:
+        """
+        Find the first agent, in priority order, that claims the query.
+
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+
+        Returns:
+            Optional[BaseAgent]: The most suitable agent or None if no agent can handle it
+        """
+        return self.route(analysis)[0]
+
+    def route(self, analysis: QueryAnalysis) -> Tuple[Optional[BaseAgent], str]:
+        """
+        Find the first agent, in priority order, that claims the query, asking
+        each agent only as many tiers as it needs to decide.
+
+        The decision is final once an agent claims the query and every agent
+        before it has declined, so the query is decided at the deepest tier any
+        of those agents needed. That tier is stored in ``analysis.routing_tier``.
+        The patterns are scanned when the first agent that has some gets past
+        the character-class tier, so a query claimed by an agent without
+        patterns is never scanned.
+
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+
+        Returns:
+            Tuple[Optional[BaseAgent], str]: The most suitable agent (None if no
+            agent can handle it) and the tier that decided
+        """
+        suitable_agent, deepest, tier_seconds, agent_seconds = self._decide(analysis, len(ROUTING_TIERS) - 1)
+        for name, seconds in agent_seconds:
+            self.metrics.observe(AGENT_CAN_HANDLE_SECONDS, seconds, {"agent": name})
+
+        tier = ROUTING_TIERS[deepest]
+        analysis.routing_tier = tier
+        with self._lock:
+            self.tier_counts[tier] += 1
+
+        for level in range(deepest + 1):
+            self.metrics.observe(STAGE_SECONDS, tier_seconds[level], {"stage": ROUTING_TIERS[level]})
+        self.metrics.increment(ROUTING_DECISIONS, {
+            "agent": suitable_agent.name if suitable_agent else "none",
+            "tier": tier,
+        })
+        return suitable_agent, tier
+
+    def reaches_language_tier(self, analysis: QueryAnalysis) -> bool:
+        """
+        Whether routing the query would get as far as language detection.
+
+        The agents are asked the tiers below it, as ``route`` asks them, without
+        recording anything, so a batch can detect the languages of just these
+        queries in bulk before routing them.
+
+        Args:
+            analysis (QueryAnalysis): Features of the user's input query
+
+        Returns:
+            bool: True if no agent is decided without the query's language
+        """
+        return self._decide(analysis, len(ROUTING_TIERS) - 2)[1] is None
+
+    def _decide(self, analysis: QueryAnalysis, last_level: int
+                ) -> Tuple[Optional[BaseAgent], Optional[int], List[float], List[Tuple[str, float]]]:
+        """
+        Ask the agents in priority order, each up to the tier at ``last_level``.
+
+        Returns:
+            Tuple: The claiming agent (None if every agent declined), the deepest
+            tier level asked (None if an agent was still undecided at
+            ``last_level`` below the last tier), the seconds spent at each tier
+            and each agent's seconds
+        """
+        matched: Optional[Set[int]] = None
+        deepest = 0
+        tier_seconds = [0.0] * len(ROUTING_TIERS)
+        agent_seconds: List[Tuple[str, float]] = []
+
+        for index, agent in enumerate(self.agents):
+            decision = None
+            seconds = 0.0
+            for level, tier in enumerate(ROUTING_TIERS[:last_level + 1]):
+                started = time.perf_counter()
+                if index not in self._scanned_agents:
+                    pattern_matched = False
+                else:
+                    if level > 0 and matched is None:
+                        matched = self.scan(analysis)
+                    pattern_matched = None if matched is None else index in matched
+                deepest = max(deepest, level)
+                decision = agent.route_tier(analysis, tier, pattern_matched)
+                elapsed = time.perf_counter() - started
+                tier_seconds[level] += elapsed
+                seconds += elapsed
+                if decision is not None:
+                    break
+            agent_seconds.append((agent.name, seconds))
+            if decision is None and last_level < len(ROUTING_TIERS) - 1:
+                return None, None, tier_seconds, agent_seconds
+            if decision:
+                return agent, deepest, tier_seconds, agent_seconds
+        return None, deepest, tier_seconds, agent_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number of queries decided at each tier."""
+        with self._lock:
+            total = sum(self.tier_counts.values())
+            return {
+                "routed_queries": total,
+                "tiers": dict(self.tier_counts),
+                "language_detection_ratio": self.tier_counts[ROUTING_TIERS[-1]] / total if total else 0.0,
+            }
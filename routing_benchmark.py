@@ -0,0 +1,334 @@
+"""
+Routing Benchmark
+Runs the Primary Agent over large, fixed, mixed corpora (math, English,
+Spanish, gibberish and long inputs) and measures throughput, per-agent
+latency and memory allocated per query. Results are saved as JSON and compared
+with a committed baseline; a regression beyond the thresholds, or a change in
+where queries are routed, fails the run.
+
+Usage:
+  python routing_benchmark.py                      # Compare with the baseline
+  python routing_benchmark.py --output run.json    # Also save the results
+  python routing_benchmark.py --save-baseline      # Accept the results as the new baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional, Tuple
+
+from primary_agent import PrimaryAgent
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "routing_baseline.json")
+
+# Fail when a run is worse than the baseline by more than these fractions
+DEFAULT_THRESHOLDS = {
+    "throughput": 0.25,   # Queries per second may drop by up to 25%
+    "latency": 0.50,      # Per-agent p50/p99 may grow by up to 50%
+    "allocations": 0.25,  # Bytes allocated per query may grow by up to 25%
+}
+
+# Agents with fewer timed queries than this are too noisy to compare
+MIN_SAMPLES = 50
+
+CATEGORIES = ("math", "english", "spanish", "gibberish", "long")
+
+
+def build_corpus(per_category: int = 1000, seed: int = 2025) -> Dict[str, List[str]]:
+    """
+    Generate the benchmark corpora; the same arguments always give the same queries.
+
+    Explicitly symbolic math (solve, derivative, integral) is left out: it runs
+    in the sympy worker pool and would mostly measure sympy.
+
+    Args:
+        per_category (int): Number of queries per category
+        seed (int): Random seed
+
+    Returns:
+        Dict[str, List[str]]: Queries by category
+    """
+    rng = random.Random(seed)
+
+    def number(low: int = 1, high: int = 999) -> int:
+        return rng.randint(low, high)
+
+    math_templates = [
+        lambda: f"{number()} {rng.choice('+-*/')} {number()}",
+        lambda: f"Calculate {number()} {rng.choice('+-*/')} {number()}",
+        lambda: f"What is {number()} {rng.choice('+-*/')} {number()} {rng.choice('+-*/')} {number()}?",
+        lambda: f"What is {number(1, 20)} factorial?",
+        lambda: f"{number(1, 20)}!",
+        lambda: f"What is the square root of {number()}?",
+        lambda: f"sqrt({number()})",
+        lambda: f"{rng.choice(['sin', 'cos', 'tan'])}({number(0, 360)})",
+        lambda: f"{number(1, 12)}^{number(1, 8)}",
+        lambda: f"What is {number(1, 12)} to the power of {number(1, 8)}?",
+        lambda: f"({number()} + {number()}) * {number(1, 9)}",
+    ]
+    english_templates = [
+        "Hello, how are you today?", "What is artificial intelligence?", "Thank you for your help!",
+        "Can you recommend a good book?", "Where is the nearest train station?", "Tell me about the weather",
+        "How do I learn a new language?", "Good morning, I need some help please",
+        "Why is the sky blue?", "Could you explain how computers work?", "I would like to book a table",
+        "What time does the museum open?", "Is it going to rain tomorrow?", "Please help me write a letter",
+        "Who wrote this story?", "The meeting was moved to Friday", "See you later",
+    ]
+    spanish_templates = [
+        "Hola, ¿cómo estás?", "¿Qué es la inteligencia artificial?", "Gracias por tu ayuda",
+        "¿Puedes recomendarme un libro?", "¿Dónde está la estación de tren?", "Buenos días, necesito ayuda",
+        "necesito ayuda por favor", "¿Por qué el cielo es azul?", "Me gustaría reservar una mesa",
+        "¿A qué hora abre el museo?", "hola amigo, que tal", "La reunión se movió al viernes",
+        "Hasta luego", "¿Cómo puedo aprender un idioma nuevo?", "muchas gracias por todo",
+    ]
+    long_sentences = english_templates + spanish_templates + [
+        "The quarterly report covers revenue, costs and the outlook for next year in some detail.",
+        "Calculate the total of 125 + 375 and explain the steps.",
+    ]
+
+    def gibberish() -> str:
+        kind = rng.randrange(4)
+        if kind == 0:
+            return "".join(rng.choice("qwrtzpsdfghjklxcvbnm") for _ in range(rng.randint(4, 14)))
+        if kind == 1:
+            return " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 7)))
+                            for _ in range(rng.randint(2, 5)))
+        if kind == 2:
+            return "".join(rng.choice("!@#$&*()[]{}<>~;:,.") for _ in range(rng.randint(3, 12)))
+        return "".join(rng.choice("abcxyz0123456789") for _ in range(rng.randint(5, 12)))
+
+    def long_input() -> str:
+        return " ".join(rng.choice(long_sentences) for _ in range(rng.randint(10, 40)))
+
+    def pick(templates: List[str]) -> str:
+        # Vary repeated templates a little so the corpus is not just a few strings
+        text = rng.choice(templates)
+        return text if rng.random() < 0.5 else f"{text} {rng.choice(['', 'Thanks', 'Gracias', 'ok', '!'])}".strip()
+
+    generators = {
+        "math": lambda: rng.choice(math_templates)(),
+        "english": lambda: pick(english_templates),
+        "spanish": lambda: pick(spanish_templates),
+        "gibberish": gibberish,
+        "long": long_input,
+    }
+    return {category: [generators[category]() for _ in range(per_category)] for category in CATEGORIES}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def _new_agent() -> PrimaryAgent:
+    """A Primary Agent that measures routing and processing only: no cache, minimal history."""
+    agent = PrimaryAgent(cache_size=0, history_per_session=1, history_total=1)
+    # Load the agents and train the language identifier outside the timed runs
+    agent.process_query("hello, warm up")
+    agent.process_query("hola, ¿qué tal?")
+    return agent
+
+
+def run_benchmark(corpus: Dict[str, List[str]], rounds: int = 3) -> Dict[str, Any]:
+    """
+    Time every query of the corpus, then measure allocations in a separate pass.
+
+    Args:
+        corpus (Dict[str, List[str]]): Queries by category
+        rounds (int): Timed passes over the corpus; the fastest is reported
+
+    Returns:
+        Dict[str, Any]: Throughput, per-agent latency and allocations, and routing counts
+    """
+    agent = _new_agent()
+    queries = [(category, query) for category in CATEGORIES for query in corpus[category]]
+
+    best_elapsed = None
+    best_latencies: Dict[str, List[float]] = {}
+    category_elapsed: Dict[str, float] = {}
+    routing: Dict[str, Dict[str, int]] = {}
+
+    for _ in range(rounds):
+        latencies: Dict[str, List[float]] = {}
+        elapsed_by_category = {category: 0.0 for category in CATEGORIES}
+        counts: Dict[str, Dict[str, int]] = {category: {} for category in CATEGORIES}
+
+        started = time.perf_counter()
+        for category, query in queries:
+            query_started = time.perf_counter()
+            response = agent.process_query(query)
+            elapsed = time.perf_counter() - query_started
+
+            agent_name = response.get("agent", "unknown")
+            latencies.setdefault(agent_name, []).append(elapsed)
+            elapsed_by_category[category] += elapsed
+            counts[category][agent_name] = counts[category].get(agent_name, 0) + 1
+        total_elapsed = time.perf_counter() - started
+
+        if best_elapsed is None or total_elapsed < best_elapsed:
+            best_elapsed, best_latencies, category_elapsed = total_elapsed, latencies, elapsed_by_category
+        routing = counts
+
+    # Allocation pass: bytes allocated while answering each query (peak over the start)
+    allocations: Dict[str, List[int]] = {}
+    tracemalloc.start()
+    try:
+        for _, query in queries:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            response = agent.process_query(query)
+            peak = tracemalloc.get_traced_memory()[1]
+            allocations.setdefault(response.get("agent", "unknown"), []).append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    all_allocations = [size for sizes in allocations.values() for size in sizes]
+    return {
+        "queries": len(queries),
+        "throughput_qps": len(queries) / best_elapsed,
+        "alloc_bytes_per_query": sum(all_allocations) / len(all_allocations),
+        "agents": {
+            name: {
+                "queries": len(samples),
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "alloc_bytes_per_query": sum(allocations.get(name, [0])) / max(1, len(allocations.get(name, []))),
+            }
+            for name, samples in sorted(best_latencies.items())
+        },
+        "categories": {
+            category: {
+                "queries": len(corpus[category]),
+                "throughput_qps": len(corpus[category]) / category_elapsed[category],
+                "routing": dict(sorted(routing[category].items())),
+            }
+            for category in CATEGORIES
+        },
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            thresholds: Dict[str, float]) -> Tuple[List[str], List[str]]:
+    """
+    Compare a run with the baseline.
+
+    Returns:
+        Tuple[List[str], List[str]]: Regressions (fail the run) and notes
+    """
+    regressions: List[str] = []
+    notes: List[str] = []
+
+    if results["corpus"] != baseline.get("corpus"):
+        regressions.append(f"Corpus differs from the baseline's ({baseline.get('corpus')}); rerun with the same settings")
+        return regressions, notes
+    if results["environment"] != baseline.get("environment"):
+        notes.append(f"environment differs from the baseline's ({baseline.get('environment')}); "
+                     f"timings may not be comparable")
+
+    def check(label: str, value: float, reference: float, limit: float, higher_is_better: bool) -> None:
+        if not reference:
+            return
+        change = (value - reference) / reference
+        worse = -change if higher_is_better else change
+        line = f"{label}: {value:,.3f} vs {reference:,.3f} ({change:+.1%})"
+        (regressions if worse > limit else notes).append(line)
+
+    check("throughput (queries/s)", results["throughput_qps"], baseline["throughput_qps"],
+          thresholds["throughput"], higher_is_better=True)
+    check("allocated bytes/query", results["alloc_bytes_per_query"], baseline["alloc_bytes_per_query"],
+          thresholds["allocations"], higher_is_better=False)
+
+    for name, stats in results["agents"].items():
+        reference = baseline["agents"].get(name)
+        if reference is None or min(stats["queries"], reference["queries"]) < MIN_SAMPLES:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            check(f"{name} {key}", stats[key], reference[key], thresholds["latency"], higher_is_better=False)
+
+    for category, stats in results["categories"].items():
+        reference = baseline["categories"].get(category, {}).get("routing")
+        if stats["routing"] != reference:
+            regressions.append(f"routing of {category} queries changed: {stats['routing']} (baseline {reference})")
+
+    return regressions, notes
+
+
+def main() -> int:
+    """Run the benchmark; returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Routing throughput benchmark with regression thresholds")
+    parser.add_argument('--per-category', type=int, default=1000, help='Queries per corpus category')
+    parser.add_argument('--seed', type=int, default=2025, help='Corpus random seed')
+    parser.add_argument('--rounds', type=int, default=3, help='Timed passes; the fastest is reported')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline results to compare with')
+    parser.add_argument('--output', help='Save the results as JSON to this path')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to the baseline path')
+    for name, default in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f'--max-{name}-regression', type=float, default=default, dest=f'threshold_{name}',
+                            help=f'Allowed relative {name} regression (default {default * 100:.0f}%%)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.per_category, args.seed)
+    results = run_benchmark(corpus, args.rounds)
+    results["corpus"] = {"per_category": args.per_category, "seed": args.seed}
+    results["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sympy": find_spec("sympy") is not None,
+        "numpy": find_spec("numpy") is not None,
+    }
+
+    print(f"{results['queries']} queries: {results['throughput_qps']:,.0f} queries/s, "
+          f"{results['alloc_bytes_per_query']:,.0f} bytes allocated/query")
+    print(f"\n{'Agent':<16}{'Queries':>9}{'p50 ms':>10}{'p99 ms':>10}{'Bytes/query':>13}")
+    for name, stats in results["agents"].items():
+        print(f"{name:<16}{stats['queries']:>9}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['alloc_bytes_per_query']:>13,.0f}")
+    print(f"\n{'Category':<12}{'Queries/s':>11}  Routing")
+    for category, stats in results["categories"].items():
+        print(f"{category:<12}{stats['throughput_qps']:>11,.0f}  {stats['routing']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baseline: Optional[Dict[str, Any]] = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    thresholds = {name: getattr(args, f"threshold_{name}") for name in DEFAULT_THRESHOLDS}
+    regressions, notes = compare(results, baseline, thresholds)
+    print("\nCompared with the baseline:")
+    for line in notes:
+        print(f"  ✅ {line}")
+    for line in regressions:
+        print(f"  ❌ {line}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
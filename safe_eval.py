@@ -0,0 +1,221 @@
+"""
+Safe Expression Evaluator
+Evaluates arithmetic expressions without ``eval``: the expression is parsed to
+an AST, checked against a whitelist and size limits, and compiled to a small
+stack program that is cached by expression text. Evaluation enforces limits on
+operand magnitude, exponent size and steps, so adversarial input such as
+``9**9**9**9`` fails fast instead of tying up a worker.
+"""
+
+import ast
+import math
+import operator
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from query_cache import LRUCache
+
+Number = Union[int, float]
+
+# Compiled program: (None, value) pushes a number, (operator, arity) applies one
+Program = Tuple[Tuple[Optional[str], Any], ...]
+
+# Defaults for the limits below
+MAX_EXPRESSION_LENGTH = 256
+MAX_NODES = 128
+MAX_DIGITS = 1000
+MAX_EXPONENT = 10000
+MAX_STEPS = 1000
+
+BINARY_OPERATORS: Dict[type, Tuple[str, Callable[[Any, Any], Any]]] = {
+    ast.Add: ("+", operator.add),
+    ast.Sub: ("-", operator.sub),
+    ast.Mult: ("*", operator.mul),
+    ast.Div: ("/", operator.truediv),
+    ast.FloorDiv: ("//", operator.floordiv),
+    ast.Mod: ("%", operator.mod),
+    ast.Pow: ("**", operator.pow),
+}
+
+UNARY_OPERATORS: Dict[type, Tuple[str, Callable[[Any], Any]]] = {
+    ast.UAdd: ("u+", operator.pos),
+    ast.USub: ("u-", operator.neg),
+}
+
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    symbol: function for symbol, function in list(BINARY_OPERATORS.values()) + list(UNARY_OPERATORS.values())
+}
+
+# A number or closing parenthesis followed, with or without a space, by a name
+# or an opening parenthesis, as in "3x", "2(x + 1)", "x^9 sin(x)" or
+# "exp(-x) sin(x)"; "1e6" is a number and "log10(" a name
+_IMPLICIT_PRODUCT = re.compile(r"(\b\d+(?:\.\d*)?(?:[eE][-+]?\d+)?(?![eE][-+]?\d)(?=\s*[A-Za-z_(])|\)(?=\s*[\w(]))")
+
+
+def normalize_expression(expression: str) -> str:
+    """Write an expression as typed in a question ("x^2 + 3x") in Python syntax ("x**2 + 3*x")."""
+    return _IMPLICIT_PRODUCT.sub(r"\1*", expression.strip().replace("^", "**"))
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be parsed or uses unsupported syntax."""
+
+
+class ExpressionLimitError(ExpressionError):
+    """Raised when an expression or its evaluation exceeds one of the limits."""
+
+
+class SafeEvaluator:
+    """
+    Arithmetic evaluator with bounded cost.
+
+    Supports integer and decimal numbers, ``+ - * / // % **``, unary signs and
+    parentheses, with Python's precedence (``**`` binds tightest and is right
+    associative). Integers stay exact; ``/`` gives a float.
+    """
+
+    def __init__(self, max_length: int = MAX_EXPRESSION_LENGTH, max_nodes: int = MAX_NODES,
+                 max_digits: int = MAX_DIGITS, max_exponent: int = MAX_EXPONENT,
+                 max_steps: int = MAX_STEPS, cache_size: int = 1024):
+        """
+        Args:
+            max_length (int): Longest expression accepted, in characters
+            max_nodes (int): Most AST nodes an expression may have
+            max_digits (int): Most decimal digits of any operand or intermediate result
+            max_exponent (int): Largest absolute exponent of ``**``
+            max_steps (int): Evaluation budget; each operation costs one step,
+                plus the bit length of the exponent for ``**``
+            cache_size (int): Compiled expressions kept, least recently used evicted
+        """
+        self.max_length = max_length
+        self.max_nodes = max_nodes
+        self.max_digits = max_digits
+        self.max_exponent = max_exponent
+        self.max_steps = max_steps
+        self._max_bits = math.ceil(max_digits * math.log2(10))
+        self._cache = LRUCache(max_size=cache_size)
+
+    def compile(self, expression: str) -> Program:
+        """
+        Parse and check an expression, using the cached program when there is one.
+
+        Args:
+            expression (str): Arithmetic expression in Python syntax
+
+        Returns:
+            Program: The compiled stack program
+
+        Raises:
+            ExpressionError: If the expression is not valid arithmetic
+            ExpressionLimitError: If it is too long or has too many nodes
+        """
+        program = self._cache.get(expression)
+        if program is None:
+            program = self._compile(expression)
+            self._cache.put(expression, program)
+        return program
+
+    def _compile(self, expression: str) -> Program:
+        """Parse, check and compile an expression to postfix order."""
+        if len(expression) > self.max_length:
+            raise ExpressionLimitError(f"Expression is longer than {self.max_length} characters")
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+            raise ExpressionError(f"Invalid expression: {expression}") from e
+
+        node_count = sum(1 for _ in ast.walk(tree))
+        if node_count > self.max_nodes:
+            raise ExpressionLimitError(f"Expression has more than {self.max_nodes} operations and numbers")
+
+        program: List[Tuple[Optional[str], Any]] = []
+        pending = [(tree.body, False)]
+        # Iterative post-order walk; a node is emitted after its operands
+        while pending:
+            node, operands_done = pending.pop()
+            if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+                self._check_magnitude(node.value)
+                program.append((None, node.value))
+            elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+                if operands_done:
+                    program.append((BINARY_OPERATORS[type(node.op)][0], 2))
+                else:
+                    pending.extend([(node, True), (node.right, False), (node.left, False)])
+            elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+                if operands_done:
+                    program.append((UNARY_OPERATORS[type(node.op)][0], 1))
+                else:
+                    pending.extend([(node, True), (node.operand, False)])
+            else:
+                raise ExpressionError(f"Unsupported syntax in expression: {expression}")
+        return tuple(program)
+
+    def evaluate(self, expression: str) -> Number:
+        """
+        Evaluate an arithmetic expression.
+
+        Args:
+            expression (str): Arithmetic expression in Python syntax
+
+        Returns:
+            Number: The result, an int when every step was exact
+
+        Raises:
+            ExpressionError: If the expression is not valid arithmetic
+            ExpressionLimitError: If a limit is exceeded
+            ZeroDivisionError: On division or modulo by zero
+        """
+        stack: List[Number] = []
+        steps = 0
+        for symbol, value in self.compile(expression):
+            if symbol is None:
+                stack.append(value)
+                continue
+
+            steps += 1
+            if value == 1:
+                result = _FUNCTIONS[symbol](stack.pop())
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                if symbol == "**":
+                    steps += self._check_power(left, right)
+                try:
+                    result = _FUNCTIONS[symbol](left, right)
+                except OverflowError as e:
+                    raise ExpressionLimitError("Result is too large") from e
+
+            if steps > self.max_steps:
+                raise ExpressionLimitError(f"Expression needs more than {self.max_steps} steps")
+            self._check_magnitude(result)
+            stack.append(result)
+        return stack[0]
+
+    def _check_power(self, base: Number, exponent: Number) -> int:
+        """Reject powers that are too large before computing them; returns their step cost."""
+        if abs(exponent) > self.max_exponent:
+            raise ExpressionLimitError(f"Exponent is larger than {self.max_exponent}")
+        if base < 0 and not float(exponent).is_integer():
+            raise ExpressionError("Fractional power of a negative number")
+        if exponent > 0 and abs(base) > 1 and exponent * math.log10(abs(base)) > self.max_digits:
+            raise ExpressionLimitError(f"Result has more than {self.max_digits} digits")
+        return int(abs(exponent)).bit_length()
+
+    def _check_magnitude(self, value: Number) -> None:
+        """Reject operands and results that are too large or not finite."""
+        if isinstance(value, int):
+            if value.bit_length() > self._max_bits:
+                raise ExpressionLimitError(f"Number has more than {self.max_digits} digits")
+        elif not math.isfinite(value):
+            raise ExpressionLimitError("Result is too large")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the limits and the compiled-expression cache counters."""
+        return {
+            "max_length": self.max_length,
+            "max_nodes": self.max_nodes,
+            "max_digits": self.max_digits,
+            "max_exponent": self.max_exponent,
+            "max_steps": self.max_steps,
+            "cache": self._cache.get_stats(),
+        }
@@ -3,63 +3,74 @@ Spanish Agent
 Specialized agent for handling queries in Spanish language.
 """
 
-import re
-from typing import Dict, Any
-from base_agent import BaseAgent
-
-try:
-    from langdetect import detect
-    LANGDETECT_AVAILABLE = True
-except ImportError:
-    LANGDETECT_AVAILABLE = False
+from typing import Dict, Any, List, Optional
+from base_agent import BaseAgent, TIER_CHAR_CLASS, TIER_LEXICON
+from phrase_matcher import PhraseMatcher, count_words
+from query_analysis import QueryAnalysis
 
 
 class SpanishAgent(BaseAgent):
     """Agent specialized in responding to Spanish language queries."""
     
+    # Responses are a pure function of the query text
+    deterministic = True
+    
+    # Intent phrases, matched anywhere in the lowercased query, in priority order
+    INTENT_PHRASES = {
+        'greeting': ['hola', 'buenos días', 'buenas tardes', 'buenas noches', 'saludos'],
+        'farewell': ['adiós', 'hasta luego', 'nos vemos', 'chao', 'hasta pronto'],
+        'thanks': ['gracias', 'muchas gracias', 'te agradezco'],
+        'help': ['ayuda', 'ayúdame', 'puedes ayudar', 'necesito ayuda'],
+        'information': ['qué es', 'qué son', 'dime sobre', 'explícame', 'describe'],
+        'opinion': ['qué piensas', 'tu opinión', 'prefieres', 'te gusta'],
+    }
+    
+    # Common Spanish words and indicators
+    spanish_indicators = [
+        # Articles and determiners
+        'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas',
+        
+        # Common prepositions
+        'de', 'en', 'a', 'por', 'para', 'con', 'sin', 'sobre', 'bajo',
+        'ante', 'tras', 'desde', 'hasta', 'hacia', 'contra',
+        
+        # Common verbs
+        'es', 'son', 'está', 'están', 'era', 'eran', 'estaba', 'estaban',
+        'ser', 'estar', 'tener', 'haber', 'hacer', 'ir', 'ver', 'dar',
+        'saber', 'querer', 'poder', 'decir', 'venir', 'llevar', 'poner',
+        'salir', 'llegar', 'pasar', 'seguir', 'quedar', 'creer',
+        
+        # Pronouns
+        'yo', 'tú', 'él', 'ella', 'nosotros', 'nosotras', 'vosotros',
+        'vosotras', 'ellos', 'ellas', 'me', 'te', 'se', 'nos', 'os',
+        'le', 'les', 'lo', 'la', 'los', 'las',
+        
+        # Question words
+        'qué', 'quién', 'quiénes', 'cuál', 'cuáles', 'cuándo', 'dónde',
+        'cómo', 'por qué', 'para qué', 'cuánto', 'cuánta', 'cuántos', 'cuántas',
+        
+        # Common adjectives and adverbs
+        'muy', 'más', 'menos', 'tan', 'tanto', 'mucho', 'poco', 'bien', 'mal',
+        'grande', 'pequeño', 'bueno', 'malo', 'nuevo', 'viejo', 'todo', 'cada',
+        
+        # Greetings and common phrases
+        'hola', 'adiós', 'gracias', 'por favor', 'perdón', 'disculpe',
+        'señor', 'señora', 'señorita', 'sí', 'no', 'tal vez', 'quizás',
+        
+        # Conjunctions
+        'y', 'e', 'o', 'u', 'pero', 'sino', 'aunque', 'mientras', 'cuando',
+        'si', 'porque', 'como', 'que'
+    ]
+    
+    # Intent phrases and indicators, found in one pass over the query; built once for the class
+    _phrase_matcher = PhraseMatcher({**INTENT_PHRASES, 'indicator': spanish_indicators})
+    
     def __init__(self):
         super().__init__(
             name="Spanish Agent", 
             description="Manejo consultas generales y conversaciones en español."
         )
         
-        # Common Spanish words and indicators
-        self.spanish_indicators = [
-            # Articles and determiners
-            'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas',
-            
-            # Common prepositions
-            'de', 'en', 'a', 'por', 'para', 'con', 'sin', 'sobre', 'bajo',
-            'ante', 'tras', 'desde', 'hasta', 'hacia', 'contra',
-            
-            # Common verbs
-            'es', 'son', 'está', 'están', 'era', 'eran', 'estaba', 'estaban',
-            'ser', 'estar', 'tener', 'haber', 'hacer', 'ir', 'ver', 'dar',
-            'saber', 'querer', 'poder', 'decir', 'venir', 'llevar', 'poner',
-            'salir', 'llegar', 'pasar', 'seguir', 'quedar', 'creer',
-            
-            # Pronouns
-            'yo', 'tú', 'él', 'ella', 'nosotros', 'nosotras', 'vosotros',
-            'vosotras', 'ellos', 'ellas', 'me', 'te', 'se', 'nos', 'os',
-            'le', 'les', 'lo', 'la', 'los', 'las',
-            
-            # Question words
-            'qué', 'quién', 'quiénes', 'cuál', 'cuáles', 'cuándo', 'dónde',
-            'cómo', 'por qué', 'para qué', 'cuánto', 'cuánta', 'cuántos', 'cuántas',
-            
-            # Common adjectives and adverbs
-            'muy', 'más', 'menos', 'tan', 'tanto', 'mucho', 'poco', 'bien', 'mal',
-            'grande', 'pequeño', 'bueno', 'malo', 'nuevo', 'viejo', 'todo', 'cada',
-            
-            # Greetings and common phrases
-            'hola', 'adiós', 'gracias', 'por favor', 'perdón', 'disculpe',
-            'señor', 'señora', 'señorita', 'sí', 'no', 'tal vez', 'quizás',
-            
-            # Conjunctions
-            'y', 'e', 'o', 'u', 'pero', 'sino', 'aunque', 'mientras', 'cuando',
-            'si', 'porque', 'como', 'que'
-        ]
-        
         # Spanish-specific patterns
         self.spanish_patterns = [
             r'\b(el|la|los|las)\s+\w+',  # Articles
@@ -75,47 +86,55 @@ class SpanishAgent(BaseAgent):
         # Spanish characters
         self.spanish_chars = 'ñáéíóúü¿¡'
     
+    def get_routing_patterns(self) -> Dict[str, List[str]]:
+        """Spanish sentence patterns, matched on the lowercased query."""
+        return {"raw": [], "lower": self.spanish_patterns}
+    
     def can_handle(self, query: str) -> bool:
         """Check if the query is in Spanish."""
-        
-        # First, use language detection if available
-        if LANGDETECT_AVAILABLE:
-            try:
-                detected_lang = detect(query)
-                if detected_lang == 'es':
-                    return True
-            except:
-                pass  # Fall back to manual detection
-        
-        # Check for Spanish-specific characters
-        if any(char in query for char in self.spanish_chars):
-            return True
-        
-        # Manual Spanish detection
-        query_lower = query.lower()
-        words = query_lower.split()
-        
-        # Check for Spanish indicators
-        spanish_word_count = 0
-        for word in words:
-            if word in self.spanish_indicators:
-                spanish_word_count += 1
-        
-        # If more than 30% of words are common Spanish words
-        if len(words) > 0 and (spanish_word_count / len(words)) > 0.3:
-            return True
-        
-        # Check for Spanish patterns
-        for pattern in self.spanish_patterns:
-            if re.search(pattern, query_lower):
+        analysis = QueryAnalysis(query)
+        return self.can_handle_routed(analysis, self.matches_routing_patterns(analysis))
+    
+    def route_tier(self, analysis: QueryAnalysis, tier: str, pattern_matched: Optional[bool]) -> Optional[bool]:
+        """Check the cheap Spanish signals first and only then fall back to language detection."""
+        if tier == TIER_CHAR_CLASS:
+            # Check for Spanish-specific characters (never present in ASCII text)
+            if not analysis.is_ascii and any(char in analysis.query for char in self.spanish_chars):
+                return True
+            # Without letters there is nothing left to recognize
+            if not analysis.has_letters:
+                return False
+            return None
+        
+        if tier == TIER_LEXICON:
+            # Check for Spanish sentence patterns
+            if pattern_matched:
                 return True
+            
+            # Manual Spanish detection
+            words = analysis.tokens
+            
+            # Check for Spanish indicators, multi-word ones like 'por favor' included
+            occurrences = analysis.find_phrases(self._phrase_matcher)
+            spanish_word_count = count_words(analysis.normalized, occurrences, 'indicator')
+            
+            # If more than 30% of words are common Spanish words
+            if len(words) > 0 and (spanish_word_count / len(words)) > 0.3:
+                return True
+            return None
         
-        return False
+        # Use the shared language detection
+        return analysis.language == 'es'
     
     def process(self, query: str) -> Dict[str, Any]:
         """Process Spanish language queries and provide appropriate responses."""
+        return self.process_analysis(QueryAnalysis(query))
+    
+    def process_analysis(self, analysis: QueryAnalysis) -> Dict[str, Any]:
+        """Process an analyzed Spanish query and provide an appropriate response."""
+        query = analysis.query
         try:
-            response = self._generate_spanish_response(query)
+            response = self._generate_spanish_response(analysis)
             return {
                 "agent": self.name,
                 "success": True,
@@ -132,44 +151,46 @@ class SpanishAgent(BaseAgent):
                 "type": "spanish_language_response"
             }
     
-    def _generate_spanish_response(self, query: str) -> str:
+    def _generate_spanish_response(self, analysis: QueryAnalysis) -> str:
         """Generate appropriate responses for Spanish queries."""
-        query_lower = query.lower().strip()
+        query = analysis.query
+        intents = self._phrase_matcher.labels_of(analysis.find_phrases(self._phrase_matcher))
         
         # Greeting responses
-        if any(greeting in query_lower for greeting in ['hola', 'buenos días', 'buenas tardes', 'buenas noches', 'saludos']):
+        if 'greeting' in intents:
             return "¡Hola! Soy el Agente Español. ¿Cómo puedo ayudarte hoy? Puedo asistirte con preguntas generales, proporcionar información o tener una conversación en español."
         
         # Farewell responses
-        if any(farewell in query_lower for farewell in ['adiós', 'hasta luego', 'nos vemos', 'chao', 'hasta pronto']):
+        if 'farewell' in intents:
             return "¡Adiós! Fue un placer hablar contigo. ¡Vuelve cuando necesites ayuda con consultas en español!"
         
         # Thank you responses
-        if any(thanks in query_lower for thanks in ['gracias', 'muchas gracias', 'te agradezco']):
+        if 'thanks' in intents:
             return "¡De nada! Me alegra poder ayudarte. ¿Hay algo más que te gustaría saber o discutir?"
         
         # Help requests
-        if any(help_word in query_lower for help_word in ['ayuda', 'ayúdame', 'puedes ayudar', 'necesito ayuda']):
+        if 'help' in intents:
             return "¡Estoy aquí para ayudarte! Puedo asistirte con preguntas generales, proporcionar explicaciones, discutir temas o ayudarte con consultas en español. ¿Qué te gustaría saber?"
         
         # Question identification and responses
-        if '?' in query or query.strip().startswith('¿'):
-            return self._handle_spanish_question(query)
+        if analysis.has_question_mark or query.strip().startswith('¿'):
+            return self._handle_spanish_question(analysis)
         
         # Information requests
-        if any(word in query_lower for word in ['qué es', 'qué son', 'dime sobre', 'explícame', 'describe']):
+        if 'information' in intents:
             return self._handle_spanish_information_request(query)
         
         # Opinion or preference queries
-        if any(word in query_lower for word in ['qué piensas', 'tu opinión', 'prefieres', 'te gusta']):
+        if 'opinion' in intents:
             return self._handle_spanish_opinion_request(query)
         
         # General conversation
         return self._handle_spanish_general_conversation(query)
     
-    def _handle_spanish_question(self, query: str) -> str:
+    def _handle_spanish_question(self, analysis: QueryAnalysis) -> str:
         """Handle questions in Spanish."""
-        query_lower = query.lower()
+        query = analysis.query
+        query_lower = analysis.lower
         
         if query_lower.startswith('¿qué') or 'qué' in query_lower[:10]:
             return f"Es una pregunta interesante sobre 'qué': '{query}'. Aunque puedo entender y responder en español, puede que no tenga conocimiento específico sobre todos los temas. ¿Podrías proporcionar más contexto o reformular tu pregunta?"
@@ -0,0 +1,166 @@
+"""
+Symbolic Cache
+Two-tier memoization of sympy results: an in-memory LRU in front of an
+optional SQLite file that survives restarts and can be shared by several
+processes. Keys are the canonicalized expression plus the operation.
+"""
+
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from query_cache import LRUCache
+
+if TYPE_CHECKING:
+    from sqlite3 import Connection
+
+
+# Whitespace never changes the meaning of an expression
+_WHITESPACE = re.compile(r"\s+")
+
+# The disk tier is pruned to its size limit every this many writes
+PRUNE_INTERVAL = 100
+
+
+def canonical_key(expression: str, operation: Optional[str], namespace: str = "") -> str:
+    """
+    Cache key of a symbolic computation.
+
+    Args:
+        expression (str): The expression, as extracted from the query
+        operation (Optional[str]): 'solve', 'derivative', 'integral', or None to evaluate
+        namespace (str): Prefix separating incompatible results, e.g. the sympy version
+
+    Returns:
+        str: ``namespace|operation|expression``, with whitespace removed and
+        ``^`` written as ``**``
+    """
+    canonical = _WHITESPACE.sub("", expression).replace("^", "**")
+    return f"{namespace}|{operation or 'evaluate'}|{canonical}"
+
+
+class SymbolicCache:
+    """
+    Memoizes symbolic results in memory and, optionally, in an SQLite file.
+
+    Lookups try the memory tier, then the disk tier (promoting hits into
+    memory). Writes go to both. The SQLite file is opened in WAL mode with a
+    busy timeout, so several processes can share it.
+    """
+
+    def __init__(self, memory_size: int = 512, path: Optional[str] = None, max_disk_entries: int = 100000):
+        """
+        Args:
+            memory_size (int): Results kept in memory, least recently used evicted
+            path (Optional[str]): SQLite file of the disk tier, or None for memory only
+            max_disk_entries (int): Results kept on disk, oldest pruned first
+        """
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._memory = LRUCache(max_size=memory_size)
+        self._conn: Optional["Connection"] = None
+        self._conn_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._writes = 0
+
+        # Counters surfaced through get_stats()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path is not None:
+            # Imported only for the disk tier
+            import sqlite3
+            self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a result.
+
+        Args:
+            key (str): Key from ``canonical_key``
+
+        Returns:
+            Optional[str]: The cached result, or None on a miss
+        """
+        result = self._memory.get(key)
+        if result is not None:
+            with self._stats_lock:
+                self.memory_hits += 1
+            return result
+
+        if self._conn is not None:
+            with self._conn_lock:
+                row = self._conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                with self._stats_lock:
+                    self.disk_hits += 1
+                self._memory.put(key, row[0])
+                return row[0]
+
+        with self._stats_lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: str) -> None:
+        """Store a result in memory and on disk."""
+        self._memory.put(key, result)
+        if self._conn is None:
+            return
+
+        with self._conn_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, result, created_at) VALUES (?, ?, ?)",
+                (key, result, time.time()),
+            )
+            self._writes += 1
+            if self._writes % PRUNE_INTERVAL == 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+
+    def clear(self) -> None:
+        """Drop every cached result, in memory and on disk."""
+        self._memory.clear()
+        if self._conn is not None:
+            with self._conn_lock, self._conn:
+                self._conn.execute("DELETE FROM results")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the hit counters of each tier and the number of cached results."""
+        with self._stats_lock:
+            memory_hits, disk_hits, misses = self.memory_hits, self.disk_hits, self.misses
+        lookups = memory_hits + disk_hits + misses
+        stats: Dict[str, Any] = {
+            "memory_hits": memory_hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_ratio": (memory_hits + disk_hits) / lookups if lookups else 0.0,
+            "memory_size": len(self._memory),
+            "path": self.path,
+        }
+        if self._conn is not None:
+            with self._conn_lock:
+                stats["disk_size"] = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        """Close the SQLite file; the memory tier stays usable."""
+        if self._conn is not None:
+            with self._conn_lock:
+                self._conn.close()
+            self._conn = None
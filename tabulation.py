@@ -0,0 +1,304 @@
+"""
+Tabulation
+Evaluates an expression in one variable over a range of values with NumPy.
+The expression is parsed, checked against a whitelist and compiled once to a
+stack program that runs on whole chunks of the range at a time, so a million
+values cost a few array operations instead of a million evaluations. Results
+are reduced to summary statistics and a short preview, or streamed by chunk.
+"""
+
+import ast
+import math
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from query_cache import LRUCache
+from safe_eval import (BINARY_OPERATORS, MAX_EXPRESSION_LENGTH, MAX_NODES, UNARY_OPERATORS,
+                       ExpressionError, ExpressionLimitError)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+# Compiled program: (None, value) pushes a number, ("var", None) the variable,
+# (operator, arity) applies an operator and ("call", name) a function
+Program = Tuple[Tuple[Optional[str], Any], ...]
+
+# Largest range tabulated in one query
+MAX_POINTS = 10_000_000
+
+# Values evaluated per array operation; bounds memory whatever the range
+CHUNK_SIZE = 65536
+
+# Values in a range given without a step, unless it runs between integers
+DEFAULT_POINTS = 101
+
+# Functions an expression may call, and the NumPy function of each
+FUNCTIONS: Dict[str, str] = {
+    "sin": "sin", "cos": "cos", "tan": "tan",
+    "asin": "arcsin", "acos": "arccos", "atan": "arctan",
+    "arcsin": "arcsin", "arccos": "arccos", "arctan": "arctan",
+    "sinh": "sinh", "cosh": "cosh", "tanh": "tanh",
+    "exp": "exp", "log": "log", "ln": "log", "log10": "log10", "log2": "log2",
+    "sqrt": "sqrt", "abs": "abs", "floor": "floor", "ceil": "ceil",
+}
+
+CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e}
+
+_OPERATORS = {symbol: function for symbol, function in list(BINARY_OPERATORS.values()) + list(UNARY_OPERATORS.values())}
+
+
+class Tabulator:
+    """
+    Tabulates expressions in one variable over evenly spaced values.
+
+    Supports numbers, the variable, ``pi`` and ``e``, ``+ - * / // % **``,
+    unary signs, parentheses and the functions in ``FUNCTIONS``. Values where
+    the expression is undefined (``log(0)``, ``sqrt(-1)``, division by zero)
+    come out as NaN or infinity and are left out of the statistics.
+    """
+
+    def __init__(self, max_points: int = MAX_POINTS, chunk_size: int = CHUNK_SIZE,
+                 preview_rows: int = 5, max_length: int = MAX_EXPRESSION_LENGTH,
+                 max_nodes: int = MAX_NODES, cache_size: int = 256):
+        """
+        Args:
+            max_points (int): Most values in a range
+            chunk_size (int): Values evaluated per array operation
+            preview_rows (int): Values shown from each end of the range
+            max_length (int): Longest expression accepted, in characters
+            max_nodes (int): Most AST nodes an expression may have
+            cache_size (int): Compiled expressions kept, least recently used evicted
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy is required for tabulation")
+        self.max_points = max_points
+        self.chunk_size = chunk_size
+        self.preview_rows = preview_rows
+        self.max_length = max_length
+        self.max_nodes = max_nodes
+        self._functions = {name: getattr(np, numpy_name) for name, numpy_name in FUNCTIONS.items()}
+        self._cache = LRUCache(max_size=cache_size)
+
+    def compile(self, expression: str, variable: str = "x") -> Program:
+        """
+        Parse and check an expression, using the cached program when there is one.
+
+        Args:
+            expression (str): Expression in the variable, in Python syntax
+            variable (str): Name of the variable
+
+        Returns:
+            Program: The compiled stack program
+
+        Raises:
+            ExpressionError: If the expression is not valid or uses anything
+                outside the whitelist
+            ExpressionLimitError: If it is too long or has too many nodes
+        """
+        key = (expression, variable)
+        program = self._cache.get(key)
+        if program is None:
+            program = self._compile(expression, variable)
+            self._cache.put(key, program)
+        return program
+
+    def _compile(self, expression: str, variable: str) -> Program:
+        """Parse, check and compile an expression to postfix order."""
+        if len(expression) > self.max_length:
+            raise ExpressionLimitError(f"Expression is longer than {self.max_length} characters")
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+            raise ExpressionError(f"Invalid expression: {expression}") from e
+
+        node_count = sum(1 for _ in ast.walk(tree))
+        if node_count > self.max_nodes:
+            raise ExpressionLimitError(f"Expression has more than {self.max_nodes} operations and numbers")
+
+        program: List[Tuple[Optional[str], Any]] = []
+        pending = [(tree.body, False)]
+        # Iterative post-order walk; a node is emitted after its operands
+        while pending:
+            node, operands_done = pending.pop()
+            if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+                try:
+                    program.append((None, float(node.value)))
+                except OverflowError as e:
+                    raise ExpressionLimitError("Number is too large") from e
+            elif isinstance(node, ast.Name) and node.id == variable:
+                program.append(("var", None))
+            elif isinstance(node, ast.Name) and node.id in CONSTANTS:
+                program.append((None, CONSTANTS[node.id]))
+            elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+                if operands_done:
+                    program.append((BINARY_OPERATORS[type(node.op)][0], 2))
+                else:
+                    pending.extend([(node, True), (node.right, False), (node.left, False)])
+            elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+                if operands_done:
+                    program.append((UNARY_OPERATORS[type(node.op)][0], 1))
+                else:
+                    pending.extend([(node, True), (node.operand, False)])
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                  and len(node.args) == 1 and not node.keywords):
+                if operands_done:
+                    program.append(("call", node.func.id))
+                else:
+                    pending.extend([(node, True), (node.args[0], False)])
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                raise ExpressionError(f"Unknown function '{node.func.id}' or wrong number of arguments")
+            elif isinstance(node, ast.Name):
+                raise ExpressionError(f"Unknown name '{node.id}' in expression: {expression}")
+            else:
+                raise ExpressionError(f"Unsupported syntax in expression: {expression}")
+        return tuple(program)
+
+    def evaluate(self, program: Program, values: "np.ndarray") -> "np.ndarray":
+        """Run a compiled program on an array of values of the variable."""
+        stack: List[Any] = []
+        with np.errstate(all="ignore"):
+            for symbol, argument in program:
+                if symbol is None:
+                    stack.append(argument)
+                elif symbol == "var":
+                    stack.append(values)
+                elif symbol == "call":
+                    stack.append(self._functions[argument](stack.pop()))
+                elif argument == 1:
+                    stack.append(_OPERATORS[symbol](stack.pop()))
+                else:
+                    right = stack.pop()
+                    stack.append(_OPERATORS[symbol](stack.pop(), right))
+        # An expression without the variable is the same at every value
+        return np.broadcast_to(np.asarray(stack[0], dtype=float), values.shape)
+
+    def resolve_range(self, start: float, stop: float, step: Optional[float] = None) -> Tuple[float, int]:
+        """
+        Work out the step and the number of values of a range, both ends included.
+
+        Without a step, a range between integers goes in steps of 1 and any
+        other range is split into ``DEFAULT_POINTS`` values.
+
+        Returns:
+            Tuple[float, int]: The step and the number of values
+
+        Raises:
+            ExpressionError: If the step is zero or moves away from the stop
+            ExpressionLimitError: If the range has more than ``max_points`` values
+        """
+        if not all(math.isfinite(value) for value in (start, stop, step if step is not None else 0.0)):
+            raise ExpressionError("Range bounds and step must be finite numbers")
+        if step is None:
+            if start == stop:
+                step = 1.0
+            elif float(start).is_integer() and float(stop).is_integer() and abs(stop - start) <= self.max_points:
+                step = math.copysign(1.0, stop - start)
+            else:
+                step = (stop - start) / (DEFAULT_POINTS - 1)
+        if step == 0 or (stop - start) * step < 0:
+            raise ExpressionError(f"A step of {step:g} never gets from {start:g} to {stop:g}")
+
+        # Tolerate rounding, so "0 to 1 step 0.1" includes 1
+        points = math.floor((stop - start) / step + 1e-9) + 1
+        if points > self.max_points:
+            raise ExpressionLimitError(f"Range has {points} values, more than {self.max_points}")
+        return step, points
+
+    def iter_chunks(self, expression: str, start: float, stop: float, step: Optional[float] = None,
+                    variable: str = "x") -> Iterator[Tuple["np.ndarray", "np.ndarray"]]:
+        """
+        Evaluate an expression over a range, one chunk at a time.
+
+        Args:
+            expression (str): Expression in the variable, in Python syntax
+            start (float): First value of the variable
+            stop (float): Last value of the variable, included when the step reaches it
+            step (Optional[float]): Distance between values, or None for the default
+            variable (str): Name of the variable
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Values of the variable and of the
+            expression, at most ``chunk_size`` of each
+        """
+        program = self.compile(expression, variable)
+        step, points = self.resolve_range(start, stop, step)
+        for offset in range(0, points, self.chunk_size):
+            values = start + step * np.arange(offset, min(offset + self.chunk_size, points), dtype=float)
+            yield values, self.evaluate(program, values)
+
+    def tabulate(self, expression: str, start: float, stop: float, step: Optional[float] = None,
+                 variable: str = "x") -> Dict[str, Any]:
+        """
+        Evaluate an expression over a range and summarize the results.
+
+        Args: as for ``iter_chunks``
+
+        Returns:
+            Dict[str, Any]: The resolved range; the number of values and of
+            defined values; min, max (with the variable value where each
+            occurs), mean and standard deviation of the defined values; and
+            ``head`` and ``tail`` lists of (variable, value) pairs
+        """
+        step, points = self.resolve_range(start, stop, step)
+        summary: Dict[str, Any] = {
+            "expression": expression,
+            "variable": variable,
+            "start": start,
+            "stop": start + step * (points - 1),
+            "step": step,
+            "points": points,
+            "defined": 0,
+            "min": None, "argmin": None,
+            "max": None, "argmax": None,
+            "mean": None, "std": None,
+        }
+
+        # Mean and variance are merged chunk by chunk (Chan et al.), so one
+        # pass is enough and no chunk is kept
+        count, mean, squares = 0, 0.0, 0.0
+        for values, results in self.iter_chunks(expression, start, stop, step, variable):
+            defined = np.isfinite(results)
+            if not defined.all():
+                values, results = values[defined], results[defined]
+            if not len(results):
+                continue
+
+            low, high = int(results.argmin()), int(results.argmax())
+            if summary["min"] is None or results[low] < summary["min"]:
+                summary["min"], summary["argmin"] = float(results[low]), float(values[low])
+            if summary["max"] is None or results[high] > summary["max"]:
+                summary["max"], summary["argmax"] = float(results[high]), float(values[high])
+
+            chunk_count, chunk_mean = len(results), float(results.mean())
+            chunk_squares = float(((results - chunk_mean) ** 2).sum())
+            delta = chunk_mean - mean
+            total = count + chunk_count
+            mean += delta * chunk_count / total
+            squares += chunk_squares + delta * delta * count * chunk_count / total
+            count = total
+
+        if count:
+            summary["defined"] = count
+            summary["mean"] = mean
+            summary["std"] = math.sqrt(squares / count)
+
+        program = self.compile(expression, variable)
+        rows = min(self.preview_rows, points)
+        head = start + step * np.arange(rows, dtype=float)
+        tail = start + step * np.arange(max(points - rows, rows), points, dtype=float)
+        summary["head"] = list(zip(head.tolist(), self.evaluate(program, head).tolist()))
+        summary["tail"] = list(zip(tail.tolist(), self.evaluate(program, tail).tolist()))
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the limits and the compiled-expression cache counters."""
+        return {
+            "max_points": self.max_points,
+            "chunk_size": self.chunk_size,
+            "max_length": self.max_length,
+            "max_nodes": self.max_nodes,
+            "cache": self._cache.get_stats(),
+        }
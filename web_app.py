@@ -3,12 +3,16 @@ Web UI for Agentic Framework
 Flask-based web application with real-time communication using WebSockets.
 """
 
-from flask import Flask, render_template, request, jsonify
+import os
+import threading
+import uuid
+from flask import Flask, Response, g, render_template, request, jsonify, session
 from flask_socketio import SocketIO, emit
 import json
 from datetime import datetime
 from primary_agent import PrimaryAgent
-import threading
+from math_agent import get_symbolic_cache, get_symbolic_pool
+import prometheus_exporter
 import time
 
 # Initialize Flask app
@@ -16,12 +20,66 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'agentic_framework_secret_key_2025'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Keep history on disk across restarts if AGENT_HISTORY_PATH is set
+# (a .jsonl file uses the JSON Lines backend, anything else SQLite)
+history_path = os.environ.get('AGENT_HISTORY_PATH')
+if history_path and history_path.endswith('.jsonl'):
+    from durable_history import JSONLHistoryStore
+    history_store = JSONLHistoryStore(history_path)
+elif history_path:
+    from durable_history import SQLiteHistoryStore
+    history_store = SQLiteHistoryStore(history_path)
+else:
+    history_store = None
+
 # Initialize the primary agent
-primary_agent = PrimaryAgent()
+primary_agent = PrimaryAgent(history=history_store)
 
 # Store active sessions
 active_sessions = {}
 
+# Queries handed to background workers, waiting ("queued") or being processed ("running")
+background_queries = {'queued': 0, 'running': 0}
+background_queries_lock = threading.Lock()
+
+# Web metrics, recorded in the Primary Agent's metrics sink
+HTTP_REQUESTS = 'http_requests_total'
+HTTP_REQUEST_SECONDS = 'http_request_seconds'
+SOCKETIO_EVENTS = 'socketio_events_total'
+
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started."""
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency, by route."""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    primary_agent.metrics.increment(HTTP_REQUESTS, {
+        'route': route,
+        'method': request.method,
+        'status': str(response.status_code)
+    })
+    started = g.pop('request_started', None)
+    if started is not None:
+        primary_agent.metrics.observe(HTTP_REQUEST_SECONDS, time.perf_counter() - started, {'route': route})
+    return response
+
+
+def http_session_id():
+    """The HTTP caller's own session, kept in Flask's signed session cookie."""
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
+    return session['session_id']
+
+
+def count_socket_event(event):
+    """Count a Socket.IO event."""
+    primary_agent.metrics.increment(SOCKETIO_EVENTS, {'event': event})
+
 
 @app.route('/')
 def index():
@@ -31,9 +89,9 @@ def index():
 
 @app.route('/api/status')
 def get_status():
-    """API endpoint to get system status."""
+    """API endpoint to get system status, with the conversation counts of the caller's session."""
     try:
-        status = primary_agent.get_status()
+        status = primary_agent.get_status(http_session_id())
         return jsonify({
             'success': True,
             'status': status
@@ -45,6 +103,27 @@ def get_status():
         }), 500
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics in the text exposition format."""
+    with background_queries_lock:
+        queued, running = background_queries['queued'], background_queries['running']
+    
+    families = [
+        ('web_active_sessions', 'gauge', 'Connected Socket.IO sessions', [({}, len(active_sessions))]),
+        ('web_background_queries', 'gauge', 'Queries handed to background workers, by state',
+         [({'state': 'queued'}, queued), ({'state': 'running'}, running)]),
+    ]
+    if primary_agent.cache is not None:
+        families += prometheus_exporter.cache_metrics(primary_agent.cache.get_stats())
+    families += prometheus_exporter.worker_pool_metrics(get_symbolic_pool().get_stats(), 'symbolic')
+    families += prometheus_exporter.symbolic_cache_metrics(get_symbolic_cache().get_stats())
+    families += prometheus_exporter.process_metrics()
+    
+    text = prometheus_exporter.render(primary_agent.metrics.snapshot(), families)
+    return Response(text, content_type=prometheus_exporter.CONTENT_TYPE)
+
+
 @app.route('/api/agents')
 def get_agents():
     """API endpoint to get available agents."""
@@ -67,6 +146,7 @@ def process_query():
     try:
         data = request.get_json()
         query = data.get('query', '').strip()
+        session_id = http_session_id()
         
         if not query:
             return jsonify({
@@ -75,7 +155,7 @@ def process_query():
             }), 400
         
         # Process the query
-        response = primary_agent.process_query(query)
+        response = primary_agent.process_query(query, session_id=session_id)
         
         return jsonify({
             'success': True,
@@ -93,6 +173,7 @@ def process_query():
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
+    count_socket_event('connect')
     session_id = request.sid
     active_sessions[session_id] = {
         'connected_at': datetime.now().isoformat(),
@@ -107,21 +188,27 @@ def handle_connect():
     })
     
     # Send initial system status
-    status = primary_agent.get_status()
+    status = primary_agent.get_status(session_id)
     emit('system_status', status)
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection."""
+    count_socket_event('disconnect')
     session_id = request.sid
     if session_id in active_sessions:
         del active_sessions[session_id]
+    
+    # Drop the session's in-memory history so memory stays flat on a long-running server
+    if not primary_agent.history.durable:
+        primary_agent.clear_history(session_id)
 
 
 @socketio.on('send_query')
 def handle_query(data):
     """Handle query from client via WebSocket."""
+    count_socket_event('send_query')
     session_id = request.sid
     query = data.get('query', '').strip()
     
@@ -145,8 +232,11 @@ def handle_query(data):
     
     # Process query in background thread
     def process_query_background():
+        with background_queries_lock:
+            background_queries['queued'] -= 1
+            background_queries['running'] += 1
         try:
-            response = primary_agent.process_query(query)
+            response = primary_agent.process_query(query, session_id=session_id)
             
             # Emit response back to client
             socketio.emit('query_response', {
@@ -157,7 +247,7 @@ def handle_query(data):
             }, room=session_id)
             
             # Update system status
-            status = primary_agent.get_status()
+            status = primary_agent.get_status(session_id)
             socketio.emit('system_status', status, room=session_id)
             
         except Exception as e:
@@ -166,16 +256,22 @@ def handle_query(data):
                 'query': query,
                 'timestamp': datetime.now().isoformat()
             }, room=session_id)
+        finally:
+            with background_queries_lock:
+                background_queries['running'] -= 1
     
-    # Start background processing
-    threading.Thread(target=process_query_background, daemon=True).start()
+    # Start background processing (a green thread under eventlet/gevent)
+    with background_queries_lock:
+        background_queries['queued'] += 1
+    socketio.start_background_task(process_query_background)
 
 
 @socketio.on('get_status')
 def handle_get_status():
     """Handle status request from client."""
+    count_socket_event('get_status')
     try:
-        status = primary_agent.get_status()
+        status = primary_agent.get_status(request.sid)
         emit('system_status', status)
     except Exception as e:
         emit('error', {
@@ -187,15 +283,16 @@ def handle_get_status():
 @socketio.on('clear_history')
 def handle_clear_history():
     """Handle clear history request."""
+    count_socket_event('clear_history')
     try:
-        primary_agent.clear_history()
+        primary_agent.clear_history(request.sid)
         emit('history_cleared', {
             'message': 'Conversation history cleared',
             'timestamp': datetime.now().isoformat()
         })
         
         # Send updated status
-        status = primary_agent.get_status()
+        status = primary_agent.get_status(request.sid)
         emit('system_status', status)
         
     except Exception as e:
@@ -209,9 +306,13 @@ if __name__ == '__main__':
     print("🌐 Starting Agentic Framework Web UI...")
     print("📍 Access the web interface at: http://localhost:5000")
     print("🔄 Real-time communication enabled with WebSockets")
+    print("📈 Prometheus metrics at: http://localhost:5000/metrics")
     print("🤖 Multi-agent system ready!")
     print("\nPress Ctrl+C to stop the server")
     
+    # Pre-warm the sympy worker processes before taking traffic
+    get_symbolic_pool().start()
+    
     # Run the Flask-SocketIO app
     socketio.run(
         app, 
@@ -0,0 +1,282 @@
+"""
+Worker Pool
+Pool of pre-warmed worker processes for expensive computations, with a hard
+deadline and a memory cap per call. Workers that miss their deadline are
+killed and replaced.
+"""
+
+import atexit
+import importlib
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Not available on Windows
+    RESOURCE_AVAILABLE = False
+
+
+class WorkerTimeoutError(Exception):
+    """Raised when a call does not finish before its deadline."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Computation timed out after {timeout:g} seconds")
+        self.timeout = timeout
+
+
+class WorkerError(Exception):
+    """Raised when a call fails inside the worker or the worker dies."""
+
+
+def _worker_main(conn, preload_modules: Sequence[str], memory_limit_mb: Optional[int]) -> None:
+    """Worker loop: apply the memory cap, pre-import modules, then run calls until told to stop."""
+    if memory_limit_mb and RESOURCE_AVAILABLE:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass  # Keep the inherited limit
+
+    for module_name in preload_modules:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        func, args = task
+        try:
+            conn.send((True, func(*args)))
+        except MemoryError:
+            conn.send((False, "Memory limit exceeded"))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(self, context, preload_modules: Sequence[str], memory_limit_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, tuple(preload_modules), memory_limit_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        """Terminate the process without waiting for the current call."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        """Ask the process to exit, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _reset_in_child(reference: "weakref.ref[WorkerPool]") -> None:
+    """Reset a pool in a freshly forked child process, if the pool still exists."""
+    pool = reference()
+    if pool is not None:
+        pool._reset_after_fork()
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker processes started on first use.
+
+    ``run`` sends a picklable module-level function and its arguments to an
+    idle worker and waits up to the deadline for the result. Calls are
+    thread-safe; when every worker is busy, callers wait for one to free up,
+    and that wait counts against the deadline. ``shutdown`` wakes any callers
+    still waiting.
+
+    The workers belong to the process that started them. A forked child, such
+    as a batch worker of ``PrimaryAgent.process_queries``, starts its own on
+    first use instead of sharing the parent's pipes.
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 10.0, memory_limit_mb: Optional[int] = 512,
+                 preload_modules: Sequence[str] = ()):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.preload_modules = tuple(preload_modules)
+
+        # Set when the pool starts, so processes that never run a call don't import multiprocessing
+        self._context = None
+        # Idle workers; None tells waiting callers the pool was shut down
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+        # Counters
+        self.calls = 0
+        self.timeouts = 0
+        self.crashes = 0
+
+        if hasattr(os, "register_at_fork"):  # Not available on Windows, which never forks
+            reference = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _reset_in_child(reference))
+
+    def _reset_after_fork(self) -> None:
+        """
+        Forget the parent's workers in a forked child.
+
+        Their pipes are shared with the parent, so calls from both processes
+        would read each other's results. The child only closes its copies;
+        the parent's workers keep running.
+        """
+        for worker in self._workers:
+            worker.conn.close()
+        self._workers = []
+        self._idle = queue.Queue()
+        # A lock held by another thread of the parent would never be released here
+        self._lock = threading.Lock()
+        self._started = False
+        self.calls = self.timeouts = self.crashes = 0
+
+    def start(self) -> None:
+        """Start and pre-warm all workers; does nothing if already started."""
+        with self._lock:
+            if self._started:
+                return
+            if self._context is None:
+                import multiprocessing
+                self._context = multiprocessing.get_context()
+            for _ in range(self.size):
+                self._add_worker()
+            self._started = True
+            atexit.register(self.shutdown)
+
+    def _add_worker(self) -> None:
+        """Start a new worker and mark it idle."""
+        worker = _Worker(self._context, self.preload_modules, self.memory_limit_mb)
+        self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        """Mark a worker idle again, unless the pool was shut down while it ran."""
+        with self._lock:
+            if worker in self._workers:
+                self._idle.put(worker)
+
+    def _replace_worker(self, worker: _Worker) -> None:
+        """Kill a worker that timed out or died and start a fresh one in its place."""
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._started:
+                self._add_worker()
+
+    def run(self, func: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``func(*args)`` in a worker process under a hard deadline.
+
+        Args:
+            func (Callable): Module-level function to call in the worker
+            *args: Picklable arguments for the function
+            timeout (Optional[float]): Deadline in seconds, defaults to the pool's
+                timeout; it covers waiting for an idle worker as well as the call
+
+        Returns:
+            Any: The function's return value
+
+        Raises:
+            WorkerTimeoutError: If no worker frees up or the call does not finish
+                before the deadline (a worker that misses it is replaced)
+            WorkerError: If the call raises, the worker process dies or the pool
+                is shut down
+        """
+        self.start()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        idle = self._idle
+        try:
+            worker = idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise WorkerTimeoutError(timeout)
+        if worker is None:
+            # Leave the sign for the other callers waiting on this queue
+            idle.put(None)
+            raise WorkerError("pool shut down")
+        with self._lock:
+            self.calls += 1
+
+        try:
+            worker.conn.send((func, args))
+            if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                with self._lock:
+                    self.timeouts += 1
+                self._replace_worker(worker)
+                worker = None
+                raise WorkerTimeoutError(timeout)
+            success, value = worker.conn.recv()
+        except (EOFError, OSError):
+            with self._lock:
+                started = self._started
+                if started:
+                    self.crashes += 1
+            self._replace_worker(worker)
+            worker = None
+            if not started:
+                # Stopped by ``shutdown`` while running the call
+                raise WorkerError("pool shut down")
+            # The worker died, e.g. killed for going over its memory cap
+            raise WorkerError("Worker process stopped unexpectedly")
+        finally:
+            if worker is not None:
+                self._release(worker)
+
+        if not success:
+            raise WorkerError(value)
+        return value
+
+    def shutdown(self) -> None:
+        """Stop all workers, failing calls that are running or waiting for one."""
+        with self._lock:
+            self._started = False
+            workers, self._workers = self._workers, []
+            idle, self._idle = self._idle, queue.Queue()
+        # Wake the callers waiting for a worker; each passes the sign on
+        idle.put(None)
+        for worker in workers:
+            worker.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the pool's counters."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "started": self._started,
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+            }